@@ -5,20 +5,34 @@
 """ Module defining the Charmed operator for the FINOS Legend Studio. """
 
 import base64
+import hashlib
+import ipaddress
 import json
 import logging
-import subprocess
+import os
+import re
+import shlex
+import time
+import urllib.parse
 
 from ops import charm
 from ops import framework
 from ops import main
 from ops import model
-import jks
+from ops import pebble
 
 from charms.finos_legend_db_k8s.v0 import legend_database
 from charms.finos_legend_gitlab_integrator_k8s.v0 import legend_gitlab
 from charms.nginx_ingress_integrator.v0 import ingress
 
+import jvm_diagnostics
+import percentiles
+
+# NOTE: any heavier dependencies (e.g. `jks`, `pymongo` via `mongo_sessions`,
+# `asyncio` via `loadtest` or `urllib.request`) are imported lazily on the
+# code paths requiring them to keep the startup time of every hook low.
+# (see tests/test_import_time.py)
+
 
 logger = logging.getLogger(__name__)
 
@@ -29,21 +43,309 @@ APPLICATION_SERVER_UI_PATH = "/studio"
 STUDIO_SERVICE_URL_FORMAT = "%(schema)s://%(host)s:%(port)s%(path)s"
 STUDIO_GITLAB_REDIRECT_URI_FORMAT = "%(base_url)s/log.in/callback"
 
+STUDIO_MAIN_CLASS = "org.finos.legend.server.shared.staticserver.Server"
+STUDIO_CLASSPATH_DIR = "/app/bin"
+STUDIO_CLASSPATH = "%s/webapp-content:%s/*" % (
+    STUDIO_CLASSPATH_DIR, STUDIO_CLASSPATH_DIR)
+STUDIO_WEBAPP_CONTENT_DIR = "%s/webapp-content" % STUDIO_CLASSPATH_DIR
+STUDIO_WEBAPP_PRECOMPRESSION_MARKER_PATH = "/precompressed-assets.fingerprint"
+STUDIO_WEBAPP_PRECOMPRESSION_TIMEOUT = 300
+# File extensions of the webapp assets served with each compressible type:
+STUDIO_WEBAPP_MIME_TYPE_EXTENSIONS = {
+    "text/html": [".html"],
+    "text/css": [".css"],
+    "text/plain": [".txt"],
+    "application/javascript": [".js"],
+    "application/json": [".json", ".map"],
+    "image/svg+xml": [".svg"]}
+# Webapp paths (relative to the UI path) exempt from the HTML5 router:
+STUDIO_WEBAPP_WORKER_PATHS = [
+    "/editor.worker.js", "/json.worker.js",
+    "/editor.worker.js.map", "/json.worker.js.map"]
+STUDIO_WEBAPP_CONFIG_PATHS = ["/version.json", "/config.json"]
+STUDIO_WEBAPP_STATIC_PATH = "/static"
+STUDIO_APPCDS_ARCHIVE_PATH = "/appcds/studio.jsa"
+STUDIO_APPCDS_FINGERPRINT_PATH = "/appcds/studio.jsa.fingerprint"
+STUDIO_APPCDS_TRAINING_TIMEOUT = 300
+# Exit code of a JVM stopped through a SIGTERM:
+STUDIO_SIGTERM_EXIT_CODE = 143
+# NOTE: the Studio's static server serves the webapp from the 'web<ui-path>'
+# directory of its classpath:
+STUDIO_WEBAPP_ASSETS_DIR = "%s/web%s" % (
+    STUDIO_WEBAPP_CONTENT_DIR, APPLICATION_SERVER_UI_PATH)
+
+WEBAPP_PROXY_CONTAINER_NAME = "webapp-proxy"
+WEBAPP_PROXY_SERVICE_NAME = "webapp-proxy"
+WEBAPP_PROXY_PORT = 8090
+WEBAPP_PROXY_CONFIG_FILE_CONTAINER_LOCAL_PATH = (
+    "/etc/nginx/studio-webapp-proxy.conf")
+# Mount point of the volume shared between the Studio and proxy containers:
+WEBAPP_ASSETS_DIR = "/webapp-assets"
+WEBAPP_ASSETS_SYNC_MARKER_PATH = (
+    "%s/.studio-assets.fingerprint" % WEBAPP_ASSETS_DIR)
+WEBAPP_ASSETS_SYNC_TIMEOUT = 300
+# Webapp paths served by the proxy straight from the shared volume, with all
+# others being forwarded to the Studio:
+WEBAPP_PROXY_LOCAL_PATHS = [
+    "%s%s/" % (APPLICATION_SERVER_UI_PATH, STUDIO_WEBAPP_STATIC_PATH)] + [
+    "%s%s" % (APPLICATION_SERVER_UI_PATH, path)
+    for path in STUDIO_WEBAPP_WORKER_PATHS]
+WEBAPP_PROXY_NGINX_CONFIG_FORMAT = """\
+worker_processes auto;
+pid /tmp/nginx.pid;
+error_log /dev/stderr warn;
+
+events {
+    worker_connections 1024;
+}
+
+http {
+    include /etc/nginx/mime.types;
+    default_type application/octet-stream;
+    access_log off;
+
+    sendfile on;
+    tcp_nopush on;
+    keepalive_timeout 65s;
+    keepalive_requests 1000;
+    open_file_cache max=1000 inactive=5m;
+    open_file_cache_valid 1m;
+    gzip_static on;
+    gzip_vary on;
+
+    upstream studio {
+        server 127.0.0.1:%(studio_port)d;
+        keepalive 32;
+    }
+
+    server {
+        listen %(port)d;
+        root %(root)s;
+
+        proxy_http_version 1.1;
+        proxy_set_header Connection "";
+        proxy_set_header Host $http_host;
+        proxy_set_header X-Real-IP $remote_addr;
+        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+        proxy_set_header X-Forwarded-Proto $scheme;
+
+        location / {
+            proxy_pass http://studio;
+        }
+
+        location @studio {
+            proxy_pass http://studio;
+        }
+%(locations)s
+    }
+}
+"""
+WEBAPP_PROXY_NGINX_LOCATION_FORMAT = """
+        location %(match)s {
+            add_header Cache-Control "%(cache_control)s";
+            %(handler)s
+        }
+"""
+
+# Keys of the ingress relation data set from the ingress-* config options:
+INGRESS_CHARM_MANAGED_OPTIONS = [
+    "session-cookie-max-age", "limit-rps", "limit-whitelist",
+    "max-body-size", "retry-errors"]
+# Upstream errors the ingress may retry requests on another unit for:
+VALID_INGRESS_RETRY_ERRORS = [
+    "error", "timeout", "invalid_header", "http_500", "http_502",
+    "http_503", "http_504", "http_403", "http_404", "http_429"]
+
 TRUSTSTORE_TYPE_JKS = "jks"
 TRUSTSTORE_NAME = "Legend Studio"
 TRUSTSTORE_PASSPHRASE = "Legend Studio"
 TRUSTSTORE_CONTAINER_LOCAL_PATH = "/truststore.jks"
 
+# NOTE: Dropwizard always registers a JmxReporter for its metric registry, so
+# the Prometheus JMX exporter agent can export the Jetty and request timer
+# metrics alongside the JVM's own (GC, memory, threads) ones:
+METRICS_EXPORTER_RESOURCE = "jmx-prometheus-javaagent"
+METRICS_EXPORTER_JAR_CONTAINER_LOCAL_PATH = "/jmx_prometheus_javaagent.jar"
+METRICS_EXPORTER_CONFIG_FILE_CONTAINER_LOCAL_PATH = "/jmx-exporter-config.json"
+METRICS_EXPORTER_PORT = 9404
+METRICS_EXPORTER_PATH = "/metrics"
+# Patterns of the attributes of the Dropwizard metric MBeans (e.g.
+# `metrics:name=io.dropwizard.jetty.MutableServletContextHandler.requests,
+# type=timers`) and the names of the Prometheus metrics they are exported as:
+METRICS_EXPORTER_DROPWIZARD_RULES = [{
+    "pattern": "metrics<name=([^,>]+)(, type=\\w+)?><>(\\d+)thPercentile",
+    "name": "dropwizard_$1",
+    "labels": {"quantile": "0.$3"}
+}, {
+    "pattern": (
+        "metrics<name=([^,>]+)(, type=\\w+)?><>"
+        "(Count|Value|Mean|Max|Min|OneMinuteRate)"),
+    "name": "dropwizard_$1_$3"
+}]
+
 APPLICATION_CONNECTOR_TYPE_HTTP = "http"
 APPLICATION_CONNECTOR_PORT_HTTP = 8080
 APPLICATION_CONNECTOR_TYPE_HTTPS = "https"
 APPLICATION_CONNECTOR_PORT_HTTPS = 8081
+# NOTE: only used by the 'default' server type, which serves the admin
+# context on a dedicated connector:
+APPLICATION_ADMIN_CONNECTOR_PORT_HTTP = 8082
+
+APPLICATION_SERVER_TYPE_SIMPLE = "simple"
+APPLICATION_SERVER_TYPE_DEFAULT = "default"
+VALID_APPLICATION_SERVER_TYPES = [
+    APPLICATION_SERVER_TYPE_SIMPLE, APPLICATION_SERVER_TYPE_DEFAULT]
+# Dropwizard sizes (e.g. '256 bytes', '1KiB'):
+DROPWIZARD_SIZE_UNIT_BYTES = {
+    "b": 1, "byte": 1, "bytes": 1,
+    "kb": 1000, "kilobyte": 1000, "kilobytes": 1000,
+    "kib": 1024, "kibibyte": 1024, "kibibytes": 1024,
+    "mb": 1000 ** 2, "megabyte": 1000 ** 2, "megabytes": 1000 ** 2,
+    "mib": 1024 ** 2, "mebibyte": 1024 ** 2, "mebibytes": 1024 ** 2}
+DROPWIZARD_SIZE_REGEX = re.compile(r"^([0-9]+)\s*([a-zA-Z]+)$")
+# Dropwizard durations (e.g. '30 seconds', '500ms'):
+DROPWIZARD_DURATION_REGEX = re.compile(
+    r"^[0-9]+\s*(ns|nanoseconds?|us|microseconds?|ms|milliseconds?|s|"
+    r"seconds?|m|mins?|minutes?|h|hours?|d|days?)$")
 
 VALID_APPLICATION_LOG_LEVEL_SETTINGS = [
     "INFO", "WARN", "DEBUG", "TRACE", "OFF"]
 
+LOGGING_PROFILE_DEFAULT = "default"
+LOGGING_PROFILE_PRODUCTION = "production"
+VALID_LOGGING_PROFILES = [LOGGING_PROFILE_DEFAULT, LOGGING_PROFILE_PRODUCTION]
+# NOTE: the production profile keeps the per-request pac4j logging quiet:
+LOGGING_PRODUCTION_PAC4J_LEVEL = "WARN"
+
+# Mapping between the integer MongoDB connection string options and the names
+# of the charm config options setting them (-1 leaving them unset):
+MONGO_URI_INT_OPTIONS = {
+    "maxPoolSize": "mongo-max-pool-size",
+    "minPoolSize": "mongo-min-pool-size",
+    "maxIdleTimeMS": "mongo-max-idle-time-ms",
+    "waitQueueTimeoutMS": "mongo-wait-queue-timeout-ms",
+    "serverSelectionTimeoutMS": "mongo-server-selection-timeout-ms"}
+VALID_MONGO_READ_PREFERENCES = [
+    "primary", "primaryPreferred", "secondary", "secondaryPreferred",
+    "nearest"]
+VALID_MONGO_COMPRESSORS = ["zstd", "snappy", "zlib"]
+STUDIO_SESSION_COLLECTION = "userSessions"
+
 GITLAB_REQUIRED_SCOPES = ["openid", "profile", "api"]
 
+STUDIO_HEALTHCHECK_NAME = "studio-ready"
+STUDIO_HEALTHCHECK_URL_FORMAT = (
+    "http://localhost:%(port)d%(path)s/admin/healthcheck")
+# NOTE: the Studio's healthcheck is polled for a short while after restarting
+# it, as Pebble only emits check events once its check failed repeatedly:
+STUDIO_READINESS_POLL_TIMEOUT = 30
+STUDIO_READINESS_POLL_INTERVAL = 1
+STUDIO_AWAITING_READINESS_MESSAGE = "waiting for Studio healthcheck to pass"
+
+STUDIO_PEER_RELATION_NAME = "studio-peers"
+# Peer application data keys under which the leader publishes the Studio
+# config files shared by all units, and the revision of said files:
+STUDIO_PEER_CONFIG_FILES_KEY = "studio-config-files"
+STUDIO_PEER_CONFIG_REVISION_KEY = "studio-config-revision"
+STUDIO_AWAITING_PEER_CONFIG_MESSAGE = (
+    "waiting for the leader to publish the Studio config")
+# Peer unit data keys under which each unit requests a restart lock from the
+# leader and reports whether its Studio is ready, and the peer application
+# data key under which the leader grants the locks:
+STUDIO_PEER_RESTART_REQUEST_KEY = "restart-request"
+STUDIO_PEER_READY_KEY = "studio-ready"
+STUDIO_PEER_RESTART_LOCKS_KEY = "restart-locks"
+STUDIO_AWAITING_RESTART_LOCK_MESSAGE = "waiting for a rolling restart lock"
+# Number of most recent durations of each reconfiguration phase kept in
+# stored state for computing their percentiles:
+RECONFIGURATION_TIMING_SAMPLES = 50
+RECONFIGURATION_TIMING_PERCENTILES = [50, 90, 99]
+# Go-style durations as accepted by Pebble (e.g. '10s', '1m30s'):
+PEBBLE_DURATION_REGEX = re.compile(r"^([0-9]+(\.[0-9]+)?(ms|s|m|h))+$")
+PEBBLE_DURATION_UNIT_SECONDS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+JVM_GARBAGE_COLLECTOR_OPTIONS = {
+    "G1": ["-XX:+UseG1GC"],
+    # NOTE: ZGC is only production-ready as of Java 15:
+    "ZGC": ["-XX:+UnlockExperimentalVMOptions", "-XX:+UseZGC"],
+    "Parallel": ["-XX:+UseParallelGC"]}
+# Flags selecting each of the collectors the JVM may use:
+JVM_GARBAGE_COLLECTOR_FLAGS = [
+    "-XX:+UseG1GC", "-XX:+UseZGC", "-XX:+UseParallelGC", "-XX:+UseSerialGC",
+    "-XX:+UseShenandoahGC"]
+# JVM options which may only be set through their dedicated config options.
+# NOTE: explicit heap sizes would silently override the RAM percentages:
+JVM_CHARM_MANAGED_OPTION_PREFIXES = [
+    "-Xss", "-XX:InitialRAMPercentage", "-XX:MaxRAMPercentage",
+    "-XX:MaxMetaspaceSize", "-Xmx", "-Xms", "-XX:MaxHeapSize",
+    "-XX:InitialHeapSize"]
+JVM_MEMORY_SIZE_REGEX = re.compile(r"^[0-9]+[kKmMgG]?$")
+
+JFR_RECORDINGS_DIR = "/jfr"
+JFR_PROFILE_PATH_FORMAT = "%s/studio-profile-%%s.jfr" % JFR_RECORDINGS_DIR
+JFR_OPTION_PREFIXES = ["-XX:StartFlightRecording", "-XX:FlightRecorderOptions"]
+# NOTE: the 'default' settings are designed for continuous use in production
+# with an overhead of around 1%:
+JFR_CONTINUOUS_RECORDING_OPTIONS = [
+    "-XX:StartFlightRecording=name=continuous,settings=default,disk=true,"
+    "maxage=6h,maxsize=512m,dumponexit=true,filename=%s/continuous.jfr" % (
+        JFR_RECORDINGS_DIR)]
+# Seconds to wait for a finished recording to be written out:
+JFR_DUMP_TIMEOUT = 60
+# NOTE: waiting on a recording holds the unit's hook lock, so only short
+# recordings may be waited on:
+JFR_PROFILE_MAX_WAIT_DURATION = 60
+
+LOAD_TEST_TARGET_STATIC = "static"
+LOAD_TEST_TARGET_CONFIG = "config"
+LOAD_TEST_TARGET_HEALTHCHECK = "healthcheck"
+VALID_LOAD_TEST_TARGETS = [
+    LOAD_TEST_TARGET_STATIC, LOAD_TEST_TARGET_CONFIG,
+    LOAD_TEST_TARGET_HEALTHCHECK]
+LOAD_TEST_REQUEST_TIMEOUT = 10
+
+
+def _parse_pebble_duration(duration: str) -> float:
+    """Returns the number of seconds in the given Pebble duration string."""
+    return sum(
+        float(value) * PEBBLE_DURATION_UNIT_SECONDS[unit]
+        for value, _, unit in re.findall(
+            r"([0-9]+(\.[0-9]+)?)(ms|s|m|h)", duration))
+
+
+def _normalize_pebble_check(check: dict) -> dict:
+    """Returns a copy of the provided Pebble check definition with its
+    durations converted to seconds.
+
+    NOTE: Pebble reports durations in Go's format (e.g. '1m0s' for '1m'), so
+    they must be normalized before comparing check definitions.
+    """
+    check = dict(check)
+    for key in ["period", "timeout"]:
+        if check.get(key):
+            check[key] = _parse_pebble_duration(check[key])
+    return check
+
+
+def _parse_dropwizard_size(size: str) -> int:
+    """Returns the number of bytes in the given Dropwizard size string, or
+    None if it is not a valid size.
+    """
+    match = DROPWIZARD_SIZE_REGEX.match(size.strip())
+    if not match:
+        return None
+    unit_bytes = DROPWIZARD_SIZE_UNIT_BYTES.get(match.group(2).lower())
+    if not unit_bytes:
+        return None
+    return int(match.group(1)) * unit_bytes
+
+
+def _get_fingerprint(data) -> str:
+    """Returns the hex SHA-256 digest of the provided str/bytes."""
+    if isinstance(data, str):
+        data = data.encode()
+    return hashlib.sha256(data).hexdigest()
+
 
 class LegendStudioServerOperatorCharm(charm.CharmBase):
     """ Charmed operator for the FINOS Legend Studio. """
@@ -54,22 +356,43 @@ class LegendStudioServerOperatorCharm(charm.CharmBase):
         super().__init__(*args)
 
         self._set_stored_defaults()
+        # NOTE: set by any handler which requires the Studio to be
+        # reconfigured, with the actual reconfiguration being performed only
+        # once at the end of the hook dispatch. (see `_on_pre_commit`)
+        self._reconfiguration_scheduled = False
+        # NOTE: durations of the phases of the ongoing reconfiguration, each
+        # phase lasting from the end of the previous one to its own end.
+        # (see `_end_reconfiguration_phase`)
+        self._reconfiguration_timings = {}
+        self._reconfiguration_phase_start = time.monotonic()
 
         self._legend_db_consumer = legend_database.LegendDatabaseConsumer(
             self)
         self._legend_gitlab_consumer = legend_gitlab.LegendGitlabConsumer(
             self, relation_name="legend-studio-gitlab")
         self.ingress = ingress.IngressRequires(
-            self, {
-                "service-hostname": self.app.name,
-                "service-name": self.app.name,
-                "service-port": APPLICATION_CONNECTOR_PORT_HTTP})
+            self, self._get_ingress_config())
+
+        # Framework events:
+        self.framework.observe(
+            self.framework.on.pre_commit, self._on_pre_commit)
 
         # Standard charm lifecycle events:
         self.framework.observe(
             self.on.config_changed, self._on_config_changed)
         self.framework.observe(
             self.on.studio_pebble_ready, self._on_studio_pebble_ready)
+        self.framework.observe(
+            self.on.webapp_proxy_pebble_ready,
+            self._on_webapp_proxy_pebble_ready)
+        self.framework.observe(
+            self.on.update_status, self._on_update_status)
+        self.framework.observe(
+            self.on.studio_pebble_check_failed,
+            self._on_studio_pebble_check_changed)
+        self.framework.observe(
+            self.on.studio_pebble_check_recovered,
+            self._on_studio_pebble_check_changed)
 
         # DB relation lifecycle events:
         self.framework.observe(
@@ -103,66 +426,561 @@ class LegendStudioServerOperatorCharm(charm.CharmBase):
             self.on["legend-engine"].relation_changed,
             self._on_engine_relation_changed)
 
+        # Peer relation events:
+        self.framework.observe(
+            self.on[STUDIO_PEER_RELATION_NAME].relation_created,
+            self._on_studio_peers_relation_changed)
+        self.framework.observe(
+            self.on[STUDIO_PEER_RELATION_NAME].relation_changed,
+            self._on_studio_peers_relation_changed)
+        self.framework.observe(
+            self.on[STUDIO_PEER_RELATION_NAME].relation_departed,
+            self._on_studio_peers_relation_changed)
+        self.framework.observe(
+            self.on.leader_elected, self._on_leader_elected)
+
+        # Metrics endpoint relation events:
+        self.framework.observe(
+            self.on["metrics-endpoint"].relation_joined,
+            self._on_metrics_endpoint_relation_joined)
+
+        # Action events:
+        self.framework.observe(
+            self.on.ensure_session_indexes_action,
+            self._on_ensure_session_indexes_action)
+        self.framework.observe(
+            self.on.session_store_stats_action,
+            self._on_session_store_stats_action)
+        self.framework.observe(
+            self.on.reconfiguration_timings_action,
+            self._on_reconfiguration_timings_action)
+        self.framework.observe(
+            self.on.profile_action, self._on_profile_action)
+        self.framework.observe(
+            self.on.thread_dump_action, self._on_thread_dump_action)
+        self.framework.observe(
+            self.on.heap_histogram_action, self._on_heap_histogram_action)
+        self.framework.observe(
+            self.on.load_test_action, self._on_load_test_action)
+
     def _set_stored_defaults(self) -> None:
         self._stored.set_default(log_level="DEBUG")
         self._stored.set_default(legend_db_credentials={})
         self._stored.set_default(legend_gitlab_credentials={})
         self._stored.set_default(sdlc_service_url="")
         self._stored.set_default(engine_service_url="")
+        # Map between container file paths and the fingerprints of the
+        # contents last pushed to them:
+        self._stored.set_default(config_fingerprints={})
+        self._stored.set_default(restarts_avoided=0)
+        # Serialized truststore keyed by the fingerprint of its inputs:
+        self._stored.set_default(truststore_cache={})
+        self._stored.set_default(appcds_failed_fingerprint="")
+        # Time of the last Studio restart which has yet to pass its
+        # healthcheck, and latency of the last successful one:
+        self._stored.set_default(studio_restart_time=0.0)
+        self._stored.set_default(studio_readiness_latency=0.0)
+        # Whether the above latency is merely a lower bound, the Studio not
+        # having become ready while its healthcheck was being polled:
+        self._stored.set_default(studio_readiness_latency_lower_bound=False)
+        # Address of the Studio's network binding and the GitLab redirect URIs
+        # derived from it, as last resolved:
+        self._stored.set_default(studio_bind_address="")
+        self._stored.set_default(gitlab_redirect_uris=[])
+        # Fingerprint of the last session index spec applied to MongoDB:
+        self._stored.set_default(session_indexes_fingerprint="")
+        # Whether the Studio was last started with the metrics exporter:
+        self._stored.set_default(metrics_exporter_enabled=False)
+        # Durations in seconds of the phases of the latest reconfiguration
+        # and the most recent samples of each:
+        self._stored.set_default(reconfiguration_timings={})
+        # Revision of the shared Studio config files last applied:
+        self._stored.set_default(studio_config_revision="")
+        # Whether the Studio's files changed since it was last restarted,
+        # e.g. while waiting for a rolling restart lock:
+        self._stored.set_default(studio_restart_pending=False)
+        # Whether the webapp proxy was last seen serving, and thus whether
+        # the ingress should point to it:
+        self._stored.set_default(webapp_proxy_active=False)
 
     def _on_studio_pebble_ready(self, event: framework.EventBase) -> None:
         """Define the Studio workload using the Pebble API.
         Note that this will *not* start the service, but instead leave it in a
         blocked state until the relevant relations required for it are added.
+        If said relations are already present, a reconfiguration is scheduled.
         """
         # Get a reference the container attribute on the PebbleReadyEvent
         container = event.workload
 
-        # Define an initial Pebble layer configuration
-        pebble_layer = {
+        jvm_options = []
+        possible_blocked_status = self._add_jvm_options_from_charm_config(
+            jvm_options)
+        if possible_blocked_status:
+            self.unit.status = possible_blocked_status
+            return
+
+        checks = {}
+        possible_blocked_status = self._add_pebble_checks_from_charm_config(
+            checks)
+        if possible_blocked_status:
+            self.unit.status = possible_blocked_status
+            return
+
+        # Add intial Pebble config layer using the Pebble API
+        container.add_layer(
+            "studio", self._get_studio_pebble_layer(jvm_options, checks),
+            combine=True)
+
+        self._precompress_webapp_assets(container)
+        container.make_dir(JFR_RECORDINGS_DIR, make_parents=True)
+        # NOTE: the pod (and hence its address) may have been replaced:
+        self._refresh_gitlab_redirect_uris()
+
+        # NOTE(aznashwan): as mentioned above, we will *not* be auto-starting
+        # the service until the relations with DBMan and GitLab are added:
+        # container.autostart()
+
+        self.unit.status = model.BlockedStatus(
+            "requires relating to: finos-legend-db-k8s, "
+            "finos-legend-gitlab-integrator-k8s")
+
+        # NOTE: the relations may have been established before the container
+        # became ready, in which case the service can be configured now:
+        self._schedule_studio_reconfiguration()
+
+    def _on_webapp_proxy_pebble_ready(self, _) -> None:
+        """Schedules a reconfiguration for the webapp proxy to be set up."""
+        self._schedule_studio_reconfiguration()
+
+    def _get_studio_pebble_layer(
+            self, jvm_options: list, checks: dict) -> dict:
+        """Returns the Pebble layer for the Studio service, which will be
+        started with the provided list of JVM tuning options, alongside the
+        provided Pebble health checks.
+        """
+        return {
             "summary": "Studio layer.",
             "description": "Pebble config layer for FINOS Legend Studio.",
             "services": {
                 "studio": {
                     "override": "replace",
                     "summary": "studio",
-                    "command": (
-                        # NOTE(aznashwan): starting through bash is required
-                        # for the classpath glob (-cp ...) to be expanded:
-                        "/bin/sh -c 'java -XX:+ExitOnOutOfMemoryError -Xss4M "
-                        "-XX:MaxRAMPercentage=60 -Dfile.encoding=UTF8 "
-                        "-Djavax.net.ssl.trustStore=\"%s\" "
-                        "-Djavax.net.ssl.trustStorePassword=\"%s\" "
-                        "-cp /app/bin/webapp-content:/app/bin/* "
-                        "org.finos.legend.server.shared.staticserver.Server "
-                        "server \"%s\"'" % (
-                            TRUSTSTORE_CONTAINER_LOCAL_PATH,
-                            TRUSTSTORE_PASSPHRASE,
-                            STUDIO_HTTP_CONFIG_FILE_CONTAINER_LOCAL_PATH)
-                    ),
+                    # NOTE(aznashwan): starting through bash is required
+                    # for the classpath glob (-cp ...) to be expanded:
+                    "command": "/bin/sh -c %s" % shlex.quote(
+                        self._get_studio_java_command(jvm_options)),
                     # NOTE(aznashwan): considering the Studio service expects
                     # a singular config file which already contains all
                     # relevant options in it (some of which will require the
                     # relation with DB/GitLab to have already been
                     # established), we do not auto-start:
                     "startup": "disabled",
-                    # TODO(aznashwan): determine any env vars we could pass
-                    # (most notably, things like the RAM percentage etc...)
-                    "environment": {},
                 }
             },
+            "checks": checks,
         }
 
-        # Add intial Pebble config layer using the Pebble API
-        container.add_layer("studio", pebble_layer, combine=True)
+    def _get_studio_healthcheck_url(self) -> str:
+        """Returns the URL of the Studio's admin healthcheck, whose port
+        depends on the configured Dropwizard server type.
+        """
+        port = APPLICATION_CONNECTOR_PORT_HTTP
+        if self.model.config["server-type"] == (
+                APPLICATION_SERVER_TYPE_DEFAULT):
+            port = APPLICATION_ADMIN_CONNECTOR_PORT_HTTP
+        return STUDIO_HEALTHCHECK_URL_FORMAT % {
+            "port": port, "path": APPLICATION_SERVER_UI_PATH}
+
+    def _add_pebble_checks_from_charm_config(
+            self, checks: dict) -> model.BlockedStatus:
+        """This method adds the Pebble HTTP check against the Studio's admin
+        healthcheck endpoint into the provided dict of Pebble checks.
 
-        # NOTE(aznashwan): as mentioned above, we will *not* be auto-starting
-        # the service until the relations with DBMan and GitLab are added:
-        # container.autostart()
+        Returns:
+            None if all of the healthcheck-related config options are valid.
+            A `model.BlockedStatus` instance with a relevant message otherwise.
+        """
+        config = self.model.config
+        invalid_options = []
+        for option_name in ["healthcheck-period", "healthcheck-timeout"]:
+            if not PEBBLE_DURATION_REGEX.match(config[option_name]):
+                logger.warning(
+                    "Invalid duration for option '%s': '%s'. Must be a "
+                    "duration such as '10s' or '1m30s'.",
+                    option_name, config[option_name])
+                invalid_options.append(option_name)
+        if not invalid_options and _parse_pebble_duration(
+                config["healthcheck-timeout"]) >= _parse_pebble_duration(
+                    config["healthcheck-period"]):
+            logger.warning(
+                "The 'healthcheck-timeout' (%s) must be shorter than the "
+                "'healthcheck-period' (%s).",
+                config["healthcheck-timeout"], config["healthcheck-period"])
+            invalid_options.append("healthcheck-timeout")
+        if config["healthcheck-threshold"] < 1:
+            logger.warning(
+                "The 'healthcheck-threshold' must be at least 1, got %s.",
+                config["healthcheck-threshold"])
+            invalid_options.append("healthcheck-threshold")
+        if invalid_options:
+            return model.BlockedStatus(
+                "invalid healthcheck config option(s): %s, please review "
+                "the debug-log for more details" % ", ".join(invalid_options))
+
+        checks[STUDIO_HEALTHCHECK_NAME] = {
+            "override": "replace",
+            "level": "ready",
+            "period": config["healthcheck-period"],
+            "timeout": config["healthcheck-timeout"],
+            "threshold": config["healthcheck-threshold"],
+            "http": {"url": self._get_studio_healthcheck_url()}}
+        return None
 
-        self.unit.status = model.BlockedStatus(
-            "requires relating to: finos-legend-db-k8s, "
-            "finos-legend-gitlab-integrator-k8s")
+    def _get_studio_java_command(self, jvm_options: list) -> str:
+        """Returns the shell command line for running the Studio server with
+        the provided list of JVM tuning options, each of which is quoted.
+        """
+        return (
+            "java -XX:+ExitOnOutOfMemoryError %s "
+            "-Dfile.encoding=UTF8 "
+            "-Djavax.net.ssl.trustStore=\"%s\" "
+            "-Djavax.net.ssl.trustStorePassword=\"%s\" "
+            "-cp %s %s server \"%s\"" % (
+                " ".join(shlex.quote(option) for option in jvm_options),
+                TRUSTSTORE_CONTAINER_LOCAL_PATH,
+                TRUSTSTORE_PASSPHRASE,
+                STUDIO_CLASSPATH,
+                STUDIO_MAIN_CLASS,
+                STUDIO_HTTP_CONFIG_FILE_CONTAINER_LOCAL_PATH))
+
+    def _get_studio_appcds_fingerprint(
+            self, container: model.Container, jvm_options: list) -> str:
+        """Returns a fingerprint of the Studio classpath contents shipped in
+        the OCI image and the JVM options an AppCDS archive is dumped with.
+        """
+        classpath_files = sorted(
+            "%s:%s:%s" % (f.path, f.size, f.last_modified)
+            for f in container.list_files(STUDIO_CLASSPATH_DIR))
+        return _get_fingerprint(
+            json.dumps([classpath_files, jvm_options]))
+
+    def _run_studio_appcds_training(
+            self, container: model.Container, jvm_options: list) -> float:
+        """Runs a training start of the Studio server with the provided JVM
+        options which dumps an AppCDS archive of the classes it loaded, and
+        stops it once it passes its healthcheck.
+
+        NOTE: the Studio service must be stopped beforehand, lest the training
+        run clash with its port.
+
+        Returns:
+            Number of seconds the Studio took to pass its healthcheck.
+
+        Raises:
+            pebble.ExecError/pebble.ChangeError: if the training run fails.
+            TimeoutError: if the Studio did not pass its healthcheck in time.
+        """
+        start_time = time.monotonic()
+        # NOTE: the shell is replaced by the JVM so it receives the SIGTERM:
+        process = container.exec(
+            ["/bin/sh", "-c", "exec %s" % self._get_studio_java_command(
+                jvm_options + ["-XX:ArchiveClassesAtExit=%s" % (
+                    STUDIO_APPCDS_ARCHIVE_PATH)])],
+            timeout=STUDIO_APPCDS_TRAINING_TIMEOUT)
+        deadline = start_time + STUDIO_APPCDS_TRAINING_TIMEOUT
+        ready = self._is_studio_healthcheck_passing()
+        while not ready and time.monotonic() < deadline:
+            time.sleep(STUDIO_READINESS_POLL_INTERVAL)
+            ready = self._is_studio_healthcheck_passing()
+        ready_time = time.monotonic() - start_time
+
+        # NOTE: the JVM only dumps the archive as it exits:
+        try:
+            process.send_signal("SIGTERM")
+        except OSError as ex:
+            logger.debug("AppCDS training run already exited: %s", str(ex))
+        try:
+            process.wait_output()
+        except pebble.ExecError as ex:
+            if ex.exit_code != STUDIO_SIGTERM_EXIT_CODE:
+                raise
+        if not ready:
+            raise TimeoutError(
+                "the Studio did not pass its healthcheck within %ds" % (
+                    STUDIO_APPCDS_TRAINING_TIMEOUT))
+        return ready_time
+
+    def _get_studio_appcds_archive_options(
+            self, container: model.Container, jvm_options: list) -> tuple:
+        """Checks whether an AppCDS archive for the Studio classpath and
+        provided JVM options exists in the container.
+
+        The archive is regenerated whenever the classpath shipped in the OCI
+        image or the JVM options change. (see
+        `_generate_studio_appcds_archive`)
+
+        Returns:
+            Tuple of the list of JVM options for using the archive (empty if
+            AppCDS is disabled or the archive cannot be generated) and the
+            fingerprint the archive must first be generated for (empty if it
+            is up to date).
+        """
+        if not self.model.config["jvm-appcds-enabled"]:
+            return [], ""
+
+        archive_options = [
+            "-XX:SharedArchiveFile=%s" % STUDIO_APPCDS_ARCHIVE_PATH]
+        try:
+            fingerprint = self._get_studio_appcds_fingerprint(
+                container, jvm_options)
+        except pebble.APIError as ex:
+            logger.warning(
+                "Failed to list the Studio classpath under '%s', the Studio "
+                "will start without an AppCDS archive: %s",
+                STUDIO_CLASSPATH_DIR, str(ex))
+            return [], ""
+        if container.exists(STUDIO_APPCDS_ARCHIVE_PATH) and (
+                self._container_file_matches(
+                    container, STUDIO_APPCDS_FINGERPRINT_PATH, fingerprint)):
+            return archive_options, ""
+        if self._stored.appcds_failed_fingerprint == fingerprint:
+            logger.debug(
+                "AppCDS archive generation previously failed for "
+                "fingerprint %s, not retrying", fingerprint)
+            return [], ""
+        return archive_options, fingerprint
+
+    def _generate_studio_appcds_archive(
+            self, container: model.Container, jvm_options: list,
+            fingerprint: str) -> float:
+        """Generates the Studio's AppCDS archive for the provided JVM options
+        through a training start of the Studio server, stopping the Studio
+        service for its duration. (see `_run_studio_appcds_training`)
+
+        Returns:
+            Number of seconds the Studio took to pass its healthcheck without
+            the archive, or None if the archive could not be generated.
+        """
+        logger.info(
+            "Generating Studio AppCDS archive under '%s'",
+            STUDIO_APPCDS_ARCHIVE_PATH)
+        if self._is_studio_service_running(container):
+            container.stop("studio")
+        try:
+            container.make_dir(
+                os.path.dirname(STUDIO_APPCDS_ARCHIVE_PATH), make_parents=True)
+            ready_time = self._run_studio_appcds_training(
+                container, jvm_options)
+            if not container.exists(STUDIO_APPCDS_ARCHIVE_PATH):
+                raise FileNotFoundError(
+                    "no archive was dumped under '%s'" % (
+                        STUDIO_APPCDS_ARCHIVE_PATH))
+        except (pebble.ChangeError, pebble.ExecError, OSError) as ex:
+            # NOTE: dynamic AppCDS archives require Java 13 or newer:
+            logger.warning(
+                "Failed to generate Studio AppCDS archive, the Studio will "
+                "start without it: %s", str(ex))
+            self._stored.appcds_failed_fingerprint = fingerprint
+            return None
+
+        container.push(
+            STUDIO_APPCDS_FINGERPRINT_PATH, fingerprint, make_dirs=True)
+        return ready_time
+
+    def _apply_studio_appcds_archive(
+            self, container: model.Container, jvm_options: list,
+            fallback_layer: dict, fingerprint: str) -> float:
+        """Generates the AppCDS archive the Studio's Pebble layer was set to
+        use, if any, reverting the layer to the provided fallback one without
+        the archive should the generation fail.
+
+        Returns:
+            Number of seconds the Studio took to pass its healthcheck without
+            the archive during its training run, or None if no archive was
+            generated.
+        """
+        if not fingerprint:
+            return None
+        ready_time = self._generate_studio_appcds_archive(
+            container, jvm_options, fingerprint)
+        if ready_time is None:
+            self._update_studio_pebble_layer(container, fallback_layer)
+        return ready_time
+
+    def _log_studio_appcds_ready_times(self, training_ready_time: float):
+        """Logs the time the Studio took to pass its healthcheck following
+        its restart with the AppCDS archive against the provided time it took
+        during the archive's training run without it, if one was generated.
+        """
+        if training_ready_time is None:
+            return
+        logger.info(
+            "Studio passed its healthcheck %s%.2fs after being restarted "
+            "with the AppCDS archive, and %.2fs after starting without it",
+            "over " if self._stored.studio_readiness_latency_lower_bound
+            else "", self._stored.studio_readiness_latency,
+            training_ready_time)
+
+    def _update_studio_pebble_layer(
+            self, container: model.Container, layer: dict) -> bool:
+        """Adds the provided Pebble layer into the container if its Studio
+        service or check definitions differ from the ones in the current plan.
+
+        NOTE: the service is not auto-started, so a Pebble replan would not
+        bring it back up after stopping it. Callers must instead restart the
+        service for the new definition to take effect.
+
+        Returns whether the layer was updated.
+        """
+        current_plan = container.get_plan()
+        current_service = current_plan.services.get("studio")
+        desired_service = pebble.Service(
+            "studio", layer["services"]["studio"])
+        current_checks = {
+            name: _normalize_pebble_check(check.to_dict())
+            for name, check in current_plan.checks.items()}
+        desired_checks = {
+            name: _normalize_pebble_check(pebble.Check(name, check).to_dict())
+            for name, check in layer["checks"].items()}
+        if current_service and (
+                current_service.to_dict() == desired_service.to_dict()) and (
+                    current_checks == desired_checks):
+            return False
+
+        logger.info("Updating Studio Pebble layer")
+        container.add_layer("studio", layer, combine=True)
+        return True
+
+    def _add_jvm_options_from_charm_config(
+            self, jvm_options: list) -> model.BlockedStatus:
+        """This method adds all JVM tuning options derived from the charm
+        config into the provided list.
+
+        Returns:
+            None if all of the JVM-related config options are valid.
+            A `model.BlockedStatus` instance with a relevant message otherwise.
+        """
+        options = []
+        invalid_options = (
+            self._add_jvm_garbage_collector_options_from_charm_config(
+                options) +
+            self._add_jvm_memory_options_from_charm_config(options) +
+            self._add_jvm_extra_options_from_charm_config(options))
+        if invalid_options:
+            return model.BlockedStatus(
+                "invalid JVM config option(s): %s, please review the "
+                "debug-log for more details" % ", ".join(invalid_options))
+
+        jvm_options.extend(options)
+        return None
+
+    def _add_jvm_garbage_collector_options_from_charm_config(
+            self, jvm_options: list) -> list:
+        """This method adds the options selecting the JVM's garbage collector
+        from the charm config into the provided list.
+
+        Returns:
+            List of the names of any invalid config options.
+        """
+        garbage_collector = self.model.config["jvm-garbage-collector"]
+        if not garbage_collector:
+            return []
+        if garbage_collector not in JVM_GARBAGE_COLLECTOR_OPTIONS:
+            logger.warning(
+                "Invalid JVM garbage collector '%s'. Valid options are: %s",
+                garbage_collector, list(JVM_GARBAGE_COLLECTOR_OPTIONS))
+            return ["jvm-garbage-collector"]
+        jvm_options.extend(JVM_GARBAGE_COLLECTOR_OPTIONS[garbage_collector])
+        return []
+
+    def _add_jvm_memory_options_from_charm_config(
+            self, jvm_options: list) -> list:
+        """This method adds the heap, metaspace and thread stack sizing
+        options from the charm config into the provided list.
+
+        Returns:
+            List of the names of any invalid config options.
+        """
+        config = self.model.config
+        invalid_options = []
+
+        max_ram_percentage = config["jvm-max-ram-percentage"]
+        if not 0 < max_ram_percentage <= 100:
+            logger.warning(
+                "Invalid 'jvm-max-ram-percentage' %s. Must be in (0, 100].",
+                max_ram_percentage)
+            invalid_options.append("jvm-max-ram-percentage")
+
+        initial_ram_percentage = config["jvm-initial-ram-percentage"]
+        if not 0 <= initial_ram_percentage <= max_ram_percentage:
+            logger.warning(
+                "Invalid 'jvm-initial-ram-percentage' %s. Must be between "
+                "0 (unset) and 'jvm-max-ram-percentage' (%s).",
+                initial_ram_percentage, max_ram_percentage)
+            invalid_options.append("jvm-initial-ram-percentage")
+        if initial_ram_percentage:
+            jvm_options.append(
+                "-XX:InitialRAMPercentage=%g" % initial_ram_percentage)
+        jvm_options.append("-XX:MaxRAMPercentage=%g" % max_ram_percentage)
+
+        for option_name, option_format in [
+                ("jvm-max-metaspace-size", "-XX:MaxMetaspaceSize=%s"),
+                ("jvm-thread-stack-size", "-Xss%s")]:
+            value = config[option_name]
+            if not value:
+                continue
+            if not JVM_MEMORY_SIZE_REGEX.match(value):
+                logger.warning(
+                    "Invalid JVM memory size for option '%s': '%s'. Must be "
+                    "a number with an optional k/m/g suffix (e.g. '4M').",
+                    option_name, value)
+                invalid_options.append(option_name)
+            jvm_options.append(option_format % value)
+        return invalid_options
+
+    def _add_jvm_extra_options_from_charm_config(
+            self, jvm_options: list) -> list:
+        """This method adds the free-form 'jvm-extra-options' into the
+        provided list, checking they neither conflict with the options
+        managed through dedicated config options nor select more than one
+        garbage collector.
+
+        Returns:
+            List of the names of any invalid config options.
+        """
+        config = self.model.config
+        try:
+            extra_options = shlex.split(config["jvm-extra-options"])
+        except ValueError as ex:
+            logger.warning(
+                "Failed to parse 'jvm-extra-options': %s", str(ex))
+            return ["jvm-extra-options"]
+
+        managed_prefixes = list(JVM_CHARM_MANAGED_OPTION_PREFIXES)
+        if config["jvm-continuous-recording"]:
+            managed_prefixes.extend(JFR_OPTION_PREFIXES)
+        conflicting_options = [
+            opt for opt in extra_options
+            if any(opt.startswith(prefix) for prefix in managed_prefixes)]
+        collector_options = [
+            opt for opt in extra_options
+            if opt in JVM_GARBAGE_COLLECTOR_FLAGS]
+        if config["jvm-garbage-collector"]:
+            conflicting_options.extend(collector_options)
+        elif len(collector_options) > 1:
+            logger.warning(
+                "The 'jvm-extra-options' select more than one garbage "
+                "collector: %s", collector_options)
+            return ["jvm-extra-options"]
+        if conflicting_options:
+            logger.warning(
+                "The following 'jvm-extra-options' conflict with options "
+                "managed through dedicated charm config options: %s",
+                conflicting_options)
+            return ["jvm-extra-options"]
+
+        jvm_options.extend(extra_options)
+        return []
 
     def _get_logging_level_from_config(self, option_name):
         """Fetches the config option with the given name and checks to
@@ -224,6 +1042,646 @@ class LegendStudioServerOperatorCharm(charm.CharmBase):
             }
         })
 
+    def _add_server_config_from_charm_config(
+            self, server_config: dict) -> model.BlockedStatus:
+        """This method adds the Dropwizard server section (server type,
+        connectors and thread pool settings) derived from the charm config
+        into the provided dict.
+
+        Returns:
+            None if all of the server-related config options are valid.
+            A `model.BlockedStatus` instance with a relevant message otherwise.
+        """
+        config = self.model.config
+        invalid_options = []
+
+        server_type = config["server-type"]
+        if server_type not in VALID_APPLICATION_SERVER_TYPES:
+            logger.warning(
+                "Invalid server type '%s'. Valid server types are: %s",
+                server_type, VALID_APPLICATION_SERVER_TYPES)
+            invalid_options.append("server-type")
+
+        thread_pool_config = {}
+        invalid_options.extend(
+            self._add_server_thread_pool_config_from_charm_config(
+                thread_pool_config))
+        connector = {}
+        invalid_options.extend(
+            self._add_server_connector_config_from_charm_config(connector))
+        gzip_config = {}
+        invalid_options.extend(
+            self._add_gzip_config_from_charm_config(gzip_config))
+
+        if invalid_options:
+            return model.BlockedStatus(
+                "invalid server config option(s): %s, please review the "
+                "debug-log for more details" % ", ".join(
+                    sorted(set(invalid_options))))
+
+        server_config.update({
+            "type": server_type,
+            "applicationContextPath": "/",
+            "adminContextPath": "%s/admin" % APPLICATION_SERVER_UI_PATH})
+        server_config.update(thread_pool_config)
+        server_config["gzip"] = gzip_config
+        if server_type == APPLICATION_SERVER_TYPE_SIMPLE:
+            server_config["connector"] = connector
+        else:
+            server_config["applicationConnectors"] = [connector]
+            server_config["adminConnectors"] = [{
+                "type": APPLICATION_CONNECTOR_TYPE_HTTP,
+                "port": APPLICATION_ADMIN_CONNECTOR_PORT_HTTP}]
+
+        return None
+
+    def _add_server_thread_pool_config_from_charm_config(
+            self, thread_pool_config: dict) -> list:
+        """This method adds the Dropwizard server's request thread pool
+        settings derived from the charm config into the provided dict.
+
+        Returns:
+            List of the names of any invalid config options.
+        """
+        config = self.model.config
+        invalid_options = []
+
+        max_threads = config["server-max-threads"]
+        min_threads = config["server-min-threads"]
+        if max_threads < 1:
+            logger.warning(
+                "The 'server-max-threads' must be at least 1, got %s.",
+                max_threads)
+            invalid_options.append("server-max-threads")
+        if not 1 <= min_threads <= max_threads:
+            logger.warning(
+                "The 'server-min-threads' (%s) must be between 1 and "
+                "'server-max-threads' (%s).", min_threads, max_threads)
+            invalid_options.append("server-min-threads")
+        if config["server-max-queued-requests"] < 1:
+            logger.warning(
+                "The 'server-max-queued-requests' must be at least 1, "
+                "got %s.", config["server-max-queued-requests"])
+            invalid_options.append("server-max-queued-requests")
+
+        thread_pool_config.update({
+            "maxThreads": max_threads,
+            "minThreads": min_threads,
+            "maxQueuedRequests": config["server-max-queued-requests"]})
+        return invalid_options
+
+    def _add_server_connector_config_from_charm_config(
+            self, connector: dict) -> list:
+        """This method adds the settings of the Dropwizard server's HTTP
+        application connector derived from the charm config into the
+        provided dict.
+
+        Returns:
+            List of the names of any invalid config options.
+        """
+        config = self.model.config
+        invalid_options = []
+
+        idle_timeout = config["server-idle-timeout"]
+        if not DROPWIZARD_DURATION_REGEX.match(idle_timeout):
+            logger.warning(
+                "Invalid 'server-idle-timeout' '%s'. Must be a duration such "
+                "as '30 seconds'.", idle_timeout)
+            invalid_options.append("server-idle-timeout")
+        connector.update({
+            "type": APPLICATION_CONNECTOR_TYPE_HTTP,
+            "port": APPLICATION_CONNECTOR_PORT_HTTP,
+            "idleTimeout": idle_timeout})
+
+        connector_threads = 0
+        for option_name, connector_key in [
+                ("server-acceptor-threads", "acceptorThreads"),
+                ("server-selector-threads", "selectorThreads")]:
+            value = config[option_name]
+            # NOTE: -1 leaves the thread counts to Jetty's CPU-based defaults:
+            if value == -1:
+                continue
+            if value < 1:
+                logger.warning(
+                    "The '%s' must be -1 (Jetty default) or at least 1, "
+                    "got %s.", option_name, value)
+                invalid_options.append(option_name)
+            connector_threads += value
+            connector[connector_key] = value
+        max_threads = config["server-max-threads"]
+        if connector_threads >= max_threads:
+            logger.warning(
+                "The 'server-max-threads' (%s) must exceed the sum of the "
+                "acceptor and selector threads (%s).",
+                max_threads, connector_threads)
+            invalid_options.append("server-max-threads")
+        return invalid_options
+
+    def _add_gzip_config_from_charm_config(self, gzip_config: dict) -> list:
+        """This method adds the Dropwizard response compression settings
+        derived from the charm config into the provided dict.
+
+        Returns:
+            List of the names of any invalid config options.
+        """
+        config = self.model.config
+        invalid_options = []
+
+        minimum_size = config["server-gzip-minimum-size"]
+        if _parse_dropwizard_size(minimum_size) is None:
+            logger.warning(
+                "Invalid 'server-gzip-minimum-size' '%s'. Must be a size "
+                "such as '256 bytes' or '1KiB'.", minimum_size)
+            invalid_options.append("server-gzip-minimum-size")
+
+        compression_level = config["server-gzip-compression-level"]
+        if not -1 <= compression_level <= 9:
+            logger.warning(
+                "The 'server-gzip-compression-level' must be between -1 "
+                "(zlib default) and 9, got %s.", compression_level)
+            invalid_options.append("server-gzip-compression-level")
+
+        mime_types = self._get_gzip_mime_types_from_config()
+        if not mime_types:
+            logger.warning("The 'server-gzip-mime-types' must not be empty.")
+            invalid_options.append("server-gzip-mime-types")
+
+        gzip_config.update({
+            "enabled": config["server-gzip-enabled"],
+            "minimumEntitySize": minimum_size,
+            "compressedMimeTypes": mime_types,
+            "deflateCompressionLevel": compression_level})
+        return invalid_options
+
+    def _get_gzip_mime_types_from_config(self) -> list:
+        """Returns the list of compressible MIME types from the config."""
+        return [
+            mime_type.strip()
+            for mime_type in self.model.config[
+                "server-gzip-mime-types"].split(",")
+            if mime_type.strip()]
+
+    def _precompress_webapp_assets(self, container: model.Container) -> None:
+        """Writes gzip-compressed copies (`<asset>.gz`) of all compressible
+        Studio webapp assets alongside the originals in the container, so
+        front-ends supporting pre-compressed assets need not compress them
+        on every request.
+
+        The assets are only compressed once per container and set of gzip
+        settings, as tracked by a marker file in the container.
+        """
+        if not self.model.config["webapp-precompress-assets"]:
+            return
+
+        minimum_size = _parse_dropwizard_size(
+            self.model.config["server-gzip-minimum-size"])
+        compression_level = self.model.config[
+            "server-gzip-compression-level"]
+        extensions = sorted({
+            extension
+            for mime_type in self._get_gzip_mime_types_from_config()
+            for extension in STUDIO_WEBAPP_MIME_TYPE_EXTENSIONS.get(
+                mime_type, [])})
+        if minimum_size is None or not extensions or not (
+                -1 <= compression_level <= 9):
+            logger.warning(
+                "Not pre-compressing webapp assets due to invalid gzip "
+                "config options")
+            return
+
+        fingerprint = _get_fingerprint(json.dumps(
+            [minimum_size, compression_level, extensions]))
+        if self._container_file_matches(
+                container, STUDIO_WEBAPP_PRECOMPRESSION_MARKER_PATH,
+                fingerprint):
+            logger.debug("Studio webapp assets already pre-compressed")
+            return
+
+        # NOTE: gzip has no notion of zlib's -1 default level, which is 6:
+        level = 6 if compression_level == -1 else max(compression_level, 1)
+        name_filters = " -o ".join(
+            "-name '*%s'" % extension for extension in extensions)
+        command = (
+            "find %s -type f \\( %s \\) -size +%dc "
+            "-exec gzip -k -f -%d {} +" % (
+                STUDIO_WEBAPP_CONTENT_DIR, name_filters,
+                max(minimum_size - 1, 0), level))
+        logger.info("Pre-compressing Studio webapp assets: %s", command)
+        try:
+            process = container.exec(
+                ["/bin/sh", "-c", command],
+                timeout=STUDIO_WEBAPP_PRECOMPRESSION_TIMEOUT)
+            process.wait_output()
+        except (pebble.ChangeError, pebble.ExecError) as ex:
+            logger.warning(
+                "Failed to pre-compress Studio webapp assets: %s", str(ex))
+            return
+        container.push(
+            STUDIO_WEBAPP_PRECOMPRESSION_MARKER_PATH, fingerprint,
+            make_dirs=True)
+
+    def _add_webapp_cache_rules_from_charm_config(
+            self, cache_rules: list) -> model.BlockedStatus:
+        """This method adds the `Cache-Control` header rules for the Studio
+        webapp paths derived from the charm config into the provided list.
+        Each rule is a dict of the form: {
+            "path": "<absolute request path>",
+            "prefix": <whether to match all paths under 'path'>,
+            "cache_control": "<Cache-Control header value>"
+        }
+        The content-hashed assets under the static path are immutable, while
+        the (unhashed) worker scripts and the UI/version configs get shorter
+        or no caching so updates are picked up.
+
+        NOTE: the Studio's static server offers no way of setting response
+        headers, so these rules are to be applied by whatever front-end
+        serves the webapp assets.
+
+        Returns:
+            None if all of the cache-related config options are valid.
+            A `model.BlockedStatus` instance with a relevant message otherwise.
+        """
+        config = self.model.config
+        invalid_options = [
+            option_name for option_name in [
+                "webapp-static-cache-max-age", "webapp-worker-cache-max-age",
+                "webapp-config-cache-max-age"]
+            if config[option_name] < 0]
+        if invalid_options:
+            logger.warning(
+                "The following cache TTL options must not be negative: %s",
+                invalid_options)
+            return model.BlockedStatus(
+                "invalid webapp cache config option(s): %s" % (
+                    ", ".join(invalid_options)))
+
+        def _get_cache_control(max_age, immutable=False):
+            if not max_age:
+                return "no-cache"
+            return "public, max-age=%d%s" % (
+                max_age, ", immutable" if immutable else "")
+
+        cache_rules.append({
+            "path": "%s%s/" % (
+                APPLICATION_SERVER_UI_PATH, STUDIO_WEBAPP_STATIC_PATH),
+            "prefix": True,
+            "cache_control": _get_cache_control(
+                config["webapp-static-cache-max-age"], immutable=True)})
+        for paths, option_name in [
+                (STUDIO_WEBAPP_WORKER_PATHS, "webapp-worker-cache-max-age"),
+                (STUDIO_WEBAPP_CONFIG_PATHS, "webapp-config-cache-max-age")]:
+            cache_rules.extend([{
+                "path": "%s%s" % (APPLICATION_SERVER_UI_PATH, path),
+                "prefix": False,
+                "cache_control": _get_cache_control(config[option_name])}
+                for path in paths])
+        return None
+
+    def _add_ingress_options_from_charm_config(
+            self, ingress_config: dict) -> model.BlockedStatus:
+        """This method adds the session affinity, rate limiting, body size
+        and retry options of the ingress relation derived from the charm
+        config into the provided dict. Options left at their defaults are
+        not added, leaving them to the ingress integrator.
+
+        Returns:
+            None if all of the ingress-related config options are valid.
+            A `model.BlockedStatus` instance with a relevant message otherwise.
+        """
+        config = self.model.config
+        invalid_options = [
+            option_name for option_name in [
+                "ingress-session-cookie-max-age", "ingress-limit-rps"]
+            if config[option_name] < 0]
+        if config["ingress-max-body-size"] < -1:
+            invalid_options.append("ingress-max-body-size")
+
+        whitelist = [
+            cidr.strip() for cidr in config["ingress-limit-whitelist"].split(
+                ",") if cidr.strip()]
+        for cidr in whitelist:
+            try:
+                ipaddress.ip_network(cidr, strict=False)
+            except ValueError:
+                logger.warning(
+                    "Invalid CIDR in 'ingress-limit-whitelist': '%s'", cidr)
+                invalid_options.append("ingress-limit-whitelist")
+                break
+
+        retry_errors = [
+            error.strip() for error in config["ingress-retry-errors"].split(
+                ",") if error.strip()]
+        unknown_errors = [
+            error for error in retry_errors
+            if error not in VALID_INGRESS_RETRY_ERRORS]
+        if unknown_errors:
+            logger.warning(
+                "Unknown 'ingress-retry-errors' %s. Must be among: %s",
+                unknown_errors, VALID_INGRESS_RETRY_ERRORS)
+            invalid_options.append("ingress-retry-errors")
+
+        if invalid_options:
+            return model.BlockedStatus(
+                "invalid ingress config option(s): %s, please review the "
+                "debug-log for more details" % ", ".join(invalid_options))
+
+        for option_name, value in [
+                ("session-cookie-max-age",
+                 config["ingress-session-cookie-max-age"]),
+                ("limit-rps", config["ingress-limit-rps"]),
+                ("limit-whitelist", ",".join(whitelist)),
+                ("retry-errors", ",".join(retry_errors))]:
+            if value:
+                ingress_config[option_name] = value
+        if config["ingress-max-body-size"] >= 0:
+            ingress_config["max-body-size"] = config["ingress-max-body-size"]
+        return None
+
+    def _get_base_ingress_config(self) -> dict:
+        """Returns the config dict for the ingress relation without any of
+        the ingress options from the charm config.
+        """
+        ingress_config = {
+            "service-hostname": self.app.name,
+            "service-name": self.app.name,
+            "service-port": APPLICATION_CONNECTOR_PORT_HTTP}
+        # NOTE: the ingress is only pointed to the webapp proxy once it is
+        # actually serving, lest it return 502s in the meantime:
+        if self.model.config["webapp-proxy-enabled"] and (
+                self._stored.webapp_proxy_active):
+            ingress_config["service-port"] = WEBAPP_PROXY_PORT
+        return ingress_config
+
+    def _get_ingress_config(self) -> dict:
+        """Returns the config dict for the ingress relation. The ingress
+        options from the charm config are only included if all are valid.
+        """
+        ingress_config = self._get_base_ingress_config()
+        options = {}
+        if not self._add_ingress_options_from_charm_config(options):
+            ingress_config.update(options)
+        return ingress_config
+
+    def _update_ingress_relation(self) -> None:
+        """Updates the ingress relation data from the charm config.
+
+        NOTE: if any of the ingress options are invalid, the relation data
+        is left as is, so the ingress keeps serving with the last valid
+        options instead of having all of them dropped.
+        """
+        ingress_config = self._get_base_ingress_config()
+        possible_blocked_status = (
+            self._add_ingress_options_from_charm_config(ingress_config))
+        if possible_blocked_status:
+            logger.warning(
+                "Not updating the ingress relation: %s",
+                possible_blocked_status.message)
+            return
+        if self._update_ingress_relation_data(ingress_config):
+            logger.info("Updated the options on the ingress relation")
+
+    def _update_ingress_relation_data(self, ingress_config: dict) -> bool:
+        """Writes the provided config dict into the ingress relation's data,
+        only setting the keys whose values changed and removing any ingress
+        options no longer part of it, as every write of the relation data
+        has the ingress integrator reload nginx.
+
+        NOTE: `IngressRequires.update_config` rewrites every key and never
+        removes any, so the relation data is diffed here instead.
+
+        Returns whether the relation data was changed.
+        """
+        # NOTE: the library writes its config dict whenever the relation
+        # changes, so it must be kept in sync:
+        self.ingress.config_dict = ingress_config
+        relation = self.model.get_relation("ingress")
+        if not relation or not self.unit.is_leader():
+            return False
+
+        relation_data = relation.data[self.app]
+        changed = False
+        for key in sorted(
+                set(ingress_config) | set(INGRESS_CHARM_MANAGED_OPTIONS)):
+            if key in ingress_config:
+                value = str(ingress_config[key])
+                if relation_data.get(key) != value:
+                    relation_data[key] = value
+                    changed = True
+            elif key in relation_data:
+                del relation_data[key]
+                changed = True
+        return changed
+
+    def _add_logging_appender_config_from_charm_config(
+            self, appender: dict) -> model.BlockedStatus:
+        """This method adds the settings of the console log appender derived
+        from the charm config into the provided dict.
+
+        NOTE: Dropwizard wraps all appenders into asynchronous ones, whose
+        bounded queue is what these settings configure. The 'production'
+        logging profile never blocks request threads on a full queue.
+
+        Returns:
+            None if all of the logging-related config options are valid.
+            A `model.BlockedStatus` instance with a relevant message otherwise.
+        """
+        config = self.model.config
+        invalid_options = []
+
+        profile = config["logging-profile"]
+        if profile not in VALID_LOGGING_PROFILES:
+            logger.warning(
+                "Invalid logging profile '%s'. Valid profiles are: %s",
+                profile, VALID_LOGGING_PROFILES)
+            invalid_options.append("logging-profile")
+
+        queue_size = config["logging-queue-size"]
+        if queue_size < 1:
+            logger.warning(
+                "The 'logging-queue-size' must be at least 1, got %s.",
+                queue_size)
+            invalid_options.append("logging-queue-size")
+
+        discarding_threshold = config["logging-discarding-threshold"]
+        if not -1 <= discarding_threshold < max(queue_size, 1):
+            logger.warning(
+                "The 'logging-discarding-threshold' (%s) must be -1 (20%% of "
+                "the queue size), 0 (never discard) or lower than the "
+                "'logging-queue-size' (%s).",
+                discarding_threshold, queue_size)
+            invalid_options.append("logging-discarding-threshold")
+
+        if invalid_options:
+            return model.BlockedStatus(
+                "invalid logging config option(s): %s, please review the "
+                "debug-log for more details" % ", ".join(invalid_options))
+
+        appender.update({
+            "type": "console",
+            "queueSize": queue_size,
+            "discardingThreshold": discarding_threshold,
+            "neverBlock": config["logging-never-block"] or (
+                profile == LOGGING_PROFILE_PRODUCTION)})
+        if config["logging-json-layout"]:
+            appender["layout"] = {"type": "json"}
+        return None
+
+    def _get_mongo_uri_with_options_from_config(self, mongo_uri: str) -> str:
+        """Returns the provided MongoDB connection string with the connection
+        pool, timeout, read preference and compression options from the charm
+        config merged into its query string. Options already present in the
+        connection string are overridden by any set through the config.
+
+        Returns None if any of the Mongo-related config options are invalid.
+        """
+        uri_options = self._get_mongo_uri_options_from_config()
+        if uri_options is None:
+            return None
+        if not uri_options:
+            return mongo_uri
+
+        # NOTE: existing options are kept verbatim (i.e. not re-encoded), and
+        # MongoDB connection string option names are case-insensitive:
+        overridden_options = {option.lower() for option in uri_options}
+        split_uri = urllib.parse.urlsplit(mongo_uri)
+        query = [
+            option for option in split_uri.query.split("&")
+            if option and (
+                option.split("=")[0].lower() not in overridden_options)]
+        query.append(urllib.parse.urlencode(
+            sorted(uri_options.items()), safe=","))
+        return urllib.parse.urlunsplit((
+            split_uri.scheme, split_uri.netloc,
+            # NOTE: options must be preceded by a slash even without a DB:
+            split_uri.path or "/",
+            "&".join(query),
+            split_uri.fragment))
+
+    def _get_mongo_uri_options_from_config(self) -> dict:
+        """Returns a dict of the MongoDB connection string options set
+        through the charm config, mapping option names to their values.
+
+        Returns None if any of the Mongo-related config options are invalid.
+        """
+        config = self.model.config
+        invalid_options = []
+
+        uri_options = {}
+        for uri_option, option_name in MONGO_URI_INT_OPTIONS.items():
+            value = config[option_name]
+            if value == -1:
+                continue
+            if value < 0:
+                logger.warning(
+                    "The '%s' must be -1 (driver default) or non-negative, "
+                    "got %s.", option_name, value)
+                invalid_options.append(option_name)
+                continue
+            uri_options[uri_option] = str(value)
+        if "maxPoolSize" in uri_options and "minPoolSize" in uri_options and (
+                # NOTE: a maxPoolSize of 0 means an unbounded pool:
+                0 < int(uri_options["maxPoolSize"]) < int(
+                    uri_options["minPoolSize"])):
+            logger.warning(
+                "The 'mongo-min-pool-size' must not exceed the "
+                "'mongo-max-pool-size'.")
+            invalid_options.append("mongo-min-pool-size")
+
+        read_preference = config["mongo-read-preference"]
+        if read_preference:
+            if read_preference not in VALID_MONGO_READ_PREFERENCES:
+                logger.warning(
+                    "Invalid 'mongo-read-preference' '%s'. Valid read "
+                    "preferences are: %s",
+                    read_preference, VALID_MONGO_READ_PREFERENCES)
+                invalid_options.append("mongo-read-preference")
+            uri_options["readPreference"] = read_preference
+
+        compressors = [
+            compressor.strip()
+            for compressor in config["mongo-compressors"].split(",")
+            if compressor.strip()]
+        if compressors:
+            invalid_compressors = [
+                compressor for compressor in compressors
+                if compressor not in VALID_MONGO_COMPRESSORS]
+            if invalid_compressors:
+                logger.warning(
+                    "Invalid 'mongo-compressors' %s. Valid compressors "
+                    "are: %s", invalid_compressors, VALID_MONGO_COMPRESSORS)
+                invalid_options.append("mongo-compressors")
+            uri_options["compressors"] = ",".join(compressors)
+
+        if invalid_options:
+            return None
+        return uri_options
+
+    def _get_session_index_spec_from_config(self) -> dict:
+        """Returns a dict with the spec of the indexes to be managed on the
+        Studio's user session collection as derived from the charm config, or
+        None if the session-related config options are invalid.
+        """
+        config = self.model.config
+        ttl_seconds = config["session-ttl-seconds"]
+        if ttl_seconds < 0:
+            logger.warning(
+                "The 'session-ttl-seconds' must not be negative, got %s.",
+                ttl_seconds)
+            return None
+        ttl_field = config["session-ttl-field"].strip()
+        if ttl_seconds and not ttl_field:
+            logger.warning(
+                "The 'session-ttl-field' must be set for sessions to expire.")
+            return None
+
+        return {
+            "ttl_field": ttl_field,
+            "ttl_seconds": ttl_seconds,
+            "lookup_fields": [
+                field.strip()
+                for field in config["session-lookup-index-fields"].split(",")
+                if field.strip()]}
+
+    def _ensure_session_indexes(self, force: bool = False) -> list:
+        """Ensures the indexes on the Studio's user session collection match
+        the spec from the charm config. Unless forced, MongoDB is only
+        contacted if the spec or the DB credentials changed since the last
+        successful run.
+
+        Returns:
+            List of the names of the indexes on the session collection, or
+            None if they were not (successfully) checked.
+        """
+        mongo_creds = self._stored.legend_db_credentials
+        index_spec = self._get_session_index_spec_from_config()
+        if not mongo_creds or not index_spec:
+            return None
+        mongo_uri = self._get_mongo_uri_with_options_from_config(
+            mongo_creds["uri"])
+        if not mongo_uri:
+            return None
+
+        fingerprint = _get_fingerprint(json.dumps(
+            [mongo_uri, mongo_creds["database"], index_spec], sort_keys=True))
+        if not force and (
+                fingerprint == self._stored.session_indexes_fingerprint):
+            return None
+
+        try:
+            import mongo_sessions
+            index_names = mongo_sessions.ensure_session_indexes(
+                mongo_uri, mongo_creds["database"], STUDIO_SESSION_COLLECTION,
+                **index_spec)
+        except Exception as ex:
+            logger.exception(ex)
+            logger.warning(
+                "Failed to ensure indexes on the session collection, will "
+                "retry on the next reconfiguration")
+            return None
+        self._stored.session_indexes_fingerprint = fingerprint
+        logger.info("Session collection indexes: %s", index_names)
+        return index_names
+
     def _add_base_service_config_from_charm_config(
             self, studio_http_config: dict = {}) -> model.BlockedStatus:
         """This method adds all relevant Studio config options into the
@@ -240,6 +1698,13 @@ class LegendStudioServerOperatorCharm(charm.CharmBase):
             return model.BlockedStatus(
                 "requires relating to: finos-legend-db-k8s")
 
+        mongo_uri = self._get_mongo_uri_with_options_from_config(
+            mongo_creds['uri'])
+        if not mongo_uri or not self._get_session_index_spec_from_config():
+            return model.BlockedStatus(
+                "one or more mongo config options are invalid, please review "
+                "the debug-log for more details")
+
         # Check GitLab-related options:
         legend_gitlab_creds = self._stored.legend_gitlab_credentials
         if not legend_gitlab_creds:
@@ -261,32 +1726,39 @@ class LegendStudioServerOperatorCharm(charm.CharmBase):
             return model.BlockedStatus(
                 "one or more logging config options are improperly formatted "
                 "or missing, please review the debug-log for more details")
+        logging_appender = {}
+        possible_blocked_status = (
+            self._add_logging_appender_config_from_charm_config(
+                logging_appender))
+        if possible_blocked_status:
+            return possible_blocked_status
+        if self.model.config["logging-profile"] == LOGGING_PROFILE_PRODUCTION:
+            pac4j_logging_level = LOGGING_PRODUCTION_PAC4J_LEVEL
+
+        # Check server connector options:
+        server_config = {}
+        possible_blocked_status = self._add_server_config_from_charm_config(
+            server_config)
+        if possible_blocked_status:
+            return possible_blocked_status
 
         # Compile base config:
         studio_http_config.update({
             "uiPath": APPLICATION_SERVER_UI_PATH,
             "html5Router": True,
-            "server": {
-                "type": "simple",
-                "applicationContextPath": "/",
-                "adminContextPath": "%s/admin" % APPLICATION_SERVER_UI_PATH,
-                "connector": {
-                    "type": APPLICATION_CONNECTOR_TYPE_HTTP,
-                    "port": APPLICATION_CONNECTOR_PORT_HTTP
-                }
-            },
+            "server": server_config,
             "logging": {
                 "level": server_logging_level,
                 "loggers": {
                     "root": {"level": server_logging_level},
                     "org.pac4j": {"level": pac4j_logging_level}
                 },
-                "appenders": [{"type": "console"}]
+                "appenders": [logging_appender]
             },
             "pac4j": {
                 "callbackPrefix": "/studio/log.in",
                 "bypassPaths": ["/studio/admin/healthcheck"],
-                "mongoUri": mongo_creds['uri'],
+                "mongoUri": mongo_uri,
                 "mongoDb": mongo_creds['database'],
                 "clients": [{
                     "org.finos.legend.server.pac4j.gitlab.GitlabClient": {
@@ -300,20 +1772,13 @@ class LegendStudioServerOperatorCharm(charm.CharmBase):
                 }],
                 "mongoSession": {
                     "enabled": True,
-                    "collection": "userSessions"
+                    "collection": STUDIO_SESSION_COLLECTION
                 }
             },
             # TODO(aznashwan): check if these are necessary:
-            "routerExemptPaths": [
-                "/editor.worker.js",
-                "/json.worker.js",
-                "/editor.worker.js.map",
-                "/json.worker.js.map",
-                "/version.json",
-                "/config.json",
-                "/favicon.ico",
-                "/static"
-            ],
+            "routerExemptPaths": (
+                STUDIO_WEBAPP_WORKER_PATHS + STUDIO_WEBAPP_CONFIG_PATHS + [
+                    "/favicon.ico", STUDIO_WEBAPP_STATIC_PATH]),
             "localAssetPaths": {
                 "/studio/config.json": (
                     STUDIO_UI_CONFIG_FILE_CONTAINER_LOCAL_PATH)
@@ -322,34 +1787,169 @@ class LegendStudioServerOperatorCharm(charm.CharmBase):
 
         return None
 
-    def _add_config_file_to_container(
+    def _add_file_to_container(
             self, container: model.Container, container_path: str,
-            config: dict) -> None:
-        """Serializes the provided config dict to JSON and adds it in the
-        Studio service container under the provided path via Pebble API.
+            contents) -> None:
+        """Adds the provided str/bytes contents in the Studio service
+        container under the provided path via Pebble API.
         """
-        logger.debug(
-            "Adding following config under '%s' in container: %s",
-            container_path, config)
-        container.push(
-            container_path,
-            json.dumps(config),
-            make_dirs=True)
+        container.push(container_path, contents, make_dirs=True)
         logger.info(
-            "Successfully wrote config file in container under '%s'",
+            "Successfully wrote file in container under '%s'",
             container_path)
 
+    def _push_changed_files_to_container(
+            self, container: model.Container, container_files: dict) -> list:
+        """Pushes the files whose fingerprint differs from the one recorded
+        during the last push, or which are missing from the container.
+
+        Args:
+            container_files: dict mapping container paths to tuples of the
+                form `(fingerprint, contents)`.
+
+        Returns:
+            List of container paths which were (re)written.
+        """
+        changed_paths = []
+        for container_path, (fingerprint, contents) in sorted(
+                container_files.items()):
+            previous_fingerprint = self._stored.config_fingerprints.get(
+                container_path)
+            if previous_fingerprint == fingerprint and container.exists(
+                    container_path):
+                logger.debug(
+                    "Contents of '%s' unchanged (fingerprint %s), skipping "
+                    "push", container_path, fingerprint)
+                continue
+            if self._container_file_matches(
+                    container, container_path, contents):
+                logger.debug(
+                    "Contents of '%s' already present in container, "
+                    "skipping push", container_path)
+                self._stored.config_fingerprints[container_path] = (
+                    fingerprint)
+                continue
+
+            logger.debug(
+                "Fingerprint of '%s' changed from %s to %s",
+                container_path, previous_fingerprint, fingerprint)
+            self._add_file_to_container(container, container_path, contents)
+            self._stored.config_fingerprints[container_path] = fingerprint
+            changed_paths.append(container_path)
+
+        return changed_paths
+
+    def _container_file_matches(
+            self, container: model.Container, container_path: str,
+            contents) -> bool:
+        """Returns whether the file under the given path in the container
+        has exactly the provided str/bytes contents.
+        """
+        if not container.exists(container_path):
+            return False
+        if isinstance(contents, str):
+            contents = contents.encode()
+        with container.pull(container_path, encoding=None) as fin:
+            remote_contents = fin.read()
+        return _get_fingerprint(remote_contents) == _get_fingerprint(contents)
+
     def _restart_studio_service(self, container: model.Container) -> None:
         """Restarts the Studio service using the Pebble container API.
         """
         logger.debug("Restarting Studio service")
         container.restart("studio")
+        self._stored.studio_restart_time = time.time()
+        self._stored.studio_restart_pending = False
         logger.debug("Successfully issued Studio service restart")
 
-    def _write_java_truststore_to_container(self, container):
+    def _is_studio_ready(self, container: model.Container) -> bool:
+        """Returns whether the Studio is answering its admin healthcheck.
+
+        NOTE: Pebble only marks checks as down after `threshold` consecutive
+        failures, so a freshly restarted service would be reported as up. The
+        charm (which shares the pod's network namespace) hence probes the
+        healthcheck URL itself, only short-circuiting on a down Pebble check.
+        """
+        check = container.get_checks(STUDIO_HEALTHCHECK_NAME).get(
+            STUDIO_HEALTHCHECK_NAME)
+        if check and check.status == pebble.CheckStatus.DOWN:
+            return False
+        return self._is_studio_healthcheck_passing()
+
+    def _is_studio_healthcheck_passing(self) -> bool:
+        """Returns whether the Studio's admin healthcheck URL answers OK."""
+        import urllib.request
+        timeout = _parse_pebble_duration(
+            self.model.config["healthcheck-timeout"])
+        try:
+            with urllib.request.urlopen(
+                    self._get_studio_healthcheck_url(),
+                    timeout=timeout) as response:
+                return response.status == 200
+        except OSError as ex:
+            # NOTE: this includes `urllib.error.URLError`s:
+            logger.debug("Studio healthcheck failed: %s", str(ex))
+            return False
+
+    def _update_studio_readiness_status(
+            self, container: model.Container,
+            wait_timeout: float = None) -> bool:
+        """Checks whether the Studio passes its healthcheck, polling it for up
+        to the given number of seconds, and sets the unit's status
+        accordingly.
+
+        When given a timeout following a restart, the latency between the
+        restart and the Studio becoming ready is recorded, or only a lower
+        bound of it if the Studio did not become ready in time. A unit left
+        waiting is moved on by the update-status hook or the Pebble check
+        events.
+
+        Returns whether the Studio is ready.
+        """
+        deadline = time.monotonic() + (wait_timeout or 0)
+        ready = self._is_studio_ready(container)
+        while not ready and time.monotonic() < deadline:
+            time.sleep(STUDIO_READINESS_POLL_INTERVAL)
+            ready = self._is_studio_ready(container)
+        self._set_studio_peer_readiness(ready)
+
+        if wait_timeout is not None and self._stored.studio_restart_time:
+            latency = time.time() - self._stored.studio_restart_time
+            self._stored.studio_readiness_latency = latency
+            self._stored.studio_readiness_latency_lower_bound = not ready
+            self._stored.studio_restart_time = 0.0
+            if ready:
+                logger.info(
+                    "Studio passed its healthcheck %.2fs after being "
+                    "restarted", latency)
+            else:
+                logger.info(
+                    "Studio did not pass its healthcheck within %.2fs of "
+                    "being restarted", latency)
+
+        if not ready:
+            self.unit.status = model.WaitingStatus(
+                STUDIO_AWAITING_READINESS_MESSAGE)
+            return False
+        self.unit.status = model.ActiveStatus()
+        return True
+
+    def _is_studio_service_running(self, container: model.Container) -> bool:
+        """Returns whether the Studio service is defined and running."""
+        service = container.get_services("studio").get("studio")
+        return bool(service and service.is_running())
+
+    def _add_java_truststore_from_relation_data(
+            self, container_files: dict) -> model.BlockedStatus:
         """Creates a Java jsk truststore from the certificate in the GitLab
-        relation data and adds it into the container under the appropriate
-        path.
+        relation data and adds it into the provided dict of container files
+        under the appropriate path.
+
+        NOTE: the serialized keystore embeds its creation timestamp, so its
+        fingerprint is derived from the certificate and passphrase instead.
+        The serialized keystore is cached under said fingerprint to avoid
+        rebuilding (and re-hashing) it on every reconfiguration.
+
         Returns a `model.BlockedStatus` if any issue occurs.
         """
         gitlab_cert_b64 = self._stored.legend_gitlab_credentials.get(
@@ -365,72 +1965,192 @@ class LegendStudioServerOperatorCharm(charm.CharmBase):
             logger.exception(ex)
             return model.BlockedStatus("failed to decode b64 cert")
 
-        keystore_dump = None
-        try:
-            cert_entry = jks.TrustedCertEntry.new(
-                TRUSTSTORE_NAME, gitlab_cert_raw)
-            keystore = jks.KeyStore.new(
-                TRUSTSTORE_TYPE_JKS, [cert_entry])
-            keystore_dump = keystore.saves(TRUSTSTORE_PASSPHRASE)
-        except Exception as ex:
-            logger.exception(ex)
-            return model.BlockedStatus(
-                "failed to create jks keystore: %s", str(ex))
+        truststore_fingerprint = _get_fingerprint(
+            gitlab_cert_raw + TRUSTSTORE_PASSPHRASE.encode())
+        keystore_dump = self._get_cached_java_truststore(
+            truststore_fingerprint)
+        if keystore_dump is None:
+            try:
+                keystore_dump = self._build_java_truststore(gitlab_cert_raw)
+            except Exception as ex:
+                logger.exception(ex)
+                return model.BlockedStatus(
+                    "failed to create jks keystore: %s" % str(ex))
+            self._stored.truststore_cache = {
+                "fingerprint": truststore_fingerprint,
+                "keystore_b64": base64.b64encode(keystore_dump).decode()}
+
+        container_files[TRUSTSTORE_CONTAINER_LOCAL_PATH] = (
+            truststore_fingerprint, keystore_dump)
+        return None
 
+    def _build_java_truststore(self, cert_raw: bytes) -> bytes:
+        """Returns the serialized jks truststore containing the provided
+        DER-encoded certificate, protected by the truststore passphrase.
+        """
+        import jks
+        cert_entry = jks.TrustedCertEntry.new(TRUSTSTORE_NAME, cert_raw)
+        keystore = jks.KeyStore.new(TRUSTSTORE_TYPE_JKS, [cert_entry])
+        return keystore.saves(TRUSTSTORE_PASSPHRASE)
+
+    def _get_cached_java_truststore(self, fingerprint: str) -> bytes:
+        """Returns the serialized truststore previously built from the
+        inputs with the given fingerprint, or None if it is not cached.
+        """
+        cache = self._stored.truststore_cache
+        if cache.get("fingerprint") != fingerprint:
+            return None
         logger.debug(
-            "Adding jks trustore under '%s' in container",
-            TRUSTSTORE_CONTAINER_LOCAL_PATH)
-        container.push(
-            TRUSTSTORE_CONTAINER_LOCAL_PATH,
-            keystore_dump,
-            make_dirs=True)
-        logger.info(
-            "Successfully wrote java truststore file to %s",
-            TRUSTSTORE_CONTAINER_LOCAL_PATH)
+            "Reusing cached java truststore with fingerprint %s",
+            fingerprint)
+        return base64.b64decode(cache["keystore_b64"])
+
+    def _get_metrics_exporter_jar(self) -> bytes:
+        """Returns the contents of the Prometheus JMX exporter agent jar
+        attached as a charm resource, or None if it is not attached.
+        """
+        try:
+            jar_path = self.model.resources.fetch(METRICS_EXPORTER_RESOURCE)
+        except (model.ModelError, NameError) as ex:
+            logger.debug(
+                "No '%s' resource attached, Studio metrics will not be "
+                "exported: %s", METRICS_EXPORTER_RESOURCE, str(ex))
+            return None
+        with open(jar_path, "rb") as fin:
+            contents = fin.read()
+        # NOTE: Charmhub requires file resources to be uploaded, so an empty
+        # file stands for the resource not being provided:
+        return contents or None
+
+    def _add_metrics_exporter_files(self, container_files: dict) -> list:
+        """Adds the Prometheus JMX exporter agent jar and its config into the
+        provided dict of container files.
+
+        Returns:
+            List of the JVM options loading the exporter agent, or an empty
+            list if the exporter agent resource is not attached.
+        """
+        exporter_jar = self._get_metrics_exporter_jar()
+        if not exporter_jar:
+            return []
+
+        exporter_config = json.dumps({
+            "lowercaseOutputName": True,
+            "lowercaseOutputLabelNames": True,
+            "rules": METRICS_EXPORTER_DROPWIZARD_RULES})
+        for container_path, contents in [
+                (METRICS_EXPORTER_JAR_CONTAINER_LOCAL_PATH, exporter_jar),
+                (METRICS_EXPORTER_CONFIG_FILE_CONTAINER_LOCAL_PATH,
+                 exporter_config)]:
+            container_files[container_path] = (
+                _get_fingerprint(contents), contents)
+
+        return ["-javaagent:%s=%d:%s" % (
+            METRICS_EXPORTER_JAR_CONTAINER_LOCAL_PATH, METRICS_EXPORTER_PORT,
+            METRICS_EXPORTER_CONFIG_FILE_CONTAINER_LOCAL_PATH)]
+
+    def _set_metrics_endpoint_relation_data(self, relations: list) -> None:
+        """Publishes the Studio's metrics scrape job and unit address on the
+        provided `prometheus_scrape` relations, skipping any unchanged keys.
+
+        NOTE: this runs on every reconfiguration, so the unit's address is
+        only looked up (through a network-get) for existing relations.
+        """
+        if not relations:
+            return
+        scrape_jobs = []
+        if self._stored.metrics_exporter_enabled:
+            scrape_jobs.append({
+                "metrics_path": METRICS_EXPORTER_PATH,
+                "static_configs": [{
+                    "targets": ["*:%d" % METRICS_EXPORTER_PORT]}]})
+        app_data = {
+            "scrape_metadata": json.dumps({
+                "model": self.model.name,
+                "model_uuid": self.model.uuid,
+                "application": self.app.name,
+                "unit": self.unit.name,
+                "charm_name": self.meta.name}),
+            "scrape_jobs": json.dumps(scrape_jobs)}
+
+        for relation in relations:
+            unit_data = {
+                "prometheus_scrape_unit_address": (
+                    self._get_studio_bind_address(relation) or ""),
+                "prometheus_scrape_unit_name": self.unit.name}
+            data_pairs = [(relation.data[self.unit], unit_data)]
+            if self.unit.is_leader():
+                data_pairs.append((relation.data[self.app], app_data))
+            for relation_data, data in data_pairs:
+                for key, value in data.items():
+                    if relation_data.get(key) != value:
+                        relation_data[key] = value
 
     def _reconfigure_studio_service(self) -> None:
         """Generates the JSON config for the Studio server and adds it
         into the container via Pebble files API.
         - regenerating the JSON config for the Studio server
         - regenerating the JSON config containing the Engine/SDLC URLs
-        - adding said configs via Pebble
+        - adding said configs via Pebble if their fingerprints changed
+        - updating the Pebble layer if the JVM options changed
         - instructing Pebble to restart the Studio server
-        The Studio is power-cycled for the new configuration to take effect.
+        The Studio is only power-cycled if any of its files were rewritten or
+        if the service is not already running. The unit only becomes active
+        once the Studio passes its healthcheck.
+
+        The configs and truststore are only rendered by the leader, with the
+        other units applying the revision of them it publishes on the peer
+        relation. (see `_add_shared_config_files`)
         """
-        config = {}
-        possible_blocked_status = (
-            self._add_base_service_config_from_charm_config(config))
+        container_files = {}
+        possible_blocked_status = self._add_shared_config_files(
+            container_files)
         if possible_blocked_status:
             self.unit.status = possible_blocked_status
             return
+        config_revision = self._get_studio_config_revision(container_files)
 
-        ui_config = {}
-        possible_blocked_status = self._add_ui_config_from_relation_data(
-            ui_config)
+        jvm_options = []
+        possible_blocked_status = self._add_jvm_options_from_charm_config(
+            jvm_options)
         if possible_blocked_status:
             self.unit.status = possible_blocked_status
             return
 
-        container = self.unit.get_container("studio")
-        if container.can_connect():
+        checks = {}
+        possible_blocked_status = self._add_pebble_checks_from_charm_config(
+            checks)
+        if possible_blocked_status:
+            self.unit.status = possible_blocked_status
+            return
+
+        # NOTE: the cache rules are only applied by the webapp proxy:
+        cache_rules = []
+        if self.model.config["webapp-proxy-enabled"]:
             possible_blocked_status = (
-                self._write_java_truststore_to_container(
-                    container))
+                self._add_webapp_cache_rules_from_charm_config(cache_rules))
             if possible_blocked_status:
                 self.unit.status = possible_blocked_status
                 return
+            logger.debug("Studio webapp cache rules: %s", cache_rules)
+
+        possible_blocked_status = (
+            self._add_ingress_options_from_charm_config({}))
+        if possible_blocked_status:
+            self.unit.status = possible_blocked_status
+            return
+
+        possible_blocked_status = self._check_rolling_restart_config()
+        if possible_blocked_status:
+            self.unit.status = possible_blocked_status
+            return
+        self._end_reconfiguration_phase("render-options")
 
-            logger.debug("Updating Studio service configuration")
-            self._add_config_file_to_container(
-                container,
-                STUDIO_HTTP_CONFIG_FILE_CONTAINER_LOCAL_PATH,
-                config)
-            self._add_config_file_to_container(
-                container,
-                STUDIO_UI_CONFIG_FILE_CONTAINER_LOCAL_PATH,
-                ui_config)
-            self._restart_studio_service(container)
-            self.unit.status = model.ActiveStatus()
+        container = self.unit.get_container("studio")
+        if container.can_connect():
+            self._apply_studio_config(
+                container, container_files, config_revision, jvm_options,
+                checks, cache_rules)
             return
 
         logger.info("Studio container is not active yet. No config to update.")
@@ -438,23 +2158,1020 @@ class LegendStudioServerOperatorCharm(charm.CharmBase):
             "requires relating to: finos-legend-db-k8s, "
             "finos-legend-gitlab-integrator-k8s")
 
-    def _get_studio_service_url(self):
-        ip_address = subprocess.check_output(
-            ["unit-get", "private-address"]).decode().strip()
+    def _apply_studio_config(
+            self, container: model.Container, container_files: dict,
+            config_revision: str, jvm_options: list, checks: dict,
+            cache_rules: list) -> None:
+        """Pushes the provided (validated) Studio config files and Pebble
+        layer into the container, restarting the Studio if any of them
+        changed. (see `_reconfigure_studio_service`)
+        """
+        metrics_jvm_options = self._add_metrics_exporter_files(
+            container_files)
+        self._end_reconfiguration_phase("metrics-exporter")
+
+        logger.debug(
+            "Updating Studio service configuration to revision %s",
+            config_revision)
+        changed_paths = self._push_changed_files_to_container(
+            container, container_files)
+        self._set_applied_studio_config_revision(config_revision)
+        self._end_reconfiguration_phase("push-files")
+        self._reconfigure_webapp_proxy(container, cache_rules)
+        self._end_reconfiguration_phase("webapp-proxy")
+        # NOTE: the AppCDS archive is only generated once this unit holds a
+        # restart lock, as the training run weighs as much as a Studio start.
+        # The Pebble layer assumes it will be, and is reverted should the
+        # generation fail:
+        appcds_options, appcds_fingerprint = (
+            self._get_studio_appcds_archive_options(container, jvm_options))
+        self._end_reconfiguration_phase("appcds")
+        # NOTE: the exporter agent and continuous recording are not enabled
+        # during the AppCDS training run as they would clash with the running
+        # Studio's port and recording file respectively:
+        runtime_jvm_options = list(metrics_jvm_options)
+        if self.model.config["jvm-continuous-recording"]:
+            runtime_jvm_options.extend(JFR_CONTINUOUS_RECORDING_OPTIONS)
+        self._stored.metrics_exporter_enabled = bool(metrics_jvm_options)
+        if self._update_studio_pebble_layer(
+                container, self._get_studio_pebble_layer(
+                    jvm_options + appcds_options + runtime_jvm_options,
+                    checks)):
+            changed_paths.append("pebble layer")
+        if appcds_fingerprint:
+            changed_paths.append("AppCDS archive")
+        self._end_reconfiguration_phase("pebble-layer")
+
+        if not self._is_studio_restart_required(container, changed_paths):
+            self._end_reconfiguration_phase("restart")
+            self.unit.status = model.MaintenanceStatus(
+                STUDIO_AWAITING_READINESS_MESSAGE)
+            self._update_studio_readiness_status(container)
+            self._end_reconfiguration_phase("readiness")
+            return
+        self._restart_studio_service_under_lock(
+            container, jvm_options, self._get_studio_pebble_layer(
+                jvm_options + runtime_jvm_options, checks),
+            appcds_fingerprint)
+
+    def _is_studio_restart_required(
+            self, container: model.Container, changed_paths: list) -> bool:
+        """Returns whether the Studio service must be (re)started following
+        changes to the provided list of its files, any earlier changes it was
+        not restarted for yet, or it simply not running.
+        """
+        if changed_paths:
+            logger.info(
+                "Restarting Studio following changes to: %s", changed_paths)
+            self._stored.studio_restart_pending = True
+        elif self._stored.studio_restart_pending:
+            logger.info(
+                "Restarting Studio following earlier changes to its "
+                "configuration")
+        elif not self._is_studio_service_running(container):
+            logger.info(
+                "Studio configuration unchanged but the service is not "
+                "running, starting it")
+        else:
+            self._stored.restarts_avoided += 1
+            logger.info(
+                "Studio configuration fingerprints unchanged, skipping "
+                "service restart (restarts avoided so far: %d)",
+                self._stored.restarts_avoided)
+            return False
+        return True
+
+    def _restart_studio_service_under_lock(
+            self, container: model.Container, jvm_options: list,
+            fallback_layer: dict, appcds_fingerprint: str) -> None:
+        """Restarts the Studio service once this unit holds a rolling restart
+        lock, generating its AppCDS archive beforehand if required, and waits
+        for it to pass its healthcheck. The lock is released as soon as the
+        Studio is ready again. (see `_set_studio_peer_readiness`)
+
+        The restart is deferred until the lock is granted otherwise.
+        """
+        if not self._acquire_restart_lock():
+            logger.info(
+                "Deferring Studio restart until the leader grants this unit "
+                "a restart lock")
+            self._end_reconfiguration_phase("restart")
+            self.unit.status = model.MaintenanceStatus(
+                STUDIO_AWAITING_RESTART_LOCK_MESSAGE)
+            return
+        appcds_ready_time = self._apply_studio_appcds_archive(
+            container, jvm_options, fallback_layer, appcds_fingerprint)
+        self._end_reconfiguration_phase("appcds-generation")
+        self._restart_studio_service(container)
+        self._end_reconfiguration_phase("restart")
+
+        self.unit.status = model.MaintenanceStatus(
+            STUDIO_AWAITING_READINESS_MESSAGE)
+        self._update_studio_readiness_status(
+            container, STUDIO_READINESS_POLL_TIMEOUT)
+        self._log_studio_appcds_ready_times(appcds_ready_time)
+        self._end_reconfiguration_phase("readiness")
+
+    def _add_shared_config_files(
+            self, container_files: dict) -> model.StatusBase:
+        """Adds the Studio http/UI configs and truststore shared by all units
+        into the provided dict of container files.
+
+        The leader renders them from its relation data and publishes them on
+        the peer relation, while the other units only apply the files last
+        published by the leader. This way units neither need to render the
+        files themselves nor risk diverging configs.
+
+        Returns:
+            None if the files were added. A `model.BlockedStatus` if the
+            leader could not render them, or a `model.WaitingStatus` if the
+            leader has not published them yet.
+        """
+        if not self.unit.is_leader():
+            possible_status = self._add_shared_config_files_from_peers(
+                container_files)
+            self._end_reconfiguration_phase("peer-config")
+            return possible_status
+
+        config = {}
+        possible_blocked_status = (
+            self._add_base_service_config_from_charm_config(config))
+        if possible_blocked_status:
+            return possible_blocked_status
+
+        ui_config = {}
+        possible_blocked_status = self._add_ui_config_from_relation_data(
+            ui_config)
+        if possible_blocked_status:
+            return possible_blocked_status
+
+        logger.debug("Rendered Studio http config: %s", config)
+        logger.debug("Rendered Studio UI config: %s", ui_config)
+        for container_path, contents in [
+                (STUDIO_HTTP_CONFIG_FILE_CONTAINER_LOCAL_PATH,
+                 json.dumps(config)),
+                (STUDIO_UI_CONFIG_FILE_CONTAINER_LOCAL_PATH,
+                 json.dumps(ui_config))]:
+            container_files[container_path] = (
+                _get_fingerprint(contents), contents)
+        self._end_reconfiguration_phase("render-config")
+
+        possible_blocked_status = (
+            self._add_java_truststore_from_relation_data(container_files))
+        if possible_blocked_status:
+            return possible_blocked_status
+        self._end_reconfiguration_phase("truststore")
+
+        self._publish_shared_config_files(container_files)
+        self._end_reconfiguration_phase("peer-publish")
+        return None
+
+    def _get_studio_config_revision(self, container_files: dict) -> str:
+        """Returns the revision of the provided dict of container files,
+        derived from their paths and fingerprints.
+        """
+        return _get_fingerprint(json.dumps(sorted(
+            (path, fingerprint)
+            for path, (fingerprint, _) in container_files.items())))
+
+    def _publish_shared_config_files(self, container_files: dict) -> None:
+        """Publishes the provided shared container files on the peer
+        relation, unless their revision is already published.
+        """
+        relation = self.model.get_relation(STUDIO_PEER_RELATION_NAME)
+        if not relation:
+            logger.debug(
+                "No '%s' relation yet, not publishing the Studio config",
+                STUDIO_PEER_RELATION_NAME)
+            return
+
+        revision = self._get_studio_config_revision(container_files)
+        relation_data = relation.data[self.app]
+        if relation_data.get(STUDIO_PEER_CONFIG_REVISION_KEY) == revision:
+            return
+        logger.info("Publishing Studio config revision %s", revision)
+        relation_data[STUDIO_PEER_CONFIG_FILES_KEY] = json.dumps({
+            path: [fingerprint, base64.b64encode(
+                contents.encode() if isinstance(contents, str)
+                else contents).decode()]
+            for path, (fingerprint, contents) in container_files.items()})
+        relation_data[STUDIO_PEER_CONFIG_REVISION_KEY] = revision
+
+    def _add_shared_config_files_from_peers(
+            self, container_files: dict) -> model.WaitingStatus:
+        """Adds the shared container files last published by the leader on
+        the peer relation into the provided dict of container files.
+
+        Returns a `model.WaitingStatus` if none were published yet.
+        """
+        relation = self.model.get_relation(STUDIO_PEER_RELATION_NAME)
+        relation_data = relation.data[self.app] if relation else {}
+        revision = relation_data.get(STUDIO_PEER_CONFIG_REVISION_KEY)
+        if not revision:
+            return model.WaitingStatus(STUDIO_AWAITING_PEER_CONFIG_MESSAGE)
+
+        logger.debug("Applying Studio config revision %s", revision)
+        published_files = json.loads(
+            relation_data[STUDIO_PEER_CONFIG_FILES_KEY])
+        for path, (fingerprint, contents_b64) in published_files.items():
+            container_files[path] = (
+                fingerprint, base64.b64decode(contents_b64))
+        return None
+
+    def _set_applied_studio_config_revision(self, revision: str) -> None:
+        """Records the revision of the shared config files applied by this
+        unit in stored state and its peer relation data.
+        """
+        self._stored.studio_config_revision = revision
+        relation = self.model.get_relation(STUDIO_PEER_RELATION_NAME)
+        if relation and relation.data[self.unit].get(
+                STUDIO_PEER_CONFIG_REVISION_KEY) != revision:
+            relation.data[self.unit][STUDIO_PEER_CONFIG_REVISION_KEY] = (
+                revision)
+
+    def _sync_webapp_assets(self, container: model.Container) -> None:
+        """Copies the Studio webapp assets (including any pre-compressed
+        copies) from the Studio's classpath into the volume shared with the
+        webapp proxy container.
+
+        The assets are only copied if their listing changed since the last
+        copy, as tracked by a marker file in the shared volume.
+        """
+        try:
+            fingerprint = _get_fingerprint(json.dumps(sorted(
+                "%s:%s:%s" % (f.path, f.size, f.last_modified)
+                for directory in [
+                    STUDIO_WEBAPP_ASSETS_DIR, "%s%s" % (
+                        STUDIO_WEBAPP_ASSETS_DIR, STUDIO_WEBAPP_STATIC_PATH)]
+                for f in container.list_files(directory))))
+        except pebble.APIError as ex:
+            logger.warning(
+                "Failed to list the Studio webapp assets, the webapp proxy "
+                "will forward all requests to the Studio: %s", str(ex))
+            return
+        if self._container_file_matches(
+                container, WEBAPP_ASSETS_SYNC_MARKER_PATH, fingerprint):
+            logger.debug("Studio webapp assets already in the shared volume")
+            return
+
+        # NOTE: the assets are copied aside first so the proxy never serves
+        # a partially copied set of them:
+        assets_dir = "%s%s" % (WEBAPP_ASSETS_DIR, APPLICATION_SERVER_UI_PATH)
+        command = (
+            "rm -rf %(dest)s.new && cp -a %(src)s %(dest)s.new && "
+            "rm -rf %(dest)s && mv %(dest)s.new %(dest)s" % {
+                "src": STUDIO_WEBAPP_ASSETS_DIR, "dest": assets_dir})
+        logger.info("Copying Studio webapp assets: %s", command)
+        try:
+            process = container.exec(
+                ["/bin/sh", "-c", command],
+                timeout=WEBAPP_ASSETS_SYNC_TIMEOUT)
+            process.wait_output()
+        except (pebble.ChangeError, pebble.ExecError) as ex:
+            logger.warning(
+                "Failed to copy the Studio webapp assets: %s", str(ex))
+            return
+        container.push(
+            WEBAPP_ASSETS_SYNC_MARKER_PATH, fingerprint, make_dirs=True)
+
+    def _get_webapp_proxy_nginx_config(self, cache_rules: list) -> str:
+        """Returns the nginx config of the webapp proxy, which serves the
+        `WEBAPP_PROXY_LOCAL_PATHS` from the shared volume (falling back to
+        the Studio for any missing ones) and forwards all other requests
+        to the Studio, applying the provided cache rules.
+        (see `_add_webapp_cache_rules_from_charm_config`)
+        """
+        locations = []
+        for rule in cache_rules:
+            handler = "proxy_pass http://studio;"
+            if rule["path"] in WEBAPP_PROXY_LOCAL_PATHS:
+                handler = "try_files $uri @studio;"
+            locations.append(WEBAPP_PROXY_NGINX_LOCATION_FORMAT % {
+                "match": "%s %s" % (
+                    "^~" if rule["prefix"] else "=", rule["path"]),
+                "cache_control": rule["cache_control"],
+                "handler": handler})
+        return WEBAPP_PROXY_NGINX_CONFIG_FORMAT % {
+            "studio_port": APPLICATION_CONNECTOR_PORT_HTTP,
+            "port": WEBAPP_PROXY_PORT,
+            "root": WEBAPP_ASSETS_DIR,
+            "locations": "".join(locations)}
+
+    def _get_webapp_proxy_pebble_layer(self) -> dict:
+        return {
+            "summary": "Studio webapp proxy layer.",
+            "description": "Pebble config layer for the Studio webapp proxy.",
+            "services": {
+                WEBAPP_PROXY_SERVICE_NAME: {
+                    "override": "replace",
+                    "summary": "studio webapp proxy",
+                    "command": "nginx -c %s -g 'daemon off;'" % (
+                        WEBAPP_PROXY_CONFIG_FILE_CONTAINER_LOCAL_PATH),
+                    "startup": "enabled",
+                }
+            },
+        }
+
+    def _reconfigure_webapp_proxy(
+            self, studio_container: model.Container,
+            cache_rules: list) -> None:
+        """Sets up the webapp proxy in its container if it is enabled, or
+        stops it otherwise.
+
+        The proxy is only restarted if its Pebble layer changed or it is not
+        running, and merely reloads its config if only the latter changed.
+        """
+        container = self.unit.get_container(WEBAPP_PROXY_CONTAINER_NAME)
+        if not container.can_connect():
+            logger.debug("Webapp proxy container is not active yet")
+            self._set_webapp_proxy_active(False)
+            return
+        service = container.get_services(WEBAPP_PROXY_SERVICE_NAME).get(
+            WEBAPP_PROXY_SERVICE_NAME)
+        service_running = bool(service and service.is_running())
+        if not self.model.config["webapp-proxy-enabled"]:
+            self._set_webapp_proxy_active(False)
+            if service_running:
+                logger.info("Stopping the Studio webapp proxy")
+                container.stop(WEBAPP_PROXY_SERVICE_NAME)
+            return
+
+        self._sync_webapp_assets(studio_container)
+        nginx_config = self._get_webapp_proxy_nginx_config(cache_rules)
+        config_changed = bool(self._push_changed_files_to_container(
+            container, {WEBAPP_PROXY_CONFIG_FILE_CONTAINER_LOCAL_PATH: (
+                _get_fingerprint(nginx_config), nginx_config)}))
+
+        layer = self._get_webapp_proxy_pebble_layer()
+        current_service = container.get_plan().services.get(
+            WEBAPP_PROXY_SERVICE_NAME)
+        desired_service = pebble.Service(
+            WEBAPP_PROXY_SERVICE_NAME,
+            layer["services"][WEBAPP_PROXY_SERVICE_NAME])
+        layer_changed = not current_service or (
+            current_service.to_dict() != desired_service.to_dict())
+        if layer_changed:
+            container.add_layer(WEBAPP_PROXY_SERVICE_NAME, layer, combine=True)
+
+        if layer_changed or not service_running:
+            logger.info("(Re)starting the Studio webapp proxy")
+            container.restart(WEBAPP_PROXY_SERVICE_NAME)
+        elif config_changed:
+            # NOTE: nginx gracefully reloads its config on SIGHUP, without
+            # dropping any in-flight requests:
+            logger.info("Reloading the Studio webapp proxy config")
+            container.send_signal("SIGHUP", WEBAPP_PROXY_SERVICE_NAME)
+        self._set_webapp_proxy_active(True)
+
+    def _is_webapp_proxy_running(self) -> bool:
+        container = self.unit.get_container(WEBAPP_PROXY_CONTAINER_NAME)
+        if not container.can_connect():
+            return False
+        service = container.get_services(WEBAPP_PROXY_SERVICE_NAME).get(
+            WEBAPP_PROXY_SERVICE_NAME)
+        return bool(service and service.is_running())
+
+    def _set_webapp_proxy_active(self, active: bool) -> None:
+        """Records whether the webapp proxy is serving, pointing the ingress
+        to it or back to the Studio itself if that changed.
+        """
+        if self._stored.webapp_proxy_active == active:
+            return
+        self._stored.webapp_proxy_active = active
+        logger.info(
+            "Pointing the ingress to the %s",
+            "webapp proxy" if active else "Studio server")
+        self._update_ingress_relation()
+
+    def _check_rolling_restart_config(self) -> model.BlockedStatus:
+        """Returns a `model.BlockedStatus` if the rolling restart config
+        options are invalid, or None otherwise.
+        """
+        config = self.model.config
+        invalid_options = []
+        if config["rolling-restart-batch-size"] < 1:
+            invalid_options.append("rolling-restart-batch-size")
+        if config["rolling-restart-min-ready-units"] < 0:
+            invalid_options.append("rolling-restart-min-ready-units")
+        if invalid_options:
+            logger.warning(
+                "The 'rolling-restart-batch-size' must be at least 1 and the "
+                "'rolling-restart-min-ready-units' must not be negative.")
+            return model.BlockedStatus(
+                "invalid rolling restart config option(s): %s" % (
+                    ", ".join(invalid_options)))
+        return None
+
+    def _get_restart_locks(self, relation: model.Relation) -> dict:
+        """Returns the restart locks granted by the leader on the peer
+        relation, as a dict mapping unit names to the restart requests they
+        were granted for.
+        """
+        return json.loads(
+            relation.data[self.app].get(STUDIO_PEER_RESTART_LOCKS_KEY) or "{}")
+
+    def _acquire_restart_lock(self) -> bool:
+        """Requests a rolling restart lock from the leader through the peer
+        relation, granting it right away if this unit is the leader.
+        Units without any peers need no lock.
+
+        Returns whether this unit holds a restart lock.
+        """
+        relation = self.model.get_relation(STUDIO_PEER_RELATION_NAME)
+        if not relation or not relation.units:
+            return True
+
+        unit_data = relation.data[self.unit]
+        if not unit_data.get(STUDIO_PEER_RESTART_REQUEST_KEY):
+            logger.info("Requesting a rolling restart lock from the leader")
+            unit_data[STUDIO_PEER_RESTART_REQUEST_KEY] = "%f" % time.time()
+        if self.unit.is_leader():
+            self._grant_restart_locks(relation)
+        return self._get_restart_locks(relation).get(self.unit.name) == (
+            unit_data[STUDIO_PEER_RESTART_REQUEST_KEY])
+
+    def _grant_restart_locks(self, relation: model.Relation) -> None:
+        """Releases the restart locks of the units which completed their
+        restart (or departed) and grants new ones to the units requesting
+        them, oldest requests first.
+
+        At most `rolling-restart-batch-size` locks are held at once, and
+        locks are only granted to units whose Studio is ready if at least
+        `rolling-restart-min-ready-units` others would remain ready. (capped
+        to the number of other units so restarts always make progress)
+        """
+        units = [self.unit] + list(relation.units)
+        requests = {
+            unit.name: relation.data[unit].get(
+                STUDIO_PEER_RESTART_REQUEST_KEY)
+            for unit in units}
+        previous_locks = self._get_restart_locks(relation)
+        locks = {
+            name: request for name, request in previous_locks.items()
+            if request and requests.get(name) == request}
+        ready_units = {
+            unit.name for unit in units
+            if unit.name not in locks and relation.data[unit].get(
+                STUDIO_PEER_READY_KEY) == "true"}
+        min_ready_units = min(
+            self.model.config["rolling-restart-min-ready-units"],
+            len(units) - 1)
+
+        for name, request in sorted(
+                requests.items(), key=lambda item: (item[1] or "", item[0])):
+            if not request or name in locks:
+                continue
+            if len(locks) >= self.model.config["rolling-restart-batch-size"]:
+                break
+            if name in ready_units:
+                # NOTE: units which are not ready yet may still be granted
+                # locks, as restarting them costs no capacity:
+                if len(ready_units) - 1 < min_ready_units:
+                    continue
+                ready_units.remove(name)
+            logger.info("Granting a rolling restart lock to %s", name)
+            locks[name] = request
+
+        if locks != previous_locks:
+            relation.data[self.app][STUDIO_PEER_RESTART_LOCKS_KEY] = (
+                json.dumps(locks, sort_keys=True))
+
+    def _set_studio_peer_readiness(self, ready: bool) -> None:
+        """Reports the Studio's readiness in the unit's peer relation data,
+        releasing any restart lock it holds once it is ready following the
+        restart.
+        """
+        relation = self.model.get_relation(STUDIO_PEER_RELATION_NAME)
+        if not relation:
+            return
+        unit_data = relation.data[self.unit]
+        ready_value = "true" if ready else "false"
+        if unit_data.get(STUDIO_PEER_READY_KEY) != ready_value:
+            unit_data[STUDIO_PEER_READY_KEY] = ready_value
+        if ready and not self._stored.studio_restart_pending and (
+                unit_data.get(STUDIO_PEER_RESTART_REQUEST_KEY)):
+            logger.info("Releasing rolling restart lock")
+            del unit_data[STUDIO_PEER_RESTART_REQUEST_KEY]
+        if self.unit.is_leader():
+            self._grant_restart_locks(relation)
+
+    def _get_studio_bind_address(
+            self, binding_key="legend-studio-gitlab") -> str:
+        """Returns the address of the Studio unit on the network binding of
+        the given relation (or relation name), or None if it is not known yet.
+        """
+        try:
+            binding = self.model.get_binding(binding_key)
+            bind_address = binding.network.bind_address if binding else None
+        except model.ModelError as ex:
+            logger.debug("Failed to resolve Studio bind address: %s", ex)
+            return None
+        return str(bind_address) if bind_address else None
+
+    def _get_studio_service_url(self, host: str) -> str:
         return STUDIO_SERVICE_URL_FORMAT % ({
             # NOTE(aznashwan): we always return the plain HTTP endpoint:
             "schema": "http",
-            "host": ip_address,
+            "host": host,
             "port": APPLICATION_CONNECTOR_PORT_HTTP,
             "path": APPLICATION_SERVER_UI_PATH})
 
+    def _get_studio_gitlab_redirect_uris(self) -> list:
+        """Returns the GitLab redirect URIs for the Studio, both through its
+        ingress hostname and its unit's bound address.
+
+        The bound address is resolved once and cached in stored state. Call
+        `_refresh_gitlab_redirect_uris` to resolve it anew.
+        """
+        if not self._stored.studio_bind_address:
+            self._stored.studio_bind_address = (
+                self._get_studio_bind_address() or "")
+
+        base_urls = ["http://%s%s" % (
+            self.ingress.config_dict["service-hostname"],
+            APPLICATION_SERVER_UI_PATH)]
+        if self._stored.studio_bind_address:
+            base_urls.append(self._get_studio_service_url(
+                self._stored.studio_bind_address))
+        return [
+            STUDIO_GITLAB_REDIRECT_URI_FORMAT % {"base_url": base_url}
+            for base_url in base_urls]
+
+    def _set_gitlab_redirect_uris_in_relations(
+            self, relations: list, redirect_uris: list) -> None:
+        """Sets the provided GitLab redirect URIs in the data of the given
+        GitLab relations, skipping any which already hold them.
+        """
+        if not self.unit.is_leader():
+            logger.debug(
+                "Only the leader sets the GitLab redirect URIs, skipping")
+            return
+        for relation in relations:
+            relation_data = relation.data[self.app]
+            if relation_data.get("legend-gitlab-redirect-uris") == (
+                    json.dumps(redirect_uris)):
+                continue
+            logger.info(
+                "Setting GitLab redirect URIs in relation %s: %s",
+                relation.id, redirect_uris)
+            legend_gitlab.set_legend_gitlab_redirect_uris_in_relation_data(
+                relation_data, redirect_uris)
+
+    def _refresh_gitlab_redirect_uris(self) -> None:
+        """Resolves the Studio's bound address anew and updates the redirect
+        URIs on all GitLab relations if they (i.e. the address or ingress
+        hostname they are derived from) changed.
+
+        NOTE: only the leader publishes the redirect URIs, so the stored
+        ones are only updated once written, letting a newly elected leader
+        publish its own.
+        """
+        bind_address = self._get_studio_bind_address()
+        if bind_address:
+            self._stored.studio_bind_address = bind_address
+        if not self.unit.is_leader():
+            return
+        redirect_uris = self._get_studio_gitlab_redirect_uris()
+        if redirect_uris == list(self._stored.gitlab_redirect_uris):
+            return
+        logger.info(
+            "GitLab redirect URIs changed from %s to %s",
+            list(self._stored.gitlab_redirect_uris), redirect_uris)
+        self._set_gitlab_redirect_uris_in_relations(
+            self.model.relations["legend-studio-gitlab"], redirect_uris)
+        self._stored.gitlab_redirect_uris = redirect_uris
+
+    def _schedule_studio_reconfiguration(self) -> None:
+        """Marks the Studio workload as requiring reconfiguration.
+        The reconfiguration is performed only once, when the framework
+        commits at the end of the current hook dispatch, regardless of how
+        many (re-emitted deferred) events requested it.
+        """
+        if not self._reconfiguration_scheduled:
+            logger.debug(
+                "Scheduling Studio reconfiguration for the end of the hook")
+        self._reconfiguration_scheduled = True
+
+    def _on_pre_commit(self, _) -> None:
+        """Performs any Studio reconfiguration scheduled during this hook
+        dispatch. Runs on pre-commit so that any stored state changes made
+        during the reconfiguration are still persisted.
+        """
+        if not self._reconfiguration_scheduled:
+            return
+        self._reconfiguration_scheduled = False
+        self._reconfiguration_timings = {}
+        start_time = self._reconfiguration_phase_start = time.monotonic()
+        self._reconfigure_studio_service()
+        if self.unit.is_leader():
+            self._ensure_session_indexes()
+            self._end_reconfiguration_phase("session-indexes")
+        self._set_metrics_endpoint_relation_data(
+            self.model.relations["metrics-endpoint"])
+        self._reconfiguration_timings["total"] = (
+            time.monotonic() - start_time)
+        self._record_reconfiguration_timings(self._reconfiguration_timings)
+
+    def _end_reconfiguration_phase(self, phase: str) -> None:
+        """Records the time elapsed since the previous phase of the ongoing
+        Studio reconfiguration ended as the duration of the given phase.
+        """
+        end_time = time.monotonic()
+        self._reconfiguration_timings[phase] = (
+            end_time - self._reconfiguration_phase_start)
+        self._reconfiguration_phase_start = end_time
+
+    def _record_reconfiguration_timings(self, timings: dict) -> None:
+        """Records the provided phase durations of a reconfiguration as the
+        latest ones in stored state, keeping only the most recent
+        `RECONFIGURATION_TIMING_SAMPLES` durations of each phase.
+        """
+        logger.info(
+            "Studio reconfiguration phase timings (ms): %s", ", ".join(
+                "%s=%.1f" % (phase, duration * 1000)
+                for phase, duration in timings.items()))
+        samples = {
+            phase: list(durations) for phase, durations in
+            self._stored.reconfiguration_timings.get("samples", {}).items()}
+        for phase, duration in timings.items():
+            phase_samples = samples.setdefault(phase, [])
+            phase_samples.append(duration)
+            del phase_samples[:-RECONFIGURATION_TIMING_SAMPLES]
+        self._stored.reconfiguration_timings = {
+            "latest": dict(timings),
+            "latest_time": time.time(),
+            "samples": samples}
+
     def _on_config_changed(self, _) -> None:
         """Reacts to configuration changes to the service by:
         - regenerating the YAML config for the Studio server
         - adding it via Pebble
         - instructing Pebble to restart the Studio server
+        - updating the ingress options on the ingress relation
         """
-        self._reconfigure_studio_service()
+        container = self.unit.get_container("studio")
+        if container.can_connect():
+            self._precompress_webapp_assets(container)
+        self._refresh_gitlab_redirect_uris()
+        self._update_ingress_relation()
+        self._schedule_studio_reconfiguration()
+
+    def _on_studio_peers_relation_changed(
+            self, event: charm.RelationEvent) -> None:
+        """Has non-leader units apply any Studio config revision newly
+        published by the leader, or any restart lock granted to them.
+
+        The leader instead (re)grants the restart locks, and only publishes
+        its own config if it has not done so on the relation yet.
+        """
+        if not self.unit.is_leader():
+            self._schedule_studio_reconfiguration()
+            return
+
+        self._grant_restart_locks(event.relation)
+        request = event.relation.data[self.unit].get(
+            STUDIO_PEER_RESTART_REQUEST_KEY)
+        if not event.relation.data[self.app].get(
+                STUDIO_PEER_CONFIG_REVISION_KEY) or (
+                    request and self._stored.studio_restart_pending and (
+                        self._get_restart_locks(event.relation).get(
+                            self.unit.name) == request)):
+            self._schedule_studio_reconfiguration()
+
+    def _on_leader_elected(self, _) -> None:
+        """Has the new leader publish the GitLab redirect URIs, and render
+        and publish the Studio config.
+        """
+        self._refresh_gitlab_redirect_uris()
+        self._schedule_studio_reconfiguration()
+
+    def _on_update_status(self, _) -> None:
+        """Points the ingress back to the Studio server if the webapp proxy
+        stopped, and re-evaluates the Studio's readiness if the unit is
+        active or still waiting for the Studio to pass its healthcheck.
+        """
+        if self._stored.webapp_proxy_active and (
+                not self._is_webapp_proxy_running()):
+            logger.warning("The Studio webapp proxy is no longer running")
+            self._set_webapp_proxy_active(False)
+            self._schedule_studio_reconfiguration()
+        self._refresh_studio_readiness_status()
+
+    def _on_studio_pebble_check_changed(
+            self, event: charm.PebbleCheckEvent) -> None:
+        """Re-evaluates the Studio's readiness as soon as Pebble reports its
+        healthcheck as failing or recovered.
+        """
+        if event.info.name != STUDIO_HEALTHCHECK_NAME:
+            return
+        self._refresh_studio_readiness_status()
+
+    def _refresh_studio_readiness_status(self) -> None:
+        """Re-evaluates the Studio's readiness if the unit is active or
+        still waiting for the Studio to pass its healthcheck.
+        """
+        status = self.unit.status
+        if not isinstance(status, model.ActiveStatus) and (
+                status.message != STUDIO_AWAITING_READINESS_MESSAGE):
+            return
+        container = self.unit.get_container("studio")
+        if not container.can_connect():
+            return
+        self._update_studio_readiness_status(container)
+
+    def _on_ensure_session_indexes_action(
+            self, event: charm.ActionEvent) -> None:
+        if not self._stored.legend_db_credentials:
+            event.fail("requires relating to: finos-legend-db-k8s")
+            return
+        if not self._get_session_index_spec_from_config():
+            event.fail(
+                "invalid session config options, please review the "
+                "debug-log for more details")
+            return
+        index_names = self._ensure_session_indexes(force=True)
+        if index_names is None:
+            event.fail(
+                "failed to ensure session collection indexes, please review "
+                "the debug-log for more details")
+            return
+        event.set_results({"indexes": ", ".join(index_names)})
+
+    def _on_session_store_stats_action(
+            self, event: charm.ActionEvent) -> None:
+        mongo_creds = self._stored.legend_db_credentials
+        if not mongo_creds:
+            event.fail("requires relating to: finos-legend-db-k8s")
+            return
+        mongo_uri = self._get_mongo_uri_with_options_from_config(
+            mongo_creds["uri"])
+        if not mongo_uri:
+            event.fail(
+                "invalid mongo config options, please review the debug-log "
+                "for more details")
+            return
+
+        try:
+            import mongo_sessions
+            stats = mongo_sessions.get_session_collection_stats(
+                mongo_uri, mongo_creds["database"], STUDIO_SESSION_COLLECTION)
+        except Exception as ex:
+            logger.exception(ex)
+            event.fail("failed to fetch session collection stats: %s" % ex)
+            return
+        event.set_results({
+            "count": stats["count"],
+            "size-bytes": stats["size"],
+            "storage-size-bytes": stats["storage_size"],
+            "avg-session-size-bytes": stats["avg_session_size"],
+            "total-index-size-bytes": stats["total_index_size"],
+            # NOTE: index names are not valid action result keys:
+            "indexes": json.dumps(stats["indexes"], sort_keys=True)})
+
+    def _on_metrics_endpoint_relation_joined(
+            self, event: charm.RelationJoinedEvent) -> None:
+        if not self._stored.metrics_exporter_enabled:
+            logger.warning(
+                "Related to a metrics scraper but the '%s' resource is not "
+                "attached, no Studio metrics will be exported",
+                METRICS_EXPORTER_RESOURCE)
+        self._set_metrics_endpoint_relation_data([event.relation])
+
+    def _on_reconfiguration_timings_action(
+            self, event: charm.ActionEvent) -> None:
+        timings = self._stored.reconfiguration_timings
+        if not timings:
+            event.fail("the Studio has not been reconfigured yet")
+            return
+
+        phases = {}
+        for phase, samples in timings["samples"].items():
+            phase_results = {"samples": len(samples)}
+            if phase in timings["latest"]:
+                phase_results["latest-ms"] = "%.1f" % (
+                    timings["latest"][phase] * 1000)
+            for percentile in RECONFIGURATION_TIMING_PERCENTILES:
+                phase_results["p%d-ms" % percentile] = "%.1f" % (
+                    percentiles.get_percentile(samples, percentile) * 1000)
+            phase_results["max-ms"] = "%.1f" % (max(samples) * 1000)
+            phases[phase] = phase_results
+        event.set_results({
+            "latest-time": time.strftime(
+                "%Y-%m-%dT%H:%M:%SZ", time.gmtime(timings["latest_time"])),
+            "phases": phases})
+
+    def _run_studio_jcmd(
+            self, container: model.Container, command: str,
+            *arguments) -> str:
+        """Runs the given `jcmd` diagnostic command with the provided
+        arguments against the running Studio JVM, returning its output.
+
+        Raises:
+            jvm_diagnostics.JcmdError: if the command could not be run.
+        """
+        pid = jvm_diagnostics.get_jvm_pid(
+            container, STUDIO_MAIN_CLASS, "server")
+        return jvm_diagnostics.run_jcmd(container, pid, command, *arguments)
+
+    def _write_diagnostics_file(
+            self, container: model.Container, path: str, contents: str,
+            results: dict) -> None:
+        """Writes the full output of a diagnostic command under the given
+        path in the container (if any), recording it in the action results.
+        """
+        if not path:
+            return
+        container.push(path, contents, make_dirs=True)
+        results["path"] = path
+        results["retrieve-command"] = "juju scp --container studio %s:%s ." % (
+            self.unit.name, path)
+
+    def _on_profile_action(self, event: charm.ActionEvent) -> None:
+        container = self.unit.get_container("studio")
+        if not container.can_connect() or not (
+                self._is_studio_service_running(container)):
+            event.fail("the Studio service is not running")
+            return
+        duration = event.params["duration"]
+        if event.params["wait"] and duration > JFR_PROFILE_MAX_WAIT_DURATION:
+            event.fail(
+                "waiting on recordings longer than %ds is not allowed as it "
+                "blocks all other hooks of the unit, rerun with 'wait=false' "
+                "and retrieve the recording once done" % (
+                    JFR_PROFILE_MAX_WAIT_DURATION))
+            return
+        output_path = event.params["output-path"] or (
+            JFR_PROFILE_PATH_FORMAT % time.strftime(
+                "%Y%m%dT%H%M%SZ", time.gmtime()))
+        recording_name = "charm-profile-%d" % time.time()
+
+        try:
+            container.make_dir(
+                os.path.dirname(output_path), make_parents=True)
+            self._run_studio_jcmd(
+                container, "JFR.start", "name=%s" % recording_name,
+                "settings=%s" % event.params["settings"],
+                "duration=%ds" % duration, "filename=%s" % output_path)
+        except (jvm_diagnostics.JcmdError, pebble.PathError,
+                pebble.APIError) as ex:
+            logger.exception(ex)
+            event.fail("failed to start the JFR recording: %s" % ex)
+            return
+        results = {
+            "recording": recording_name,
+            "path": output_path,
+            "retrieve-command": "juju scp --container studio %s:%s ." % (
+                self.unit.name, output_path)}
+        if not event.params["wait"]:
+            event.set_results(results)
+            return
+
+        event.log("Recording the Studio JVM for %ds" % duration)
+        time.sleep(duration)
+        deadline = time.monotonic() + JFR_DUMP_TIMEOUT
+        while not container.exists(output_path):
+            if time.monotonic() > deadline:
+                event.fail(
+                    "JFR recording was not written to '%s' within %ds of "
+                    "finishing" % (output_path, JFR_DUMP_TIMEOUT))
+                return
+            time.sleep(1)
+        results["size-bytes"] = container.list_files(output_path)[0].size
+        event.set_results(results)
+
+    def _on_thread_dump_action(self, event: charm.ActionEvent) -> None:
+        container = self.unit.get_container("studio")
+        if not container.can_connect() or not (
+                self._is_studio_service_running(container)):
+            event.fail("the Studio service is not running")
+            return
+
+        try:
+            thread_dump = self._run_studio_jcmd(
+                container, "Thread.print", "-l")
+        except jvm_diagnostics.JcmdError as ex:
+            logger.exception(ex)
+            event.fail("failed to dump the Studio JVM threads: %s" % ex)
+            return
+        summary = jvm_diagnostics.summarize_thread_dump(
+            jvm_diagnostics.parse_thread_dump(thread_dump),
+            top=event.params["top"])
+
+        results = {
+            "thread-count": summary["thread_count"],
+            "thread-states": {
+                state.lower().replace("_", "-"): count
+                for state, count in summary["states"].items()},
+            "contended-locks": json.dumps(summary["contended_locks"]),
+            "blocked-threads": json.dumps(summary["blocked_threads"])}
+        self._write_diagnostics_file(
+            container, event.params["output-path"], thread_dump, results)
+        event.set_results(results)
+
+    def _on_heap_histogram_action(self, event: charm.ActionEvent) -> None:
+        container = self.unit.get_container("studio")
+        if not container.can_connect() or not (
+                self._is_studio_service_running(container)):
+            event.fail("the Studio service is not running")
+            return
+
+        # NOTE: unless '-all' is passed, a full GC is triggered beforehand so
+        # only live objects are counted:
+        arguments = [] if event.params["live-only"] else ["-all"]
+        try:
+            class_histogram = self._run_studio_jcmd(
+                container, "GC.class_histogram", *arguments)
+        except jvm_diagnostics.JcmdError as ex:
+            logger.exception(ex)
+            event.fail(
+                "failed to get the Studio JVM class histogram: %s" % ex)
+            return
+        classes, total = jvm_diagnostics.parse_class_histogram(
+            class_histogram)
+
+        results = {
+            "total-instances": total["instances"],
+            "total-bytes": total["bytes"],
+            "top-classes": json.dumps(classes[:event.params["top"]])}
+        self._write_diagnostics_file(
+            container, event.params["output-path"], class_histogram, results)
+        event.set_results(results)
+
+    def _get_load_test_urls(self, base_url: str, targets: list) -> list:
+        """Returns the URLs of the given load test targets of the Studio
+        served under the provided base URL (e.g. its ingress URL), or the
+        Studio unit itself if no base URL is provided.
+
+        Raises:
+            loadtest.LoadTestError: if the static assets could not be found.
+        """
+        import loadtest
+        studio_url = "%s%s" % (
+            (base_url or self._get_studio_service_url("localhost")).rstrip(
+                "/").rsplit(APPLICATION_SERVER_UI_PATH, 1)[0],
+            APPLICATION_SERVER_UI_PATH)
+
+        urls = []
+        if LOAD_TEST_TARGET_STATIC in targets:
+            static_urls = loadtest.discover_static_assets(
+                "%s/" % studio_url, timeout=LOAD_TEST_REQUEST_TIMEOUT)
+            if not static_urls:
+                raise loadtest.LoadTestError(
+                    "no static assets referenced by '%s/'" % studio_url)
+            urls.extend(static_urls)
+        if LOAD_TEST_TARGET_CONFIG in targets:
+            urls.append("%s/config.json" % studio_url)
+        if LOAD_TEST_TARGET_HEALTHCHECK in targets:
+            # NOTE: with the 'default' server type the healthcheck is only
+            # served on the unit's admin connector:
+            urls.append(
+                "%s/admin/healthcheck" % studio_url if base_url else (
+                    self._get_studio_healthcheck_url()))
+        return urls
+
+    def _on_load_test_action(self, event: charm.ActionEvent) -> None:
+        targets = [
+            target.strip() for target in event.params["targets"].split(",")
+            if target.strip()]
+        invalid_targets = [
+            target for target in targets
+            if target not in VALID_LOAD_TEST_TARGETS]
+        if not targets or invalid_targets:
+            event.fail(
+                "invalid load test targets %s, must be a comma-separated "
+                "list of: %s" % (invalid_targets, VALID_LOAD_TEST_TARGETS))
+            return
+
+        # NOTE: imported lazily as `asyncio` is costly to import:
+        import loadtest
+        try:
+            urls = self._get_load_test_urls(
+                event.params["base-url"], targets)
+            event.log("Load testing %d URLs for %ds" % (
+                len(urls), event.params["duration"]))
+            results = loadtest.run_load_test(
+                urls, concurrency=event.params["concurrency"],
+                duration=event.params["duration"],
+                timeout=LOAD_TEST_REQUEST_TIMEOUT)
+        except loadtest.LoadTestError as ex:
+            logger.exception(ex)
+            event.fail("failed to run load test: %s" % ex)
+            return
+
+        action_results = {
+            "duration": results["duration"],
+            "requests": results["requests"],
+            "errors": results["errors"],
+            "requests-per-second": results["requests_per_second"],
+            # NOTE: URLs are not valid action result keys:
+            "urls": json.dumps(results["urls"], sort_keys=True)}
+        # NOTE: latencies are only reported if any request got a response:
+        for result_name, action_result_name in [
+                ("p50_ms", "latency-p50-ms"), ("p95_ms", "latency-p95-ms"),
+                ("p99_ms", "latency-p99-ms"), ("max_ms", "latency-max-ms")]:
+            if result_name in results:
+                action_results[action_result_name] = results[result_name]
+        event.set_results(action_results)
 
     def _on_db_relation_joined(self, event: charm.RelationJoinedEvent):
         logger.debug("No actions are to be performed during DB relation join")
@@ -474,16 +3191,15 @@ class LegendStudioServerOperatorCharm(charm.CharmBase):
         self._stored.legend_db_credentials = mongo_creds
 
         # Attempt to reconfigure and restart the service with the new data:
-        self._reconfigure_studio_service()
+        self._schedule_studio_reconfiguration()
 
     def _on_legend_gitlab_relation_joined(
             self, event: charm.RelationJoinedEvent) -> None:
-        base_url = self._get_studio_service_url()
-        redirect_uris = [
-            STUDIO_GITLAB_REDIRECT_URI_FORMAT % {"base_url": base_url}]
-
-        legend_gitlab.set_legend_gitlab_redirect_uris_in_relation_data(
-            event.relation.data[self.app], redirect_uris)
+        redirect_uris = list(self._stored.gitlab_redirect_uris)
+        if not redirect_uris:
+            redirect_uris = self._get_studio_gitlab_redirect_uris()
+        self._set_gitlab_redirect_uris_in_relations(
+            [event.relation], redirect_uris)
 
     def _on_legend_gitlab_relation_changed(
             self, event: charm.RelationChangedEvent) -> None:
@@ -506,7 +3222,7 @@ class LegendStudioServerOperatorCharm(charm.CharmBase):
             return
 
         self._stored.legend_gitlab_credentials = gitlab_creds
-        self._reconfigure_studio_service()
+        self._schedule_studio_reconfiguration()
 
     def _on_sdlc_relation_joined(self, event: charm.RelationJoinedEvent):
         logger.debug("No actions are to be performed after SDLC relation join")
@@ -525,7 +3241,7 @@ class LegendStudioServerOperatorCharm(charm.CharmBase):
         self._stored.sdlc_service_url = sdlc_url
 
         # Attempt to reconfigure and restart the service with the new data:
-        self._reconfigure_studio_service()
+        self._schedule_studio_reconfiguration()
 
     def _on_engine_relation_joined(self, event: charm.RelationJoinedEvent):
         logger.debug(
@@ -545,7 +3261,7 @@ class LegendStudioServerOperatorCharm(charm.CharmBase):
         self._stored.engine_service_url = engine_url
 
         # Attempt to reconfigure and restart the service with the new data:
-        self._reconfigure_studio_service()
+        self._schedule_studio_reconfiguration()
 
 
 if __name__ == "__main__":
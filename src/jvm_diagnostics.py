@@ -0,0 +1,215 @@
+# Copyright 2021 Canonical
+# See LICENSE file for licensing details.
+
+""" Module for running `jcmd` diagnostic commands against a JVM running in a
+workload container through Pebble.
+"""
+
+import logging
+import re
+
+from ops import pebble
+
+
+logger = logging.getLogger(__name__)
+
+JCMD_TIMEOUT = 120
+
+# e.g. '"dw-42 - GET /studio/config.json" #42 prio=5 ... nid=0x2a ...':
+THREAD_HEADER_REGEX = re.compile(r'^"(.*)" .*\bnid=')
+# e.g. '- waiting to lock <0x00000000c1a2b3c4> (a java.lang.Object)':
+THREAD_LOCK_REGEX = re.compile(
+    r"^- (locked|waiting to lock) "
+    r"<(0x[0-9a-f]+)> \(a ([^)]+)\)")
+# e.g. '   1:         12345        1234567  [B (java.base@11.0.2)':
+CLASS_HISTOGRAM_ENTRY_REGEX = re.compile(
+    r"^\s*[0-9]+:\s+([0-9]+)\s+([0-9]+)\s+(\S+)")
+
+
+class JcmdError(Exception):
+    """Raised when a `jcmd` command could not be run against the JVM."""
+
+
+def _exec_jcmd(container, args, timeout=JCMD_TIMEOUT):
+    """Runs `jcmd` with the given arguments in the container, returning its
+    standard output.
+
+    Raises:
+        JcmdError: if `jcmd` is missing from the container or fails.
+    """
+    command = ["jcmd"] + [str(arg) for arg in args]
+    logger.debug("Running '%s'", " ".join(command))
+    try:
+        process = container.exec(command, timeout=timeout)
+        stdout, _ = process.wait_output()
+    except pebble.ExecError as ex:
+        raise JcmdError("'%s' exited with code %d: %s" % (
+            " ".join(command), ex.exit_code, ex.stderr or ex.stdout)) from ex
+    except (pebble.APIError, pebble.ChangeError) as ex:
+        # NOTE: JRE-only images do not ship `jcmd`:
+        raise JcmdError("failed to run '%s': %s" % (
+            " ".join(command), str(ex))) from ex
+    return stdout
+
+
+def get_jvm_pid(container, main_class, main_args_prefix=""):
+    """Returns the PID of the JVM in the container which is running the given
+    main class with arguments starting with the given prefix.
+
+    Raises:
+        JcmdError: if no such JVM is running or `jcmd` fails.
+    """
+    for line in _exec_jcmd(container, ["-l"]).splitlines():
+        # NOTE: lines are of the form '<pid> <main class> <arguments...>':
+        fields = line.split(None, 2)
+        if len(fields) < 2 or fields[1] != main_class:
+            continue
+        main_args = fields[2] if len(fields) > 2 else ""
+        if main_args.startswith(main_args_prefix):
+            return int(fields[0])
+    raise JcmdError("no JVM running '%s %s' found in the container" % (
+        main_class, main_args_prefix))
+
+
+def run_jcmd(container, pid, command, *arguments, timeout=JCMD_TIMEOUT):
+    """Runs the given diagnostic command (e.g. 'JFR.start') with the provided
+    arguments against the JVM with the given PID.
+
+    Returns:
+        The output of the diagnostic command.
+
+    Raises:
+        JcmdError: if `jcmd` fails.
+    """
+    lines = _exec_jcmd(
+        container, [pid, command] + list(arguments),
+        timeout=timeout).splitlines()
+    # NOTE: `jcmd` prefixes the command's output with a '<pid>:' line:
+    if lines and lines[0] == "%d:" % pid:
+        lines = lines[1:]
+    return "\n".join(lines)
+
+
+def parse_thread_dump(thread_dump):
+    """Parses the output of the 'Thread.print' diagnostic command.
+
+    Returns:
+        List of dicts of the following structure, one for each Java thread:
+        {
+            "name": "<thread name>",
+            "state": "<java.lang.Thread.State, e.g. BLOCKED>",
+            "frames": ["<class.method(File.java:123)>", ...],
+            "waiting_to_lock": "<address of the awaited monitor or None>",
+            "waiting_to_lock_class": "<class of the awaited monitor>",
+            "locked": ["<address of each monitor held>", ...]
+        }
+    """
+    threads = []
+    thread = None
+    for line in thread_dump.splitlines():
+        stripped = line.strip()
+        match = THREAD_HEADER_REGEX.match(line)
+        if match:
+            thread = {
+                "name": match.group(1), "state": None, "frames": [],
+                "waiting_to_lock": None, "waiting_to_lock_class": None,
+                "locked": []}
+            threads.append(thread)
+        elif thread is None or not stripped:
+            continue
+        elif stripped.startswith("java.lang.Thread.State: "):
+            thread["state"] = stripped.split()[1]
+        elif stripped.startswith("at "):
+            thread["frames"].append(stripped[3:])
+        else:
+            match = THREAD_LOCK_REGEX.match(stripped)
+            if not match:
+                continue
+            if match.group(1) == "locked":
+                thread["locked"].append(match.group(2))
+            elif thread["waiting_to_lock"] is None:
+                thread["waiting_to_lock"] = match.group(2)
+                thread["waiting_to_lock_class"] = match.group(3)
+    return threads
+
+
+def summarize_thread_dump(threads, top=10):
+    """Summarizes the threads returned by `parse_thread_dump`.
+
+    Returns:
+        Dict of the following structure:
+        {
+            "thread_count": <number of threads>,
+            "states": {"<thread state>": <number of threads in it>},
+            "contended_locks": [{
+                "lock": "<monitor address>",
+                "class": "<monitor class>",
+                "owner": "<name of the thread holding it, if known>",
+                "waiters": <number of threads blocked on it>
+            }, ...],
+            "blocked_threads": [{
+                "name": "<thread name>",
+                "waiting_to_lock": "<monitor address>",
+                "owner": "<name of the thread holding it, if known>",
+                "frame": "<topmost stack frame>"
+            }, ...]
+        }
+        Both lists contain at most `top` items, with the most contended
+        locks and the threads blocked on them listed first.
+    """
+    states = {}
+    lock_owners = {}
+    lock_waiters = {}
+    for thread in threads:
+        state = thread["state"] or "UNKNOWN"
+        states[state] = states.get(state, 0) + 1
+        for lock in thread["locked"]:
+            lock_owners[lock] = thread["name"]
+        if state == "BLOCKED" and thread["waiting_to_lock"]:
+            lock_waiters.setdefault(thread["waiting_to_lock"], []).append(
+                thread)
+
+    contended_locks = sorted(
+        lock_waiters, key=lambda lock: len(lock_waiters[lock]), reverse=True)
+    blocked_threads = [
+        {"name": thread["name"],
+         "waiting_to_lock": lock,
+         "owner": lock_owners.get(lock),
+         "frame": thread["frames"][0] if thread["frames"] else None}
+        for lock in contended_locks for thread in lock_waiters[lock]]
+    return {
+        "thread_count": len(threads),
+        "states": states,
+        "contended_locks": [
+            {"lock": lock,
+             "class": lock_waiters[lock][0]["waiting_to_lock_class"],
+             "owner": lock_owners.get(lock),
+             "waiters": len(lock_waiters[lock])}
+            for lock in contended_locks[:top]],
+        "blocked_threads": blocked_threads[:top]}
+
+
+def parse_class_histogram(class_histogram):
+    """Parses the output of the 'GC.class_histogram' diagnostic command.
+
+    Returns:
+        Tuple of the form `(classes, total)`, where `classes` is a list of
+        dicts of the form {"class": <name>, "instances": <n>, "bytes": <n>}
+        ordered by decreasing bytes, and `total` a dict of the form
+        {"instances": <n>, "bytes": <n>} for all classes.
+    """
+    classes = []
+    total = {"instances": 0, "bytes": 0}
+    for line in class_histogram.splitlines():
+        match = CLASS_HISTOGRAM_ENTRY_REGEX.match(line)
+        if match:
+            classes.append({
+                "class": match.group(3),
+                "instances": int(match.group(1)),
+                "bytes": int(match.group(2))})
+            continue
+        fields = line.split()
+        if len(fields) == 3 and fields[0] == "Total":
+            total = {"instances": int(fields[1]), "bytes": int(fields[2])}
+    classes.sort(key=lambda entry: entry["bytes"], reverse=True)
+    return classes, total
@@ -0,0 +1,286 @@
+# Copyright 2021 Canonical
+# See LICENSE file for licensing details.
+
+""" Module implementing a minimal concurrent HTTP/1.1 load generator based on
+asyncio streams, for measuring the throughput and latency of the Studio.
+"""
+
+import asyncio
+import collections
+import logging
+import re
+import ssl
+import time
+import urllib.parse
+
+import percentiles
+
+
+logger = logging.getLogger(__name__)
+
+LOAD_TEST_USER_AGENT = "finos-legend-studio-k8s-loadtest"
+LOAD_TEST_PERCENTILES = [50, 95, 99]
+# Maximum number of redirects followed when discovering the static assets:
+LOAD_TEST_MAX_REDIRECTS = 5
+# Paths of the JS/CSS assets referenced by the webapp's index page:
+STATIC_ASSET_REGEX = re.compile(
+    r"""(?:src|href)=["']([^"'?#]+\.(?:js|css))["']""")
+
+
+class LoadTestError(Exception):
+    """Raised when a load test cannot be run against the given URLs."""
+
+
+async def _open_connection(url):
+    ssl_context = None
+    if url.scheme == "https":
+        ssl_context = ssl.create_default_context()
+    return await asyncio.open_connection(
+        url.hostname, url.port or (443 if ssl_context else 80),
+        ssl=ssl_context)
+
+
+async def _read_response(reader):
+    """Reads a full HTTP response from the given stream, returning a tuple
+    of the form `(status, headers, body, keep_alive)`, with the header names
+    lowercased.
+    """
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed by the server")
+    status = int(status_line.split()[1])
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    keep_alive = headers.get("connection", "").lower() != "close"
+    body = b""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            chunk_size = int((await reader.readline()).split(b";")[0], 16)
+            if not chunk_size:
+                # NOTE: skip any trailers up to the final empty line:
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                break
+            chunks.append((await reader.readexactly(chunk_size + 2))[:-2])
+        body = b"".join(chunks)
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    else:
+        body = await reader.read()
+        keep_alive = False
+    return status, headers, body, keep_alive
+
+
+async def _get(connections, url, accept_encoding):
+    """Performs a GET request for the given parsed URL, reusing any open
+    connection to its host from the provided dict of connections.
+    Returns a tuple of the form `(status, headers, body)`.
+    """
+    key = (url.scheme, url.netloc)
+    if key not in connections:
+        connections[key] = await _open_connection(url)
+    reader, writer = connections[key]
+
+    path = url.path or "/"
+    if url.query:
+        path = "%s?%s" % (path, url.query)
+    headers = [
+        "GET %s HTTP/1.1" % path, "Host: %s" % url.netloc,
+        "User-Agent: %s" % LOAD_TEST_USER_AGENT, "Connection: keep-alive"]
+    if accept_encoding:
+        headers.append("Accept-Encoding: %s" % accept_encoding)
+    writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1"))
+    await writer.drain()
+
+    status, headers, body, keep_alive = await _read_response(reader)
+    if not keep_alive:
+        _close_connection(connections, key)
+    return status, headers, body
+
+
+def _close_connection(connections, key):
+    _, writer = connections.pop(key, (None, None))
+    if writer:
+        writer.close()
+
+
+async def _run_worker(
+        urls, offset, deadline, timeout, accept_encoding, samples):
+    """Requests the provided URLs in a round-robin fashion (starting from
+    the given offset) until the deadline passes, recording each request's
+    latency or error in the provided dict of per-URL samples.
+    """
+    loop = asyncio.get_running_loop()
+    connections = {}
+    request_count = offset
+    try:
+        while loop.time() < deadline:
+            url = urls[request_count % len(urls)]
+            request_count += 1
+            url_samples = samples[url.geturl()]
+            start_time = time.perf_counter()
+            try:
+                status, _, _ = await asyncio.wait_for(
+                    _get(connections, url, accept_encoding), timeout)
+            except (OSError, ValueError, asyncio.TimeoutError,
+                    asyncio.IncompleteReadError) as ex:
+                logger.debug("Request for %s failed: %s", url.geturl(), ex)
+                _close_connection(connections, (url.scheme, url.netloc))
+                url_samples["failures"] += 1
+                continue
+            url_samples["latencies"].append(time.perf_counter() - start_time)
+            url_samples["statuses"][status] += 1
+    finally:
+        for key in list(connections):
+            _close_connection(connections, key)
+
+
+def _summarize_samples(latencies, failures, statuses, duration):
+    summary = {
+        "requests": len(latencies) + failures,
+        "errors": failures + sum(
+            count for status, count in statuses.items()
+            if not 200 <= status < 300),
+        "requests_per_second": round(len(latencies) / duration, 1)}
+    if latencies:
+        for percentile in LOAD_TEST_PERCENTILES:
+            summary["p%d_ms" % percentile] = round(
+                percentiles.get_percentile(latencies, percentile) * 1000, 2)
+        summary["max_ms"] = round(max(latencies) * 1000, 2)
+    return summary
+
+
+async def _run_load_test(urls, concurrency, duration, timeout,
+                         accept_encoding):
+    samples = collections.defaultdict(lambda: {
+        "latencies": [], "failures": 0, "statuses": collections.Counter()})
+    start_time = asyncio.get_running_loop().time()
+    await asyncio.gather(*[
+        _run_worker(
+            urls, worker, start_time + duration, timeout, accept_encoding,
+            samples)
+        for worker in range(concurrency)])
+    elapsed = asyncio.get_running_loop().time() - start_time
+
+    all_latencies = []
+    all_failures = 0
+    all_statuses = collections.Counter()
+    results = {"urls": {}}
+    for url, url_samples in sorted(samples.items()):
+        all_latencies.extend(url_samples["latencies"])
+        all_failures += url_samples["failures"]
+        all_statuses.update(url_samples["statuses"])
+        results["urls"][url] = _summarize_samples(
+            url_samples["latencies"], url_samples["failures"],
+            url_samples["statuses"], elapsed)
+        results["urls"][url]["statuses"] = {
+            str(status): count
+            for status, count in sorted(url_samples["statuses"].items())}
+    results.update(_summarize_samples(
+        all_latencies, all_failures, all_statuses, elapsed))
+    results["duration"] = round(elapsed, 2)
+    return results
+
+
+def run_load_test(
+        urls, concurrency=10, duration=10, timeout=10,
+        accept_encoding="gzip"):
+    """Requests the provided URLs in a round-robin fashion from the given
+    number of concurrent keep-alive connections for the given duration.
+
+    Args:
+        urls: list of the `http(s)://` URLs to request.
+        concurrency: number of concurrent connections/requests.
+        duration: number of seconds to run the load test for.
+        timeout: number of seconds after which requests time out.
+        accept_encoding: value of the Accept-Encoding request header.
+
+    Returns:
+        Dictionary with the following structure:
+        {
+            "duration": <seconds the load test ran for>,
+            "requests": <total requests>,
+            "errors": <failed requests, including non-2xx responses>,
+            "requests_per_second": <responses received per second>,
+            "p50_ms"/"p95_ms"/"p99_ms"/"max_ms": <latency of the responses
+                in milliseconds, omitted if no responses were received>,
+            "urls": {
+                "<url>": {<the above statistics for the URL>,
+                          "statuses": {"<HTTP status>": <count>}}
+            }
+        }
+    """
+    parsed_urls = [urllib.parse.urlparse(url) for url in urls]
+    invalid_urls = [
+        url.geturl() for url in parsed_urls
+        if url.scheme not in ("http", "https") or not url.hostname]
+    if not urls or invalid_urls:
+        raise LoadTestError("invalid load test URLs: %s" % invalid_urls)
+    return asyncio.run(_run_load_test(
+        parsed_urls, concurrency, duration, timeout, accept_encoding))
+
+
+async def _get_following_redirects(url, timeout):
+    """Performs a GET request for the given URL, following any redirects to
+    other pages of the same host. Returns a tuple of the form
+    `(final URL, status, body)`.
+
+    Raises:
+        LoadTestError: if redirected to another host or too many times.
+    """
+    host = urllib.parse.urlparse(url).netloc
+    connections = {}
+    try:
+        for _ in range(LOAD_TEST_MAX_REDIRECTS + 1):
+            status, headers, body = await asyncio.wait_for(_get(
+                connections, urllib.parse.urlparse(url), None), timeout)
+            if not 300 <= status < 400 or "location" not in headers:
+                return url, status, body
+            url = urllib.parse.urljoin(url, headers["location"])
+            if urllib.parse.urlparse(url).netloc != host:
+                raise LoadTestError(
+                    "redirected to another host ('%s'), likely for "
+                    "authentication" % url)
+        raise LoadTestError(
+            "exceeded %d redirects" % LOAD_TEST_MAX_REDIRECTS)
+    finally:
+        for key in list(connections):
+            _close_connection(connections, key)
+
+
+def discover_static_assets(index_url, timeout=10):
+    """Returns the absolute URLs of the JS/CSS assets referenced by the
+    HTML page under the given URL which are served from the same host.
+    Redirects to other pages of the same host are followed.
+
+    Raises:
+        LoadTestError: if the page could not be fetched, or redirects to
+            another host (e.g. an authentication provider's login page).
+    """
+    try:
+        page_url, status, body = asyncio.run(
+            _get_following_redirects(index_url, timeout))
+    except (LoadTestError, OSError, ValueError, asyncio.TimeoutError,
+            asyncio.IncompleteReadError) as ex:
+        raise LoadTestError(
+            "failed to fetch '%s': %s" % (index_url, ex)) from ex
+    if status != 200:
+        raise LoadTestError(
+            "fetching '%s' returned HTTP %d" % (page_url, status))
+
+    index_host = urllib.parse.urlparse(index_url).netloc
+    asset_urls = []
+    for path in STATIC_ASSET_REGEX.findall(body.decode("utf-8", "replace")):
+        asset_url = urllib.parse.urljoin(page_url, path)
+        if urllib.parse.urlparse(asset_url).netloc == index_host and (
+                asset_url not in asset_urls):
+            asset_urls.append(asset_url)
+    return asset_urls
@@ -0,0 +1,188 @@
+# Copyright 2021 Canonical
+# See LICENSE file for licensing details.
+
+""" Module for managing the MongoDB collection storing Studio user sessions.
+"""
+
+import logging
+
+import pymongo
+from pymongo import errors
+
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL_INDEX_NAME = "legend_studio_session_ttl"
+SESSION_LOOKUP_INDEX_NAME_PREFIX = "legend_studio_session_lookup_"
+DEFAULT_SERVER_SELECTION_TIMEOUT_MS = 5000
+
+
+def _get_mongo_client(mongo_uri):
+    """Returns a `pymongo.MongoClient` for the given connection string which
+    fails fast if no server can be reached.
+    """
+    # NOTE: any serverSelectionTimeoutMS in the URI takes precedence:
+    return pymongo.MongoClient(
+        mongo_uri,
+        serverSelectionTimeoutMS=DEFAULT_SERVER_SELECTION_TIMEOUT_MS)
+
+
+def _find_index_by_key(indexes, key):
+    """Returns the name of the index with the given key pattern out of the
+    provided `index_information()` dict, or None if there is none.
+    """
+    for index_name, index_info in indexes.items():
+        if list(index_info["key"]) == key:
+            return index_name
+    return None
+
+
+def _drop_index(sessions, indexes, index_name):
+    logger.info("Dropping session index %s", indexes[index_name])
+    sessions.drop_index(index_name)
+    del indexes[index_name]
+
+
+def _ensure_ttl_index(sessions, indexes, ttl_field, ttl_seconds):
+    """Ensures the session TTL index matches the provided spec, updating the
+    given `index_information()` dict accordingly.
+    """
+    # NOTE: while `collMod` could update the expiry in-place, it requires
+    # the dbAdmin role, whereas the Studio's DB user usually only has the
+    # readWrite role allowing it to drop and (re)create indexes:
+    ttl_key = [(ttl_field, pymongo.ASCENDING)]
+    ttl_index = indexes.get(SESSION_TTL_INDEX_NAME)
+    if ttl_index and (
+            not ttl_seconds or list(ttl_index["key"]) != ttl_key or (
+                ttl_index.get("expireAfterSeconds") != ttl_seconds)):
+        _drop_index(sessions, indexes, SESSION_TTL_INDEX_NAME)
+    if not ttl_seconds or SESSION_TTL_INDEX_NAME in indexes:
+        return
+
+    # NOTE: MongoDB refuses creating an index with the same key as an
+    # existing one but other options, so any such index is replaced:
+    conflicting_index_name = _find_index_by_key(indexes, ttl_key)
+    if conflicting_index_name:
+        _drop_index(sessions, indexes, conflicting_index_name)
+    logger.info(
+        "Creating session TTL index on '%s' expiring after %ds",
+        ttl_field, ttl_seconds)
+    sessions.create_index(
+        ttl_key, name=SESSION_TTL_INDEX_NAME, expireAfterSeconds=ttl_seconds)
+    indexes[SESSION_TTL_INDEX_NAME] = {
+        "key": ttl_key, "expireAfterSeconds": ttl_seconds}
+
+
+def _ensure_lookup_indexes(sessions, indexes, lookup_fields):
+    """Ensures each of the provided fields is indexed, dropping any lookup
+    indexes previously created for other fields.
+    """
+    desired_lookup_indexes = {
+        SESSION_LOOKUP_INDEX_NAME_PREFIX + field: field
+        for field in lookup_fields}
+    for index_name in list(indexes):
+        if index_name.startswith(SESSION_LOOKUP_INDEX_NAME_PREFIX) and (
+                index_name not in desired_lookup_indexes):
+            _drop_index(sessions, indexes, index_name)
+    for index_name, field in desired_lookup_indexes.items():
+        lookup_key = [(field, pymongo.ASCENDING)]
+        # NOTE: any existing index on the field (e.g. MongoDB's default
+        # '<field>_1') serves the lookups just as well, so is adopted:
+        existing_index_name = _find_index_by_key(indexes, lookup_key)
+        if existing_index_name:
+            logger.debug(
+                "Field '%s' already indexed by %s", field, existing_index_name)
+            continue
+        logger.info("Creating session lookup index on '%s'", field)
+        sessions.create_index(lookup_key, name=index_name)
+        indexes[index_name] = {"key": lookup_key}
+
+
+def ensure_session_indexes(
+        mongo_uri, database, collection, ttl_field, ttl_seconds,
+        lookup_fields):
+    """Ensures the indexes of the session collection match the provided spec.
+
+    Sessions are looked up by their `_id`, which MongoDB always indexes, so
+    `lookup_fields` only need listing fields any other lookups filter on.
+    Existing indexes are matched by their key pattern, and indexes previously
+    created by this function but no longer part of the spec are dropped.
+
+    Args:
+        mongo_uri: MongoDB connection string.
+        database: name of the database containing the collection.
+        collection: name of the session collection.
+        ttl_field: name of the date field whose value sessions expire after.
+        ttl_seconds: number of seconds after which sessions expire, with 0
+            meaning sessions should never expire.
+        lookup_fields: list of names of fields to be individually indexed.
+
+    Returns:
+        List of the names of all the indexes on the collection.
+
+    Raises:
+        pymongo.errors.PyMongoError: if any of the MongoDB operations fail.
+    """
+    with _get_mongo_client(mongo_uri) as client:
+        sessions = client[database][collection]
+        indexes = dict(sessions.index_information())
+        _ensure_ttl_index(sessions, indexes, ttl_field, ttl_seconds)
+        _ensure_lookup_indexes(sessions, indexes, lookup_fields)
+        return sorted(sessions.index_information())
+
+
+def get_session_collection_stats(mongo_uri, database, collection):
+    """Returns the size and index statistics of the session collection.
+
+    Returns:
+        Dictionary with the following structure:
+        {
+            "count": <number of sessions>,
+            "size": <uncompressed size of the sessions in bytes>,
+            "storage_size": <storage allocated for the sessions in bytes>,
+            "avg_session_size": <average session size in bytes>,
+            "total_index_size": <size of all indexes in bytes>,
+            "indexes": {
+                "<index name>": {
+                    "key": {"<field>": <direction>},
+                    "size": <index size in bytes>,
+                    "accesses": <lookups since the index stats were reset,
+                                 omitted if the DB user may not read them>,
+                    "expire_after_seconds": <TTL, only for TTL indexes>
+                }
+            }
+        }
+
+    Raises:
+        pymongo.errors.PyMongoError: if any of the MongoDB operations fail.
+    """
+    with _get_mongo_client(mongo_uri) as client:
+        db = client[database]
+        sessions = db[collection]
+        coll_stats = db.command("collStats", collection)
+
+        indexes = {}
+        for index_name, index_info in sessions.index_information().items():
+            indexes[index_name] = {
+                "key": dict(index_info["key"]),
+                "size": coll_stats.get("indexSizes", {}).get(index_name, 0)}
+            if "expireAfterSeconds" in index_info:
+                indexes[index_name]["expire_after_seconds"] = (
+                    index_info["expireAfterSeconds"])
+        # NOTE: `$indexStats` requires the indexStats privilege, which the
+        # readWrite role the Studio's DB user usually has does not grant:
+        try:
+            for index_stats in sessions.aggregate([{"$indexStats": {}}]):
+                if index_stats["name"] in indexes:
+                    indexes[index_stats["name"]]["accesses"] = (
+                        index_stats["accesses"]["ops"])
+        except errors.OperationFailure as ex:
+            logger.warning("Failed to fetch session index usage: %s", ex)
+
+        return {
+            "count": coll_stats.get("count", 0),
+            "size": coll_stats.get("size", 0),
+            "storage_size": coll_stats.get("storageSize", 0),
+            "avg_session_size": coll_stats.get("avgObjSize", 0),
+            "total_index_size": coll_stats.get("totalIndexSize", 0),
+            "indexes": indexes}
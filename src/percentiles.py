@@ -0,0 +1,17 @@
+# Copyright 2021 Canonical
+# See LICENSE file for licensing details.
+
+""" Module for summarizing timing samples, shared by the charm and the load
+generator.
+"""
+
+import math
+
+
+def get_percentile(samples, percentile):
+    """Returns the nearest-rank percentile of the provided (non-empty)
+    list of samples.
+    """
+    ordered_samples = sorted(samples)
+    rank = math.ceil(percentile / 100 * len(ordered_samples))
+    return ordered_samples[max(rank, 1) - 1]
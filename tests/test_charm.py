@@ -3,64 +3,1126 @@
 #
 # Learn more about testing at: https://juju.is/docs/sdk/testing
 
+import json
+import shlex
 import unittest
-from unittest.mock import Mock
+from unittest import mock
 
-from charm import LegendEngineServerOperatorCharm
-from ops.model import ActiveStatus
-from ops.testing import Harness
+from ops import model
+from ops import pebble
+from ops import testing
+
+import charm
+from tests import utils
+
+# NOTE: the Studio's healthcheck is patched out of all test harnesses, so the
+# originals are kept to be tested on their own:
+_IS_STUDIO_READY = charm.LegendStudioServerOperatorCharm._is_studio_ready
+_IS_STUDIO_HEALTHCHECK_PASSING = (
+    charm.LegendStudioServerOperatorCharm._is_studio_healthcheck_passing)
 
 
 class TestCharm(unittest.TestCase):
+
     def setUp(self):
-        self.harness = Harness(LegendEngineServerOperatorCharm)
-        self.addCleanup(self.harness.cleanup)
-        self.harness.begin()
-
-    def test_config_changed(self):
-        self.assertEqual(list(self.harness.charm._stored.things), [])
-        self.harness.update_config({"thing": "foo"})
-        self.assertEqual(list(self.harness.charm._stored.things), ["foo"])
-
-    def test_action(self):
-        # the harness doesn't (yet!) help much with actions themselves
-        action_event = Mock(params={"fail": ""})
-        self.harness.charm._on_fortune_action(action_event)
-
-        self.assertTrue(action_event.set_results.called)
-
-    def test_action_fail(self):
-        action_event = Mock(params={"fail": "fail this"})
-        self.harness.charm._on_fortune_action(action_event)
-
-        self.assertEqual(action_event.fail.call_args, [("fail this",)])
-
-    def test_httpbin_pebble_ready(self):
-        # Check the initial Pebble plan is empty
-        initial_plan = self.harness.get_container_pebble_plan("httpbin")
-        self.assertEqual(initial_plan.to_yaml(), "{}\n")
-        # Expected plan after Pebble ready with default config
-        expected_plan = {
-            "services": {
-                "httpbin": {
-                    "override": "replace",
-                    "summary": "httpbin",
-                    "command": "gunicorn -b 0.0.0.0:80 httpbin:app -k gevent",
-                    "startup": "enabled",
-                    "environment": {"thing": "🎁"},
-                }
-            },
-        }
-        # Get the httpbin container from the model
-        container = self.harness.model.unit.get_container("httpbin")
-        # Emit the PebbleReadyEvent carrying the httpbin container
-        self.harness.charm.on.httpbin_pebble_ready.emit(container)
-        # Get the plan now we've run PebbleReady
-        updated_plan = self.harness.get_container_pebble_plan("httpbin").to_dict()
-        # Check we've got the plan we expected
-        self.assertEqual(expected_plan, updated_plan)
-        # Check the service was started
-        service = self.harness.model.unit.get_container("httpbin").get_service("httpbin")
-        self.assertTrue(service.is_running())
-        # Ensure we set an ActiveStatus with no message
-        self.assertEqual(self.harness.model.unit.status, ActiveStatus())
+        self.harness = utils.get_studio_harness(self)
+
+    def _commit(self):
+        # NOTE: the Studio is reconfigured when the framework commits, which
+        # the Harness never does by itself:
+        self.harness.framework.commit()
+
+    def _get_container_file(self, path):
+        container = self.harness.model.unit.get_container("studio")
+        with container.pull(path) as fin:
+            return fin.read()
+
+    def _get_studio_http_config(self):
+        return json.loads(self._get_container_file(
+            charm.STUDIO_HTTP_CONFIG_FILE_CONTAINER_LOCAL_PATH))
+
+    def _configure_studio(self):
+        self.harness.container_pebble_ready("studio")
+        relation_ids = utils.add_studio_relations(self.harness)
+        self._commit()
+        return relation_ids
+
+    def test_studio_pebble_ready(self):
+        self.harness.container_pebble_ready("studio")
+        self._commit()
+
+        plan = self.harness.get_container_pebble_plan("studio").to_dict()
+        service = plan["services"]["studio"]
+        self.assertEqual("disabled", service["startup"])
+        self.assertIn("-XX:MaxRAMPercentage=60", service["command"])
+        self.assertIn(
+            charm.STUDIO_HTTP_CONFIG_FILE_CONTAINER_LOCAL_PATH,
+            service["command"])
+        self.assertIn(charm.STUDIO_HEALTHCHECK_NAME, plan["checks"])
+        self.assertEqual(
+            model.BlockedStatus("requires relating to: finos-legend-db-k8s"),
+            self.harness.model.unit.status)
+
+    def test_studio_configured_once_related(self):
+        self._configure_studio()
+
+        http_config = self._get_studio_http_config()
+        self.assertEqual(
+            utils.LEGEND_DB_CREDENTIALS["database"],
+            http_config["pac4j"]["mongoDb"])
+        ui_config = json.loads(self._get_container_file(
+            charm.STUDIO_UI_CONFIG_FILE_CONTAINER_LOCAL_PATH))
+        self.assertEqual(utils.LEGEND_SDLC_URL, ui_config["sdlc"]["url"])
+        self.assertEqual(
+            utils.LEGEND_ENGINE_URL, ui_config["engine"]["url"])
+        container = self.harness.model.unit.get_container("studio")
+        self.assertTrue(
+            container.exists(charm.TRUSTSTORE_CONTAINER_LOCAL_PATH))
+        self.assertTrue(
+            container.get_service("studio").is_running())
+        self.assertEqual(
+            model.ActiveStatus(), self.harness.model.unit.status)
+
+    def test_reconfiguration_coalesced_per_hook(self):
+        self.harness.container_pebble_ready("studio")
+        with mock.patch.object(
+                self.harness.charm, "_reconfigure_studio_service") as recfg:
+            utils.add_studio_relations(self.harness)
+            recfg.assert_not_called()
+            self._commit()
+        recfg.assert_called_once_with()
+
+    @mock.patch.object(
+        charm.LegendStudioServerOperatorCharm, "_restart_studio_service",
+        autospec=True,
+        side_effect=charm.LegendStudioServerOperatorCharm.
+        _restart_studio_service)
+    def test_unchanged_config_does_not_restart(self, restart):
+        self._configure_studio()
+        self.assertEqual(1, restart.call_count)
+
+        self.harness.update_config({"server-logging-level": "INFO"})
+        self._commit()
+        self.assertEqual(1, restart.call_count)
+        self.assertEqual(1, self.harness.charm._stored.restarts_avoided)
+
+        self.harness.update_config({"server-logging-level": "WARN"})
+        self._commit()
+        self.assertEqual(2, restart.call_count)
+        self.assertEqual(
+            "WARN", self._get_studio_http_config()["logging"]["level"])
+
+    @mock.patch.object(
+        charm.LegendStudioServerOperatorCharm, "_restart_studio_service",
+        autospec=True,
+        side_effect=charm.LegendStudioServerOperatorCharm.
+        _restart_studio_service)
+    def test_normalized_check_durations_do_not_restart(self, restart):
+        self.harness.update_config({
+            "healthcheck-period": "90s", "healthcheck-timeout": "1m"})
+        self._configure_studio()
+        self.assertEqual(1, restart.call_count)
+
+        # NOTE: Pebble reports durations as formatted by Go:
+        plan = self.harness.get_container_pebble_plan("studio").to_dict()
+        plan["checks"][charm.STUDIO_HEALTHCHECK_NAME].update({
+            "period": "1m30s", "timeout": "1m0s"})
+        with mock.patch.object(
+                model.Container, "get_plan",
+                return_value=pebble.Plan(plan)):
+            self.harness.update_config({"server-logging-level": "INFO"})
+            self._commit()
+        self.assertEqual(1, restart.call_count)
+
+    @mock.patch.object(
+        charm.LegendStudioServerOperatorCharm, "_build_java_truststore",
+        autospec=True,
+        side_effect=charm.LegendStudioServerOperatorCharm.
+        _build_java_truststore)
+    def test_java_truststore_cached(self, build_truststore):
+        self._configure_studio()
+        self.harness.update_config({"server-logging-level": "WARN"})
+        self._commit()
+        build_truststore.assert_called_once()
+
+    def test_jvm_extra_options_quoted(self):
+        self.harness.update_config({
+            "jvm-extra-options": "-Dfoo=\"a b\" -Dbar=*"})
+        self._configure_studio()
+
+        command = self.harness.get_container_pebble_plan(
+            "studio").services["studio"].command
+        shell, flag, java_command = shlex.split(command)
+        self.assertEqual(["/bin/sh", "-c"], [shell, flag])
+        java_args = shlex.split(java_command)
+        self.assertIn("-Dfoo=a b", java_args)
+        self.assertIn("-Dbar=*", java_args)
+        self.assertIn("-XX:MaxRAMPercentage=60", java_args)
+
+    def test_jvm_tuning_options_rendered(self):
+        self.harness.update_config({
+            "jvm-garbage-collector": "G1",
+            "jvm-initial-ram-percentage": 25.0,
+            "jvm-max-ram-percentage": 75.0,
+            "jvm-max-metaspace-size": "256m",
+            "jvm-thread-stack-size": "2M"})
+        self._configure_studio()
+
+        command = self.harness.get_container_pebble_plan(
+            "studio").services["studio"].command
+        for option in [
+                "-XX:+UseG1GC", "-XX:InitialRAMPercentage=25",
+                "-XX:MaxRAMPercentage=75", "-XX:MaxMetaspaceSize=256m",
+                "-Xss2M"]:
+            self.assertIn(option, command)
+
+        self.harness.update_config({"jvm-initial-ram-percentage": 80.0})
+        self._commit()
+        self.assertEqual(
+            model.BlockedStatus(
+                "invalid JVM config option(s): jvm-initial-ram-percentage, "
+                "please review the debug-log for more details"),
+            self.harness.model.unit.status)
+
+    def test_invalid_jvm_options_blocked(self):
+        self._configure_studio()
+        self.harness.update_config({"jvm-extra-options": "-Xss1M"})
+        self._commit()
+        self.assertIsInstance(
+            self.harness.model.unit.status, model.BlockedStatus)
+
+    def test_jvm_extra_options_conflicts(self):
+        self._configure_studio()
+        self.harness.update_config({
+            "jvm-garbage-collector": "G1",
+            "jvm-extra-options": "-XX:+UseStringDeduplication"})
+        self._commit()
+        self.assertEqual(model.ActiveStatus(), self.harness.model.unit.status)
+
+        for extra_options in [
+                "-XX:+UseZGC", "-Xmx2g", "-XX:MaxHeapSize=2g", "-Xms1g"]:
+            self.harness.update_config({"jvm-extra-options": extra_options})
+            self._commit()
+            self.assertEqual(
+                model.BlockedStatus(
+                    "invalid JVM config option(s): jvm-extra-options, please "
+                    "review the debug-log for more details"),
+                self.harness.model.unit.status, extra_options)
+
+        self.harness.update_config({
+            "jvm-garbage-collector": "",
+            "jvm-extra-options": "-XX:+UseSerialGC"})
+        self._commit()
+        self.assertEqual(model.ActiveStatus(), self.harness.model.unit.status)
+        self.harness.update_config({
+            "jvm-extra-options": "-XX:+UseZGC -XX:+UseG1GC"})
+        self._commit()
+        self.assertIsInstance(
+            self.harness.model.unit.status, model.BlockedStatus)
+
+    def test_server_config_rendered(self):
+        self._configure_studio()
+        self.harness.update_config({
+            "server-max-threads": 256, "server-gzip-enabled": True})
+        self._commit()
+
+        server_config = self._get_studio_http_config()["server"]
+        self.assertEqual(256, server_config["maxThreads"])
+        self.assertTrue(server_config["gzip"]["enabled"])
+
+    def test_default_server_type_connectors(self):
+        self._configure_studio()
+        self.harness.update_config({
+            "server-type": "default", "server-acceptor-threads": 2,
+            "server-max-queued-requests": 512})
+        self._commit()
+
+        server_config = self._get_studio_http_config()["server"]
+        self.assertNotIn("connector", server_config)
+        self.assertEqual(512, server_config["maxQueuedRequests"])
+        connector = server_config["applicationConnectors"][0]
+        self.assertEqual(
+            charm.APPLICATION_CONNECTOR_PORT_HTTP, connector["port"])
+        self.assertEqual(2, connector["acceptorThreads"])
+        self.assertNotIn("selectorThreads", connector)
+        self.assertEqual(
+            charm.APPLICATION_ADMIN_CONNECTOR_PORT_HTTP,
+            server_config["adminConnectors"][0]["port"])
+
+        # The connector threads must leave some for serving requests:
+        self.harness.update_config({
+            "server-max-threads": 4, "server-min-threads": 1,
+            "server-selector-threads": 2})
+        self._commit()
+        self.assertEqual(
+            model.BlockedStatus(
+                "invalid server config option(s): server-max-threads, please "
+                "review the debug-log for more details"),
+            self.harness.model.unit.status)
+
+    def test_gzip_config_rendered(self):
+        self._configure_studio()
+        self.harness.update_config({
+            "server-gzip-minimum-size": "1KiB",
+            "server-gzip-mime-types": "text/css, application/javascript,",
+            "server-gzip-compression-level": 9})
+        self._commit()
+
+        self.assertEqual({
+            "enabled": True,
+            "minimumEntitySize": "1KiB",
+            "compressedMimeTypes": ["text/css", "application/javascript"],
+            "deflateCompressionLevel": 9},
+            self._get_studio_http_config()["server"]["gzip"])
+
+        self.harness.update_config({
+            "server-gzip-minimum-size": "1 parsec",
+            "server-gzip-mime-types": " "})
+        self._commit()
+        self.assertEqual(
+            model.BlockedStatus(
+                "invalid server config option(s): server-gzip-mime-types, "
+                "server-gzip-minimum-size, please review the debug-log for "
+                "more details"),
+            self.harness.model.unit.status)
+
+    def test_invalid_server_config_blocked(self):
+        self._configure_studio()
+        self.harness.update_config({"server-idle-timeout": "forever"})
+        self._commit()
+        self.assertIsInstance(
+            self.harness.model.unit.status, model.BlockedStatus)
+
+    def test_mongo_uri_options_merged(self):
+        self._configure_studio()
+        self.harness.update_config({
+            "mongo-max-pool-size": 50, "mongo-read-preference": "nearest"})
+        self._commit()
+
+        mongo_uri = self._get_studio_http_config()["pac4j"]["mongoUri"]
+        self.assertTrue(mongo_uri.startswith(
+            utils.LEGEND_DB_CREDENTIALS["uri"]))
+        self.assertIn("maxPoolSize=50", mongo_uri)
+        self.assertIn("readPreference=nearest", mongo_uri)
+
+    def test_mongo_uri_options_override_existing(self):
+        self.harness.update_config({
+            "mongo-max-pool-size": 50, "mongo-compressors": "zstd, zlib"})
+        mongo_uri = self.harness.charm._get_mongo_uri_with_options_from_config(
+            "mongodb://mongo:27017/?MaxPoolSize=10&replicaSet=rs0")
+        self.assertEqual(
+            "mongodb://mongo:27017/?replicaSet=rs0&compressors=zstd,zlib&"
+            "maxPoolSize=50", mongo_uri)
+
+    def test_invalid_mongo_options_blocked(self):
+        self._configure_studio()
+        self.harness.update_config({
+            "mongo-max-pool-size": 5, "mongo-min-pool-size": 10})
+        self._commit()
+        self.assertIsInstance(
+            self.harness.model.unit.status, model.BlockedStatus)
+        self.assertIn("mongo", self.harness.model.unit.status.message)
+
+        # A maxPoolSize of 0 means an unbounded pool:
+        self.harness.update_config({"mongo-max-pool-size": 0})
+        self._commit()
+        self.assertEqual(model.ActiveStatus(), self.harness.model.unit.status)
+
+    def test_production_logging_profile(self):
+        self._configure_studio()
+        self.harness.update_config({"logging-profile": "production"})
+        self._commit()
+
+        logging_config = self._get_studio_http_config()["logging"]
+        self.assertEqual(
+            charm.LOGGING_PRODUCTION_PAC4J_LEVEL,
+            logging_config["loggers"]["org.pac4j"]["level"])
+
+    @mock.patch.object(
+        charm.LegendStudioServerOperatorCharm,
+        "_is_studio_healthcheck_passing", _IS_STUDIO_HEALTHCHECK_PASSING)
+    @mock.patch("urllib.request.urlopen")
+    def test_studio_healthcheck(self, urlopen):
+        self._configure_studio()
+        container = self.harness.model.unit.get_container("studio")
+        urlopen.return_value.__enter__.return_value.status = 200
+        self.assertTrue(_IS_STUDIO_READY(self.harness.charm, container))
+        self.assertEqual(
+            "http://localhost:8080/studio/admin/healthcheck",
+            urlopen.call_args.args[0])
+
+        urlopen.side_effect = ConnectionRefusedError()
+        self.assertFalse(_IS_STUDIO_READY(self.harness.charm, container))
+
+        # A down Pebble check must short-circuit the request:
+        urlopen.reset_mock(side_effect=True)
+        down_check = mock.Mock(status=pebble.CheckStatus.DOWN)
+        with mock.patch.object(
+                model.Container, "get_checks",
+                return_value={charm.STUDIO_HEALTHCHECK_NAME: down_check}):
+            self.assertFalse(
+                _IS_STUDIO_READY(self.harness.charm, container))
+        urlopen.assert_not_called()
+
+    @mock.patch("time.sleep")
+    def test_readiness_polled_after_restart(self, sleep):
+        is_studio_ready = (
+            charm.LegendStudioServerOperatorCharm._is_studio_ready)
+        is_studio_ready.side_effect = [False, False, True]
+        self._configure_studio()
+
+        self.assertEqual(2, sleep.call_count)
+        self.assertEqual(model.ActiveStatus(), self.harness.model.unit.status)
+        self.assertGreater(
+            self.harness.charm._stored.studio_readiness_latency, 0)
+        self.assertFalse(
+            self.harness.charm._stored.studio_readiness_latency_lower_bound)
+
+    @mock.patch.object(charm, "STUDIO_READINESS_POLL_TIMEOUT", 0)
+    def test_readiness_follows_pebble_checks(self):
+        is_studio_ready = (
+            charm.LegendStudioServerOperatorCharm._is_studio_ready)
+        is_studio_ready.return_value = False
+        self._configure_studio()
+        self.assertEqual(
+            model.WaitingStatus(charm.STUDIO_AWAITING_READINESS_MESSAGE),
+            self.harness.model.unit.status)
+        # The Studio not becoming ready while polled only bounds the latency:
+        latency = self.harness.charm._stored.studio_readiness_latency
+        self.assertTrue(
+            self.harness.charm._stored.studio_readiness_latency_lower_bound)
+
+        container = self.harness.model.unit.get_container("studio")
+        is_studio_ready.return_value = True
+        self.harness.charm.on.studio_pebble_check_recovered.emit(
+            container, charm.STUDIO_HEALTHCHECK_NAME)
+        self.assertEqual(model.ActiveStatus(), self.harness.model.unit.status)
+        self.assertEqual(
+            latency, self.harness.charm._stored.studio_readiness_latency)
+
+        is_studio_ready.return_value = False
+        self.harness.charm.on.studio_pebble_check_failed.emit(
+            container, charm.STUDIO_HEALTHCHECK_NAME)
+        self.assertEqual(
+            model.WaitingStatus(charm.STUDIO_AWAITING_READINESS_MESSAGE),
+            self.harness.model.unit.status)
+
+        is_studio_ready.return_value = True
+        self.harness.charm.on.update_status.emit()
+        self.assertEqual(model.ActiveStatus(), self.harness.model.unit.status)
+
+    def test_logging_appender_queue_config(self):
+        self._configure_studio()
+        self.harness.update_config({
+            "logging-queue-size": 1024,
+            "logging-discarding-threshold": 0,
+            "logging-json-layout": True})
+        self._commit()
+
+        appender = self._get_studio_http_config()["logging"]["appenders"][0]
+        self.assertEqual("console", appender["type"])
+        self.assertEqual(1024, appender["queueSize"])
+        self.assertEqual(0, appender["discardingThreshold"])
+        self.assertFalse(appender["neverBlock"])
+        self.assertEqual({"type": "json"}, appender["layout"])
+
+        # The production profile must never block on a full queue:
+        self.harness.update_config({"logging-profile": "production"})
+        self._commit()
+        appender = self._get_studio_http_config()["logging"]["appenders"][0]
+        self.assertTrue(appender["neverBlock"])
+
+        self.harness.update_config({"logging-discarding-threshold": 1024})
+        self._commit()
+        self.assertEqual(
+            model.BlockedStatus(
+                "invalid logging config option(s): "
+                "logging-discarding-threshold, please review the debug-log "
+                "for more details"),
+            self.harness.model.unit.status)
+
+    def test_gitlab_redirect_uris_set(self):
+        relation_ids = self._configure_studio()
+
+        relation_data = self.harness.get_relation_data(
+            relation_ids["legend-studio-gitlab"], self.harness.charm.app)
+        redirect_uris = json.loads(
+            relation_data["legend-gitlab-redirect-uris"])
+        self.assertIn(
+            "http://%s:8080/studio/log.in/callback" % (
+                utils.STUDIO_BIND_ADDRESS),
+            redirect_uris)
+
+    def test_gitlab_redirect_uris_follow_bind_address(self):
+        relation_ids = self._configure_studio()
+        self.harness.add_network(
+            "10.1.2.3", endpoint="legend-studio-gitlab")
+        self.harness.update_config({"server-logging-level": "WARN"})
+
+        relation_data = self.harness.get_relation_data(
+            relation_ids["legend-studio-gitlab"], self.harness.charm.app)
+        self.assertIn(
+            "http://10.1.2.3:8080/studio/log.in/callback",
+            json.loads(relation_data["legend-gitlab-redirect-uris"]))
+        self.assertEqual(
+            "10.1.2.3", self.harness.charm._stored.studio_bind_address)
+
+    def test_gitlab_redirect_uris_set_by_new_leader(self):
+        self.harness.set_leader(False)
+        relation_ids = self._configure_studio()
+        relation_data = self.harness.get_relation_data(
+            relation_ids["legend-studio-gitlab"], self.harness.charm.app)
+        self.assertNotIn("legend-gitlab-redirect-uris", relation_data)
+        self.assertEqual(
+            [], list(self.harness.charm._stored.gitlab_redirect_uris))
+
+        self.harness.set_leader(True)
+        self.assertEqual(
+            self.harness.charm._get_studio_gitlab_redirect_uris(),
+            json.loads(relation_data["legend-gitlab-redirect-uris"]))
+
+    def test_ingress_options_set(self):
+        self._configure_studio()
+        ingress_id = utils.add_studio_relation(
+            self.harness, "ingress", "nginx-ingress-integrator", {})
+        self.harness.update_config({
+            "ingress-session-cookie-max-age": 3600,
+            "ingress-limit-rps": 50,
+            "ingress-limit-whitelist": "10.0.0.0/8, 192.168.1.5/32",
+            "ingress-retry-errors": "error,timeout"})
+        self._commit()
+
+        relation_data = self.harness.get_relation_data(
+            ingress_id, self.harness.charm.app)
+        self.assertEqual("3600", relation_data["session-cookie-max-age"])
+        self.assertEqual("50", relation_data["limit-rps"])
+        self.assertEqual(
+            "10.0.0.0/8,192.168.1.5/32", relation_data["limit-whitelist"])
+        self.assertEqual("error,timeout", relation_data["retry-errors"])
+        self.assertNotIn("max-body-size", relation_data)
+        self.assertEqual(model.ActiveStatus(), self.harness.model.unit.status)
+
+    def test_ingress_relation_data_only_written_on_changes(self):
+        self._configure_studio()
+        ingress_id = utils.add_studio_relation(
+            self.harness, "ingress", "nginx-ingress-integrator", {})
+        self.harness.update_config({"ingress-limit-rps": 50})
+        self._commit()
+
+        ingress_config = self.harness.charm._get_ingress_config()
+        self.assertFalse(
+            self.harness.charm._update_ingress_relation_data(ingress_config))
+
+        self.harness.update_config({"ingress-limit-rps": 0})
+        self._commit()
+        relation_data = self.harness.get_relation_data(
+            ingress_id, self.harness.charm.app)
+        self.assertNotIn("limit-rps", relation_data)
+        self.assertEqual(
+            self.harness.charm.app.name, relation_data["service-name"])
+
+    def test_invalid_ingress_options_keep_relation_data(self):
+        self._configure_studio()
+        ingress_id = utils.add_studio_relation(
+            self.harness, "ingress", "nginx-ingress-integrator", {})
+        self.harness.update_config({
+            "ingress-limit-rps": 50, "ingress-retry-errors": "timeout"})
+        self._commit()
+
+        self.harness.update_config({"ingress-retry-errors": "bogus"})
+        self._commit()
+        relation_data = self.harness.get_relation_data(
+            ingress_id, self.harness.charm.app)
+        self.assertEqual("50", relation_data["limit-rps"])
+        self.assertEqual("timeout", relation_data["retry-errors"])
+        self.assertIsInstance(
+            self.harness.model.unit.status, model.BlockedStatus)
+
+    def test_webapp_proxy(self):
+        container = self.harness.model.unit.get_container("studio")
+        container.push(
+            "%s/static/main.js" % charm.STUDIO_WEBAPP_ASSETS_DIR, "main();",
+            make_dirs=True)
+        copy_commands = []
+
+        def _copy_assets(args):
+            copy_commands.append(args.command[-1])
+            return testing.ExecResult()
+        self.harness.handle_exec("studio", ["/bin/sh"], handler=_copy_assets)
+        self.harness.set_can_connect(charm.WEBAPP_PROXY_CONTAINER_NAME, True)
+        relation_ids = self._configure_studio()
+        ingress_id = utils.add_studio_relation(
+            self.harness, "ingress", "nginx-ingress-integrator", {})
+        self.harness.update_config({"webapp-proxy-enabled": True})
+        self._commit()
+
+        self.assertEqual(1, len(copy_commands))
+        self.assertIn(charm.STUDIO_WEBAPP_ASSETS_DIR, copy_commands[0])
+        proxy = self.harness.model.unit.get_container(
+            charm.WEBAPP_PROXY_CONTAINER_NAME)
+        with proxy.pull(
+                charm.WEBAPP_PROXY_CONFIG_FILE_CONTAINER_LOCAL_PATH) as fin:
+            nginx_config = fin.read()
+        self.assertIn("listen %d;" % charm.WEBAPP_PROXY_PORT, nginx_config)
+        self.assertIn(
+            "location ^~ /studio/static/ {\n"
+            "            add_header Cache-Control "
+            "\"public, max-age=31536000, immutable\";\n"
+            "            try_files $uri @studio;", nginx_config)
+        self.assertIn(
+            "location = /studio/config.json {\n"
+            "            add_header Cache-Control \"no-cache\";\n"
+            "            proxy_pass http://studio;", nginx_config)
+        self.assertTrue(proxy.get_service(
+            charm.WEBAPP_PROXY_SERVICE_NAME).is_running())
+        self.assertEqual(
+            str(charm.WEBAPP_PROXY_PORT),
+            self.harness.get_relation_data(
+                ingress_id, self.harness.charm.app)["service-port"])
+
+        # Unchanged assets must not be copied again:
+        self.harness.update_relation_data(
+            relation_ids["legend-sdlc"], "finos-legend-sdlc-k8s",
+            {"legend-sdlc-url": "http://sdlc.example.com"})
+        self._commit()
+        self.assertEqual(1, len(copy_commands))
+
+        self.harness.update_config({"webapp-proxy-enabled": False})
+        self._commit()
+        self.assertFalse(proxy.get_service(
+            charm.WEBAPP_PROXY_SERVICE_NAME).is_running())
+
+    def test_webapp_assets_precompressed_once(self):
+        commands = []
+
+        def _precompress(args):
+            commands.append(args.command[-1])
+            return testing.ExecResult()
+        self.harness.handle_exec("studio", ["/bin/sh"], handler=_precompress)
+        self.harness.update_config({
+            "webapp-precompress-assets": True,
+            "server-gzip-minimum-size": "1KiB",
+            "server-gzip-mime-types": "application/javascript",
+            "server-gzip-compression-level": 9})
+        self._configure_studio()
+
+        self.assertEqual(1, len(commands))
+        self.assertIn(
+            "find %s " % charm.STUDIO_WEBAPP_CONTENT_DIR, commands[0])
+        self.assertIn("-name '*.js'", commands[0])
+        self.assertNotIn("-name '*.css'", commands[0])
+        self.assertIn("-size +1023c -exec gzip -k -f -9 {} +", commands[0])
+        self.assertTrue(self.harness.model.unit.get_container(
+            "studio").exists(charm.STUDIO_WEBAPP_PRECOMPRESSION_MARKER_PATH))
+
+        # The assets must only be compressed again if the settings change:
+        self.harness.update_config({"server-logging-level": "WARN"})
+        self._commit()
+        self.assertEqual(1, len(commands))
+        self.harness.update_config({"server-gzip-compression-level": -1})
+        self._commit()
+        self.assertEqual(2, len(commands))
+        self.assertIn("-exec gzip -k -f -6 {} +", commands[1])
+
+    def test_webapp_cache_rules(self):
+        self.harness.update_config({
+            "webapp-static-cache-max-age": 600,
+            "webapp-worker-cache-max-age": 0,
+            "webapp-config-cache-max-age": 60})
+        cache_rules = []
+        self.assertIsNone(
+            self.harness.charm._add_webapp_cache_rules_from_charm_config(
+                cache_rules))
+        cache_controls = {
+            rule["path"]: rule["cache_control"] for rule in cache_rules}
+        self.assertEqual(
+            "public, max-age=600, immutable",
+            cache_controls["/studio/static/"])
+        self.assertEqual(
+            "public, max-age=60", cache_controls["/studio/config.json"])
+        for path in charm.STUDIO_WEBAPP_WORKER_PATHS:
+            self.assertEqual(
+                "no-cache", cache_controls["/studio%s" % path])
+
+        self.harness.update_config({"webapp-worker-cache-max-age": -1})
+        self.assertIsInstance(
+            self.harness.charm._add_webapp_cache_rules_from_charm_config([]),
+            model.BlockedStatus)
+
+    def test_webapp_cache_options_ignored_without_proxy(self):
+        self.harness.update_config({"webapp-static-cache-max-age": -1})
+        self._configure_studio()
+        self.assertEqual(model.ActiveStatus(), self.harness.model.unit.status)
+
+        self.harness.set_can_connect(charm.WEBAPP_PROXY_CONTAINER_NAME, True)
+        self.harness.update_config({"webapp-proxy-enabled": True})
+        self._commit()
+        self.assertIsInstance(
+            self.harness.model.unit.status, model.BlockedStatus)
+
+    def test_ingress_only_pointed_to_running_webapp_proxy(self):
+        self.harness.handle_exec(
+            "studio", ["/bin/sh"], result=testing.ExecResult())
+        self._configure_studio()
+        ingress_id = utils.add_studio_relation(
+            self.harness, "ingress", "nginx-ingress-integrator", {})
+        self.harness.update_config({"webapp-proxy-enabled": True})
+        self._commit()
+
+        def _get_ingress_port():
+            return self.harness.get_relation_data(
+                ingress_id, self.harness.charm.app)["service-port"]
+        self.assertEqual(
+            str(charm.APPLICATION_CONNECTOR_PORT_HTTP), _get_ingress_port())
+
+        self.harness.container_pebble_ready(
+            charm.WEBAPP_PROXY_CONTAINER_NAME)
+        self._commit()
+        self.assertEqual(str(charm.WEBAPP_PROXY_PORT), _get_ingress_port())
+
+        proxy = self.harness.model.unit.get_container(
+            charm.WEBAPP_PROXY_CONTAINER_NAME)
+        proxy.stop(charm.WEBAPP_PROXY_SERVICE_NAME)
+        self.harness.charm.on.update_status.emit()
+        self.assertEqual(
+            str(charm.APPLICATION_CONNECTOR_PORT_HTTP), _get_ingress_port())
+
+    def test_invalid_ingress_options_blocked(self):
+        self._configure_studio()
+        self.harness.update_config({
+            "ingress-limit-whitelist": "10.0.0.0/33",
+            "ingress-retry-errors": "http_418"})
+        self._commit()
+
+        self.assertEqual(
+            model.BlockedStatus(
+                "invalid ingress config option(s): ingress-limit-whitelist, "
+                "ingress-retry-errors, please review the debug-log for more "
+                "details"),
+            self.harness.model.unit.status)
+
+    def test_session_indexes_ensured_once(self):
+        self._configure_studio()
+        self.harness.update_config({"session-ttl-seconds": 3600})
+        self._commit()
+        self.harness.update_config({"server-logging-level": "WARN"})
+        self._commit()
+
+        import mongo_sessions
+        self.assertEqual(
+            2, mongo_sessions.ensure_session_indexes.call_count)
+        self.assertEqual(
+            3600, mongo_sessions.ensure_session_indexes.call_args.kwargs[
+                "ttl_seconds"])
+
+    def test_session_indexes_retried_after_failure(self):
+        import mongo_sessions
+        mongo_sessions.ensure_session_indexes.side_effect = Exception(
+            "server selection timeout")
+        self.harness.update_config({"session-ttl-seconds": 3600})
+        self._configure_studio()
+        self.assertEqual(
+            "", self.harness.charm._stored.session_indexes_fingerprint)
+
+        mongo_sessions.ensure_session_indexes.side_effect = None
+        self.harness.update_config({"server-logging-level": "WARN"})
+        self._commit()
+        self.harness.update_config({"server-logging-level": "INFO"})
+        self._commit()
+        self.assertEqual(
+            2, mongo_sessions.ensure_session_indexes.call_count)
+        self.assertTrue(
+            self.harness.charm._stored.session_indexes_fingerprint)
+
+    def _get_published_peer_data(self):
+        app_name = self.harness.charm.app.name
+        peers_id = self.harness.add_relation(
+            charm.STUDIO_PEER_RELATION_NAME, app_name)
+        self._configure_studio()
+        return peers_id, self.harness.get_relation_data(peers_id, app_name)
+
+    def test_shared_config_published_to_peers(self):
+        peers_id, app_data = self._get_published_peer_data()
+
+        published_files = json.loads(
+            app_data[charm.STUDIO_PEER_CONFIG_FILES_KEY])
+        self.assertEqual(sorted([
+            charm.STUDIO_HTTP_CONFIG_FILE_CONTAINER_LOCAL_PATH,
+            charm.STUDIO_UI_CONFIG_FILE_CONTAINER_LOCAL_PATH,
+            charm.TRUSTSTORE_CONTAINER_LOCAL_PATH]), sorted(published_files))
+        unit_data = self.harness.get_relation_data(
+            peers_id, self.harness.charm.unit.name)
+        self.assertEqual(
+            app_data[charm.STUDIO_PEER_CONFIG_REVISION_KEY],
+            unit_data[charm.STUDIO_PEER_CONFIG_REVISION_KEY])
+
+    def test_non_leader_applies_published_config(self):
+        _, app_data = self._get_published_peer_data()
+        published_data = dict(app_data)
+        http_config = self._get_studio_http_config()
+
+        follower = utils.get_studio_harness(self, leader=False)
+        peers_id = follower.add_relation(
+            charm.STUDIO_PEER_RELATION_NAME, follower.charm.app.name)
+        follower.container_pebble_ready("studio")
+        follower.framework.commit()
+        self.assertEqual(
+            model.WaitingStatus(charm.STUDIO_AWAITING_PEER_CONFIG_MESSAGE),
+            follower.model.unit.status)
+
+        follower.update_relation_data(
+            peers_id, follower.charm.app.name, published_data)
+        follower.framework.commit()
+
+        container = follower.model.unit.get_container("studio")
+        with container.pull(
+                charm.STUDIO_HTTP_CONFIG_FILE_CONTAINER_LOCAL_PATH) as fin:
+            self.assertEqual(http_config, json.load(fin))
+        self.assertEqual(model.ActiveStatus(), follower.model.unit.status)
+        self.assertEqual(
+            published_data[charm.STUDIO_PEER_CONFIG_REVISION_KEY],
+            follower.get_relation_data(peers_id, follower.charm.unit.name)[
+                charm.STUDIO_PEER_CONFIG_REVISION_KEY])
+
+    def _add_studio_peers(self, harness, unit_count):
+        app_name = harness.charm.app.name
+        peers_id = harness.add_relation(
+            charm.STUDIO_PEER_RELATION_NAME, app_name)
+        units = ["%s/%d" % (app_name, i) for i in range(1, unit_count + 1)]
+        for unit_name in units:
+            harness.add_relation_unit(peers_id, unit_name)
+        return peers_id, units
+
+    def _handle_appcds_training(self, harness, exit_code=0):
+        """Has the Studio container of the given harness contain a classpath
+        and dump an AppCDS archive on training runs, returning the list of
+        the training runs' commands.
+        """
+        container = harness.model.unit.get_container("studio")
+        container.push(
+            "%s/studio.jar" % charm.STUDIO_CLASSPATH_DIR, "jar",
+            make_dirs=True)
+        training_runs = []
+
+        def _run_training(args):
+            training_runs.append(args.command[-1])
+            # NOTE: the JVM dumps the archive as it gets stopped:
+            if exit_code in (0, charm.STUDIO_SIGTERM_EXIT_CODE) and (
+                    "-XX:ArchiveClassesAtExit" in args.command[-1]):
+                container.push(
+                    charm.STUDIO_APPCDS_ARCHIVE_PATH, "archive",
+                    make_dirs=True)
+            return testing.ExecResult(exit_code=exit_code)
+        harness.handle_exec("studio", ["/bin/sh"], handler=_run_training)
+        return training_runs
+
+    def test_appcds_archive_generated_and_reused(self):
+        training_runs = self._handle_appcds_training(
+            self.harness, exit_code=charm.STUDIO_SIGTERM_EXIT_CODE)
+        self.harness.update_config({"jvm-appcds-enabled": True})
+        with self.assertLogs("charm", level="INFO") as logs:
+            self._configure_studio()
+
+        self.assertEqual(1, len(training_runs))
+        self.assertIn(
+            "-XX:ArchiveClassesAtExit=%s" % charm.STUDIO_APPCDS_ARCHIVE_PATH,
+            training_runs[0])
+        self.assertTrue(training_runs[0].startswith("exec java "))
+        self.assertIn(" server ", training_runs[0])
+        self.assertNotIn("-XX:SharedArchiveFile", training_runs[0])
+        self.assertTrue(any(
+            "after being restarted with the AppCDS archive" in line
+            for line in logs.output))
+        command = self.harness.get_container_pebble_plan(
+            "studio").services["studio"].command
+        self.assertIn(
+            "-XX:SharedArchiveFile=%s" % charm.STUDIO_APPCDS_ARCHIVE_PATH,
+            command)
+
+        # The archive must be reused as long as the JVM options are unchanged:
+        self.harness.update_config({"server-logging-level": "WARN"})
+        self._commit()
+        self.assertEqual(1, len(training_runs))
+
+        self.harness.update_config({"jvm-extra-options": "-Dfoo=bar"})
+        self._commit()
+        self.assertEqual(2, len(training_runs))
+        self.assertIn("-Dfoo=bar", training_runs[1])
+
+    def test_appcds_training_run_never_ready(self):
+        training_runs = self._handle_appcds_training(self.harness)
+        self.harness.update_config({"jvm-appcds-enabled": True})
+        with mock.patch.object(
+                charm.LegendStudioServerOperatorCharm,
+                "_is_studio_healthcheck_passing", return_value=False), (
+                    mock.patch.object(
+                        charm, "STUDIO_APPCDS_TRAINING_TIMEOUT", 0)):
+            self._configure_studio()
+
+        # The archive dumped by an unhealthy training run must not be used:
+        self.assertEqual(1, len(training_runs))
+        command = self.harness.get_container_pebble_plan(
+            "studio").services["studio"].command
+        self.assertNotIn("-XX:SharedArchiveFile", command)
+        container = self.harness.model.unit.get_container("studio")
+        self.assertTrue(container.get_service("studio").is_running())
+
+    def test_appcds_archive_generation_failure(self):
+        training_runs = self._handle_appcds_training(
+            self.harness, exit_code=1)
+        self.harness.update_config({"jvm-appcds-enabled": True})
+        self._configure_studio()
+
+        self.assertEqual(1, len(training_runs))
+        command = self.harness.get_container_pebble_plan(
+            "studio").services["studio"].command
+        self.assertNotIn("-XX:SharedArchiveFile", command)
+        container = self.harness.model.unit.get_container("studio")
+        self.assertTrue(container.get_service("studio").is_running())
+        self.assertEqual(model.ActiveStatus(), self.harness.model.unit.status)
+
+        # The failed generation must not be retried on every hook:
+        self.harness.update_config({"server-logging-level": "WARN"})
+        self._commit()
+        self.assertEqual(1, len(training_runs))
+
+    def test_non_leader_restarts_once_granted_lock(self):
+        _, app_data = self._get_published_peer_data()
+        published_data = dict(app_data)
+
+        follower = utils.get_studio_harness(self, leader=False)
+        peers_id, _ = self._add_studio_peers(follower, 1)
+        app_name = follower.charm.app.name
+        unit_name = follower.charm.unit.name
+        follower.update_relation_data(peers_id, app_name, published_data)
+        follower.container_pebble_ready("studio")
+        follower.framework.commit()
+
+        self.assertEqual(
+            model.MaintenanceStatus(
+                charm.STUDIO_AWAITING_RESTART_LOCK_MESSAGE),
+            follower.model.unit.status)
+        container = follower.model.unit.get_container("studio")
+        self.assertFalse(container.get_service("studio").is_running())
+        request = follower.get_relation_data(peers_id, unit_name)[
+            charm.STUDIO_PEER_RESTART_REQUEST_KEY]
+
+        follower.update_relation_data(peers_id, app_name, {
+            charm.STUDIO_PEER_RESTART_LOCKS_KEY: json.dumps(
+                {unit_name: request})})
+        follower.framework.commit()
+
+        self.assertTrue(container.get_service("studio").is_running())
+        self.assertEqual(model.ActiveStatus(), follower.model.unit.status)
+        unit_data = follower.get_relation_data(peers_id, unit_name)
+        self.assertEqual("true", unit_data[charm.STUDIO_PEER_READY_KEY])
+        self.assertNotIn(charm.STUDIO_PEER_RESTART_REQUEST_KEY, unit_data)
+
+    def test_appcds_archive_generated_under_restart_lock(self):
+        _, app_data = self._get_published_peer_data()
+        follower = utils.get_studio_harness(
+            self, leader=False, config={"jvm-appcds-enabled": True})
+        training_runs = self._handle_appcds_training(follower)
+        peers_id, _ = self._add_studio_peers(follower, 1)
+        app_name = follower.charm.app.name
+        unit_name = follower.charm.unit.name
+        follower.update_relation_data(peers_id, app_name, dict(app_data))
+        follower.container_pebble_ready("studio")
+        follower.framework.commit()
+        self.assertEqual([], training_runs)
+
+        request = follower.get_relation_data(peers_id, unit_name)[
+            charm.STUDIO_PEER_RESTART_REQUEST_KEY]
+        follower.update_relation_data(peers_id, app_name, {
+            charm.STUDIO_PEER_RESTART_LOCKS_KEY: json.dumps(
+                {unit_name: request})})
+        follower.framework.commit()
+        self.assertEqual(1, len(training_runs))
+        container = follower.model.unit.get_container("studio")
+        self.assertTrue(container.get_service("studio").is_running())
+
+    def test_leader_grants_restart_locks(self):
+        self.harness.update_config({"rolling-restart-min-ready-units": 2})
+        peers_id, units = self._add_studio_peers(self.harness, 3)
+        for i, unit_name in enumerate(units):
+            self.harness.update_relation_data(peers_id, unit_name, {
+                charm.STUDIO_PEER_READY_KEY: "true",
+                charm.STUDIO_PEER_RESTART_REQUEST_KEY: "%d.0" % (i + 1)})
+
+        def _get_locks():
+            return self.harness.charm._get_restart_locks(
+                self.harness.model.get_relation(
+                    charm.STUDIO_PEER_RELATION_NAME))
+        self.assertEqual({units[0]: "1.0"}, _get_locks())
+
+        self.harness.update_relation_data(peers_id, units[0], {
+            charm.STUDIO_PEER_RESTART_REQUEST_KEY: ""})
+        self.assertEqual({units[1]: "2.0"}, _get_locks())
+
+        # Only one other unit would remain ready if the third restarted,
+        # while units which are not ready may restart regardless:
+        self.harness.update_config({"rolling-restart-batch-size": 2})
+        self.harness.update_relation_data(peers_id, units[0], {
+            charm.STUDIO_PEER_READY_KEY: "false",
+            charm.STUDIO_PEER_RESTART_REQUEST_KEY: "4.0"})
+        self.assertEqual(
+            {units[0]: "4.0", units[1]: "2.0"}, _get_locks())
+
+    def test_ensure_session_indexes_action_requires_db(self):
+        action_event = mock.Mock()
+        self.harness.charm._on_ensure_session_indexes_action(action_event)
+        action_event.fail.assert_called_once_with(
+            "requires relating to: finos-legend-db-k8s")
+
+    def test_metrics_endpoint_published(self):
+        self.harness.add_resource("jmx-prometheus-javaagent", "jar-contents")
+        self._configure_studio()
+        # No network-get must be issued without any metrics relations:
+        with mock.patch.object(
+                self.harness.model, "get_binding") as get_binding:
+            self.harness.charm._set_metrics_endpoint_relation_data([])
+        get_binding.assert_not_called()
+        relation_id = utils.add_studio_relation(
+            self.harness, "metrics-endpoint", "prometheus-k8s", {})
+        self._commit()
+
+        app_data = self.harness.get_relation_data(
+            relation_id, self.harness.charm.app)
+        self.assertEqual([{
+            "metrics_path": "/metrics",
+            "static_configs": [{"targets": ["*:9404"]}]}],
+            json.loads(app_data["scrape_jobs"]))
+        unit_data = self.harness.get_relation_data(
+            relation_id, self.harness.charm.unit)
+        self.assertEqual(
+            utils.STUDIO_BIND_ADDRESS,
+            unit_data["prometheus_scrape_unit_address"])
+        command = self.harness.get_container_pebble_plan(
+            "studio").to_dict()["services"]["studio"]["command"]
+        self.assertIn(
+            "-javaagent:%s=9404:%s" % (
+                charm.METRICS_EXPORTER_JAR_CONTAINER_LOCAL_PATH,
+                charm.METRICS_EXPORTER_CONFIG_FILE_CONTAINER_LOCAL_PATH),
+            command)
+
+    def test_reconfiguration_timings_action(self):
+        action_event = mock.Mock()
+        self.harness.charm._on_reconfiguration_timings_action(action_event)
+        action_event.fail.assert_called_once()
+
+        self._configure_studio()
+        self.harness.update_config({"server-logging-level": "WARN"})
+        self._commit()
+        action_event = mock.Mock()
+        self.harness.charm._on_reconfiguration_timings_action(action_event)
+
+        phases = action_event.set_results.call_args[0][0]["phases"]
+        for phase in ["render-config", "push-files", "restart", "total"]:
+            self.assertIn("latest-ms", phases[phase])
+            self.assertIn("p99-ms", phases[phase])
+        self.assertEqual(2, phases["restart"]["samples"])
+
+    def _handle_jcmd(self, outputs):
+        """Fakes `jcmd` in the Studio container, answering with the output
+        mapped to the diagnostic command (or '-l') it was run with.
+        """
+        def _jcmd(args):
+            command = args.command[1]
+            if command != "-l":
+                command = args.command[2]
+            return testing.ExecResult(stdout=outputs[command])
+        self.harness.handle_exec("studio", ["jcmd"], handler=_jcmd)
+
+    @mock.patch("time.sleep")
+    def test_profile_action(self, _):
+        self._configure_studio()
+        container = self.harness.model.unit.get_container("studio")
+        self._handle_jcmd({
+            "-l": "42 %s server /http-config.json\n" % (
+                charm.STUDIO_MAIN_CLASS),
+            "JFR.start": "42:\nStarted recording 2."})
+        container.push("/jfr/test.jfr", "recording", make_dirs=True)
+
+        action_event = mock.Mock(params={
+            "duration": 30, "settings": "profile",
+            "output-path": "/jfr/test.jfr", "wait": True})
+        self.harness.charm._on_profile_action(action_event)
+
+        action_event.fail.assert_not_called()
+        results = action_event.set_results.call_args[0][0]
+        self.assertEqual("/jfr/test.jfr", results["path"])
+        self.assertEqual(len("recording"), results["size-bytes"])
+
+    def test_profile_action_long_wait_rejected(self):
+        self._configure_studio()
+        action_event = mock.Mock(params={
+            "duration": charm.JFR_PROFILE_MAX_WAIT_DURATION + 1,
+            "settings": "profile", "output-path": "", "wait": True})
+        self.harness.charm._on_profile_action(action_event)
+        action_event.fail.assert_called_once()
+        action_event.set_results.assert_not_called()
+
+    def test_profile_action_without_jcmd(self):
+        self._configure_studio()
+        action_event = mock.Mock(params={
+            "duration": 30, "settings": "profile", "output-path": "",
+            "wait": True})
+        self.harness.charm._on_profile_action(action_event)
+        action_event.fail.assert_called_once()
+        action_event.set_results.assert_not_called()
+
+    def test_continuous_recording_enabled(self):
+        self._configure_studio()
+        self.harness.update_config({"jvm-continuous-recording": True})
+        self._commit()
+
+        command = self.harness.get_container_pebble_plan(
+            "studio").to_dict()["services"]["studio"]["command"]
+        self.assertIn(charm.JFR_CONTINUOUS_RECORDING_OPTIONS[0], command)
+
+    def test_heap_histogram_action(self):
+        self._configure_studio()
+        self._handle_jcmd({
+            "-l": "42 %s server /http-config.json\n" % (
+                charm.STUDIO_MAIN_CLASS),
+            "GC.class_histogram": (
+                "42:\n"
+                "   1:          1000         400000  [B (java.base@11)\n"
+                "   2:           500        1200000  [C (java.base@11)\n"
+                "Total          1500        1600000\n")})
+
+        action_event = mock.Mock(params={
+            "top": 1, "live-only": True, "output-path": "/histogram.txt"})
+        self.harness.charm._on_heap_histogram_action(action_event)
+
+        results = action_event.set_results.call_args[0][0]
+        self.assertEqual(1600000, results["total-bytes"])
+        self.assertEqual(
+            [{"class": "[C", "instances": 500, "bytes": 1200000}],
+            json.loads(results["top-classes"]))
+        self.assertIn(
+            "Total", self._get_container_file("/histogram.txt"))
+
+    @mock.patch("loadtest.run_load_test")
+    def test_load_test_action_all_requests_failing(self, run_load_test):
+        self._configure_studio()
+        run_load_test.return_value = {
+            "duration": 1.0, "requests": 5, "errors": 5,
+            "requests_per_second": 0.0, "urls": {}}
+        action_event = mock.Mock(params={
+            "duration": 1, "concurrency": 1, "targets": "config",
+            "base-url": ""})
+        self.harness.charm._on_load_test_action(action_event)
+
+        action_event.fail.assert_not_called()
+        results = action_event.set_results.call_args[0][0]
+        self.assertEqual(5, results["errors"])
+        self.assertFalse([key for key in results if "latency" in key])
+
+    def test_load_test_action_invalid_targets(self):
+        action_event = mock.Mock(params={
+            "duration": 1, "concurrency": 1, "targets": "static,assets",
+            "base-url": ""})
+        self.harness.charm._on_load_test_action(action_event)
+        action_event.fail.assert_called_once()
+        self.assertIn("'assets'", action_event.fail.call_args[0][0])
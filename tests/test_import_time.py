@@ -0,0 +1,77 @@
+# Copyright 2021 Canonical
+# See LICENSE file for licensing details.
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time of the charm module (excluding the operator
+# framework itself, which every charm pays for, and compiling the module's
+# bytecode, which is only done once) in microseconds:
+CHARM_IMPORT_TIME_BUDGET_US = 20000
+# Number of measurements of which the fastest is checked against the budget:
+CHARM_IMPORT_TIME_RUNS = 3
+
+# Top-level packages which must only be imported by the hooks needing them:
+LAZILY_IMPORTED_PACKAGES = [
+    "asyncio", "jks", "loadtest", "pyasn1", "pyasn1_modules", "pymongo"]
+
+
+def _run_python(*args, pycache_dir=None):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([
+        os.path.join(REPO_ROOT, "lib"), os.path.join(REPO_ROOT, "src")])
+    if pycache_dir:
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        env["PYTHONPYCACHEPREFIX"] = pycache_dir
+    return subprocess.run(
+        [sys.executable] + list(args), env=env, cwd=REPO_ROOT,
+        capture_output=True, text=True, check=True)
+
+
+class TestImportTime(unittest.TestCase):
+
+    def setUp(self):
+        # NOTE: the modules are first compiled into a throwaway bytecode
+        # cache so that compiling them is not measured:
+        pycache = tempfile.TemporaryDirectory()
+        self.addCleanup(pycache.cleanup)
+        self.pycache_dir = pycache.name
+        _run_python("-c", "import ops, charm", pycache_dir=self.pycache_dir)
+
+    def _get_charm_import_time(self):
+        # NOTE: `ops` is imported first so its cost is not attributed to us:
+        output = _run_python(
+            "-X", "importtime", "-c", "import ops, charm",
+            pycache_dir=self.pycache_dir)
+        for line in output.stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].rstrip() == " charm":
+                return int(fields[1])
+        self.fail("no import time reported for the charm:\n%s" % (
+            output.stderr))
+
+    def test_charm_import_time_within_budget(self):
+        import_time = min(
+            self._get_charm_import_time()
+            for _ in range(CHARM_IMPORT_TIME_RUNS))
+        self.assertLess(
+            import_time, CHARM_IMPORT_TIME_BUDGET_US,
+            "importing the charm took %dus, exceeding the budget of %dus" % (
+                import_time, CHARM_IMPORT_TIME_BUDGET_US))
+
+    def test_heavy_dependencies_imported_lazily(self):
+        output = _run_python("-c", (
+            "import json, sys, ops\n"
+            "before = set(sys.modules)\n"
+            "import charm\n"
+            "print(json.dumps(sorted(set(sys.modules) - before)))\n"))
+        imported_packages = {
+            module.split(".")[0] for module in json.loads(output.stdout)}
+        self.assertEqual(
+            [], sorted(imported_packages & set(LAZILY_IMPORTED_PACKAGES)))
@@ -0,0 +1,82 @@
+# Copyright 2021 Canonical
+# See LICENSE file for licensing details.
+
+import unittest
+
+import jvm_diagnostics
+
+THREAD_DUMP = """2021-11-02 10:00:00
+Full thread dump OpenJDK 64-Bit Server VM (11.0.12+7 mixed mode):
+
+"dw-41 - GET /studio/config.json" #41 prio=5 os_prio=0 cpu=1.20ms elapsed=9.10s tid=0x00007f1 nid=0x29 waiting for monitor entry  [0x00007f2]
+   java.lang.Thread.State: BLOCKED (on object monitor)
+\tat org.example.Cache.get(Cache.java:42)
+\t- waiting to lock <0x00000000c1a2b3c4> (a org.example.Cache)
+\tat org.example.Servlet.doGet(Servlet.java:10)
+
+   Locked ownable synchronizers:
+\t- None
+
+"dw-42 - GET /studio/config.json" #42 prio=5 os_prio=0 cpu=1.30ms elapsed=9.10s tid=0x00007f3 nid=0x2a waiting for monitor entry  [0x00007f4]
+   java.lang.Thread.State: BLOCKED (on object monitor)
+\tat org.example.Cache.get(Cache.java:42)
+\t- waiting to lock <0x00000000c1a2b3c4> (a org.example.Cache)
+
+"dw-43" #43 prio=5 os_prio=0 cpu=9.00ms elapsed=9.10s tid=0x00007f5 nid=0x2b runnable  [0x00007f6]
+   java.lang.Thread.State: RUNNABLE
+\tat org.example.Cache.load(Cache.java:80)
+\t- locked <0x00000000c1a2b3c4> (a org.example.Cache)
+
+"VM Thread" os_prio=0 cpu=3.00ms elapsed=9.20s tid=0x00007f7 nid=0x8 runnable
+
+JNI global refs: 15, weak refs: 0
+"""
+
+CLASS_HISTOGRAM = """ num     #instances         #bytes  class name (module)
+-------------------------------------------------------
+   1:          1000         400000  [B (java.base@11.0.12)
+   2:           500        1200000  [C (java.base@11.0.12)
+   3:          2000          48000  java.lang.String (java.base@11.0.12)
+Total          3500        1648000
+"""
+
+
+class TestJvmDiagnostics(unittest.TestCase):
+
+    def test_parse_thread_dump(self):
+        threads = jvm_diagnostics.parse_thread_dump(THREAD_DUMP)
+
+        self.assertEqual(
+            ["dw-41 - GET /studio/config.json",
+             "dw-42 - GET /studio/config.json", "dw-43", "VM Thread"],
+            [thread["name"] for thread in threads])
+        self.assertEqual("BLOCKED", threads[0]["state"])
+        self.assertEqual("0x00000000c1a2b3c4", threads[0]["waiting_to_lock"])
+        self.assertEqual(["0x00000000c1a2b3c4"], threads[2]["locked"])
+        self.assertIsNone(threads[3]["state"])
+
+    def test_summarize_thread_dump(self):
+        summary = jvm_diagnostics.summarize_thread_dump(
+            jvm_diagnostics.parse_thread_dump(THREAD_DUMP), top=1)
+
+        self.assertEqual(4, summary["thread_count"])
+        self.assertEqual(
+            {"BLOCKED": 2, "RUNNABLE": 1, "UNKNOWN": 1}, summary["states"])
+        self.assertEqual([{
+            "lock": "0x00000000c1a2b3c4", "class": "org.example.Cache",
+            "owner": "dw-43", "waiters": 2}], summary["contended_locks"])
+        self.assertEqual([{
+            "name": "dw-41 - GET /studio/config.json",
+            "waiting_to_lock": "0x00000000c1a2b3c4", "owner": "dw-43",
+            "frame": "org.example.Cache.get(Cache.java:42)"}],
+            summary["blocked_threads"])
+
+    def test_parse_class_histogram(self):
+        classes, total = jvm_diagnostics.parse_class_histogram(
+            CLASS_HISTOGRAM)
+
+        self.assertEqual(["[C", "[B", "java.lang.String"], [
+            entry["class"] for entry in classes])
+        self.assertEqual(
+            {"class": "[C", "instances": 500, "bytes": 1200000}, classes[0])
+        self.assertEqual({"instances": 3500, "bytes": 1648000}, total)
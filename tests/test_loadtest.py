@@ -0,0 +1,125 @@
+# Copyright 2021 Canonical
+# See LICENSE file for licensing details.
+
+import http.server
+import socket
+import threading
+import unittest
+
+import loadtest
+
+INDEX_HTML = (
+    b'<html><head><link href="/studio/static/index.css" rel="stylesheet">'
+    b'</head><body><script src="static/index.js"></script>'
+    b'<script src="https://cdn.example.com/other.js"></script></body></html>')
+
+# Redirects served by the test server, such as pac4j's to the login page:
+_REDIRECTS = {
+    "/studio/redirected/": "/studio/",
+    "/studio/login/": "https://gitlab.example.com/oauth/authorize",
+    "/studio/loop/": "/studio/loop/"}
+
+
+class _StudioHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path in _REDIRECTS:
+            self.send_response(302)
+            self.send_header("Location", _REDIRECTS[self.path])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path == "/studio/":
+            body = INDEX_HTML
+        elif self.path.startswith("/studio/static/"):
+            body = b"x" * 1024
+        elif self.path == "/studio/config.json":
+            # NOTE: exercise chunked responses as well:
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self.wfile.write(b"2\r\n{}\r\n0\r\n\r\n")
+            return
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestLoadTest(unittest.TestCase):
+
+    def setUp(self):
+        server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0), _StudioHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.base_url = "http://127.0.0.1:%d/studio" % server.server_port
+
+    def test_discover_static_assets(self):
+        self.assertEqual([
+            "%s/static/index.css" % self.base_url,
+            "%s/static/index.js" % self.base_url],
+            loadtest.discover_static_assets("%s/" % self.base_url))
+
+    def test_discover_static_assets_redirected(self):
+        self.assertEqual([
+            "%s/static/index.css" % self.base_url,
+            "%s/static/index.js" % self.base_url],
+            loadtest.discover_static_assets(
+                "%s/redirected/" % self.base_url))
+
+        for path in ["login", "loop"]:
+            self.assertRaises(
+                loadtest.LoadTestError, loadtest.discover_static_assets,
+                "%s/%s/" % (self.base_url, path))
+
+    def test_run_load_test(self):
+        urls = [
+            "%s/static/index.js" % self.base_url,
+            "%s/config.json" % self.base_url,
+            "%s/missing" % self.base_url,
+            "%s/redirected/" % self.base_url]
+        results = loadtest.run_load_test(urls, concurrency=2, duration=0.5)
+
+        self.assertGreater(results["requests"], 0)
+        self.assertGreater(results["requests_per_second"], 0)
+        self.assertLessEqual(results["p50_ms"], results["p99_ms"])
+        self.assertEqual(
+            results["urls"][urls[2]]["requests"],
+            results["urls"][urls[2]]["errors"])
+        self.assertEqual(0, results["urls"][urls[1]]["errors"])
+        # Redirects are not followed while load testing, so count as errors:
+        self.assertEqual(
+            results["urls"][urls[3]]["requests"],
+            results["urls"][urls[3]]["errors"])
+        self.assertEqual(
+            ["200"], list(results["urls"][urls[0]]["statuses"]))
+
+    def test_run_load_test_all_requests_failing(self):
+        # NOTE: bind and close a socket to get a port nothing listens on:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        url = "http://127.0.0.1:%d/studio/config.json" % port
+        results = loadtest.run_load_test([url], concurrency=1, duration=0.2)
+
+        self.assertGreater(results["requests"], 0)
+        self.assertEqual(results["requests"], results["errors"])
+        self.assertEqual(0, results["requests_per_second"])
+        for key in ["p50_ms", "p95_ms", "p99_ms", "max_ms"]:
+            self.assertNotIn(key, results)
+            self.assertNotIn(key, results["urls"][url])
+
+    def test_run_load_test_invalid_urls(self):
+        self.assertRaises(
+            loadtest.LoadTestError, loadtest.run_load_test,
+            ["ftp://example.com"])